@@ -0,0 +1,219 @@
+"""BoBoMaker 智能清单命令行工具：不启动界面，直接读写任务数据库
+
+    python bobotask.py add -c 工作 "完成pcb绘制" "整理会议记录"
+    cat todo.txt | python bobotask.py add -c 工作 -
+    python bobotask.py add --due 2026-10-20 "交周报"
+    python bobotask.py list -c 工作 --open
+    python bobotask.py complete 12 15
+    python bobotask.py export > backup.json
+    python bobotask.py import --merge backup.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from duplicate_index import DuplicateIndex, THRESHOLD, skip_duplicates
+from smart_views import SmartView, BUILTIN_VIEWS
+from task_store import TaskStore, DB_PATH, parse_tag_query, parse_time, validate_import
+
+def write_task(out, category, task):
+    """输出一行：id、完成状态、类别、文本，以制表符分隔"""
+    mark = "x" if task["completed"] else " "
+    out.write(f"{task['id']}\t[{mark}]\t{category}\t{task['text']}\n")
+
+def read_lines(stream):
+    """逐行读取非空文本"""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+def cmd_add(store, args):
+    texts = read_lines(sys.stdin) if args.text == ["-"] else args.text
+    category = args.category or store.category_names()[0]
+    due_date = parse_time(args.due) if args.due else None
+    count = store.add_tasks(category, texts, due_date=due_date)
+    print(f"已添加 {count} 个任务到 {category}")
+
+def cmd_list(store, args):
+    completed = True if args.done else False if args.open else None
+    tags = parse_tag_query(args.tag)[0] if args.tag else None
+    for category, task in store.iter_tasks(args.category, completed, tags=tags):
+        write_task(sys.stdout, category, task)
+
+def cmd_complete(store, args):
+    count = store.set_completed(args.ids, completed=not args.undo)
+    print(f"已修改 {count} 个任务")
+
+def cmd_move(store, args):
+    count = store.move_tasks(args.ids, args.to)
+    print(f"已移动 {count} 个任务到 {args.to}")
+
+def cmd_search(store, args):
+    for category, task in store.search(args.text, args.category, args.limit, args.offset):
+        write_task(sys.stdout, category, task)
+
+def cmd_view(store, args):
+    """列出智能视图中的任务；不指定名称时列出所有视图"""
+    definitions = BUILTIN_VIEWS + json.loads(store.get_settings().get("smart_views", "[]"))
+    views = {definition["name"]: SmartView(definition) for definition in definitions}
+    if args.name is None:
+        for name in views:
+            print(name)
+        return
+    if args.name not in views:
+        raise ValueError(f"没有名为 {args.name} 的视图")
+    for category, task in views[args.name].query(store):
+        write_task(sys.stdout, category, task)
+
+def cmd_duplicates(store, args):
+    """列出重复任务组，组与组之间空一行"""
+    index = DuplicateIndex(args.threshold)
+    tasks = {}
+    for category, task in store.iter_tasks(args.category):
+        tasks[task["id"]] = (category, task)
+        index.add(task["id"], task["text"])
+    for i, cluster in enumerate(sorted(index.clusters(), key=len, reverse=True)):
+        if i:
+            sys.stdout.write("\n")
+        for task_id in cluster:
+            write_task(sys.stdout, *tasks[task_id])
+
+def cmd_stats(store, args):
+    total_completed = total = 0
+    for name, (completed, count) in store.category_counts().items():
+        print(f"{name}\t{completed}/{count}")
+        total_completed += completed
+        total += count
+    print(f"合计\t{total_completed}/{total}")
+
+def cmd_tags(store, args):
+    for name, count in store.tag_counts().items():
+        print(f"#{name}\t{count}")
+
+def cmd_import(store, args):
+    if args.file == "-":
+        categories = json.load(sys.stdin)
+    else:
+        with open(args.file, encoding="utf-8") as f:
+            categories = json.load(f)
+    validate_import(categories)
+    skipped = 0
+    if args.merge:
+        # 与界面的导入相同：追加到同名类别，跳过类别中已有的重复任务和文件中重复出现的任务
+        indexes = {}
+
+        def existing(name, text):
+            index = indexes.get(name)
+            if index is None:
+                index = indexes[name] = DuplicateIndex()
+                index.add_many((task["id"], task["text"]) for _, task in store.iter_tasks(name))
+            return bool(index.similar(text, limit=1))
+
+        categories, skipped = skip_duplicates(categories, existing)
+    store.import_categories(categories, replace=args.replace, merge=args.merge)
+    count = sum(len(tasks) for tasks in categories.values())
+    print(f"已导入 {len(categories)} 个类别，{count} 个任务" + (f"，跳过了 {skipped} 个重复任务" if args.merge else ""))
+
+def cmd_export(store, args):
+    """逐个类别、逐个任务写出 JSON，不在内存中构造全部数据"""
+    out = sys.stdout if args.file in (None, "-") else open(args.file, "w", encoding="utf-8")
+    try:
+        out.write("{")
+        for i, name in enumerate(store.category_names()):
+            out.write(f'{"," if i else ""}\n  {json.dumps(name, ensure_ascii=False)}: [')
+            for j, (_, task) in enumerate(store.iter_tasks(name)):
+                del task["id"]
+                out.write(f'{"," if j else ""}\n    {json.dumps(task, ensure_ascii=False)}')
+            out.write("\n  ]")
+        out.write("\n}\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bobotask", description="BoBoMaker 智能清单命令行工具")
+    parser.add_argument("--db", default=DB_PATH, help=f"数据库文件（默认 {DB_PATH}）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="添加任务（文本为 - 时从标准输入逐行读取，一次写入）")
+    add.add_argument("text", nargs="+")
+    add.add_argument("-c", "--category", help="类别（默认第一个类别，不存在时新建）")
+    add.add_argument("--due", help='截止时间，例如 "2026-10-20 18:00" 或 2026-10-20')
+    add.set_defaults(func=cmd_add)
+
+    list_ = commands.add_parser("list", help="列出任务")
+    list_.add_argument("-c", "--category")
+    state = list_.add_mutually_exclusive_group()
+    state.add_argument("--open", action="store_true", help="只列出未完成任务")
+    state.add_argument("--done", action="store_true", help="只列出已完成任务")
+    list_.add_argument("-t", "--tag", help='标签条件，例如 "#工作 -#等待" 或 "#工作|#学习"（以 - 开头时写成 -t="-#等待"）')
+    list_.set_defaults(func=cmd_list)
+
+    complete = commands.add_parser("complete", help="标记任务为已完成")
+    complete.add_argument("ids", nargs="+", type=int)
+    complete.add_argument("--undo", action="store_true", help="改回未完成")
+    complete.set_defaults(func=cmd_complete)
+
+    move = commands.add_parser("move", help="移动任务到其他类别")
+    move.add_argument("ids", nargs="+", type=int)
+    move.add_argument("-t", "--to", required=True, help="目标类别（不存在时新建）")
+    move.set_defaults(func=cmd_move)
+
+    search = commands.add_parser("search", help="在所有类别中查找任务，按相关度排序")
+    search.add_argument("text", help="空格分隔的多个词需要同时匹配")
+    search.add_argument("-c", "--category")
+    search.add_argument("-n", "--limit", type=int, help="最多显示的数量")
+    search.add_argument("--offset", type=int, default=0, help="跳过前面的结果（分页）")
+    search.set_defaults(func=cmd_search)
+
+    view = commands.add_parser("view", help="列出智能视图中的任务（例如 今天、最近完成、全部未完成）")
+    view.add_argument("name", nargs="?", help="视图名称（省略时列出所有视图）")
+    view.set_defaults(func=cmd_view)
+
+    duplicates = commands.add_parser("duplicates", help="列出文字几乎相同的任务")
+    duplicates.add_argument("-c", "--category")
+    duplicates.add_argument("--threshold", type=float, default=THRESHOLD, help=f"相似度阈值（0~1，默认 {THRESHOLD}）")
+    duplicates.set_defaults(func=cmd_duplicates)
+
+    stats = commands.add_parser("stats", help="各类别的完成情况")
+    stats.set_defaults(func=cmd_stats)
+
+    tags = commands.add_parser("tags", help="各标签的任务数")
+    tags.set_defaults(func=cmd_tags)
+
+    import_ = commands.add_parser("import", help="导入 JSON（与界面的导出格式相同），默认替换同名类别中的任务")
+    import_.add_argument("file", help="文件路径，- 表示标准输入")
+    mode = import_.add_mutually_exclusive_group()
+    mode.add_argument("--replace", action="store_true", help="先清空现有数据")
+    mode.add_argument("--merge", action="store_true", help="追加到同名类别并跳过重复任务（与界面的导入相同）")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser("export", help="导出 JSON")
+    export.add_argument("file", nargs="?", help="文件路径（默认输出到标准输出）")
+    export.set_defaults(func=cmd_export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = None
+    try:
+        store = TaskStore(args.db)
+        store.ensure_default_categories()
+        args.func(store, args)
+    except BrokenPipeError:
+        # 输出被提前关闭（例如接到 head），不算错误
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, ValueError, sqlite3.Error) as e:
+        # sqlite3.Error 包括界面程序正在写入时的 database is locked
+        print(f"错误：{str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""重复任务检测：用 MinHash 签名和 LSH 分桶找出文字几乎相同的任务，不需要两两比较
+
+只依赖标准库，界面程序和命令行工具共用。
+"""
+import re
+import zlib
+
+NUM_BANDS = 6           # LSH 分桶数
+BAND_ROWS = 2           # 每个桶使用的签名个数
+THRESHOLD = 0.7         # 字符二元组的 Jaccard 相似度不低于该值时视为重复
+MAX_BUCKET = 200        # 超过该大小的桶不再逐对确认（其他桶通常已经找到它们）
+
+MASK = 0xFFFFFFFF
+# 每个签名位置的哈希参数 (a, b)：h(x) = (a * x + b) mod 2^32，a 为奇数
+HASH_PARAMS = [((0x9E3779B1 * (i + 1)) & MASK | 1, (0x85EBCA77 * (i + 7)) & MASK)
+               for i in range(NUM_BANDS * BAND_ROWS)]
+
+IGNORED = re.compile(r"[\W_]+")
+
+def normalize(text):
+    """忽略大小写、空白和标点"""
+    return IGNORED.sub("", text.casefold())
+
+def shingles(text):
+    """规范化文本的字符二元组；只有一个字符时使用该字符"""
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def similarity(a, b):
+    """两个规范化文本的 Jaccard 相似度"""
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+def band_keys(text):
+    """MinHash 签名按桶组合成的整数键"""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    signature = [min((a * x + b) & MASK for x in hashes) for a, b in HASH_PARAMS]
+    keys = []
+    for i in range(0, len(signature), BAND_ROWS):
+        key = 0
+        for value in signature[i:i + BAND_ROWS]:
+            key = (key << 32) | value
+        keys.append(key)
+    return keys
+
+def skip_duplicates(categories, existing):
+    """去掉导入数据 {类别名称: [任务]} 中的重复任务，返回 (保留的数据, 跳过的数量)
+
+    existing(类别名称, 文本) 判断该类别中是否已有相似的任务；与数据中前面的任务相似的任务也跳过。
+    """
+    seen = DuplicateIndex()
+    kept, skipped = {}, 0
+    for name, tasks in categories.items():
+        kept[name] = []
+        for position, task in enumerate(tasks):
+            if existing(name, task["text"]) or seen.similar(task["text"], limit=1):
+                skipped += 1
+                continue
+            seen.add((name, position), task["text"])
+            kept[name].append(task)
+    return kept, skipped
+
+class DuplicateIndex:
+    """任务 id -> 规范化文本；文字完全相同的任务共用一组签名，只有不同的文本进入 LSH 分桶"""
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.texts = {}                                  # 任务 id -> 规范化文本
+        self.groups = {}                                 # 规范化文本 -> 任务 id 集合
+        self.buckets = [{} for _ in range(NUM_BANDS)]    # 每个桶：键 -> [规范化文本]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, key, text):
+        """添加任务，或在文本修改后更新它"""
+        text = normalize(text)
+        if self.texts.get(key) == text:
+            return
+        self.remove(key)
+        if not text:
+            return
+        self.texts[key] = text
+        group = self.groups.get(text)
+        if group is not None:
+            group.add(key)
+            return
+        self.groups[text] = {key}
+        for buckets, band in zip(self.buckets, band_keys(text)):
+            buckets.setdefault(band, []).append(text)
+
+    def add_many(self, items):
+        for key, text in items:
+            self.add(key, text)
+
+    def remove(self, key):
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        group = self.groups[text]
+        group.discard(key)
+        if group:
+            return
+        del self.groups[text]
+        for buckets, band in zip(self.buckets, band_keys(text)):
+            bucket = buckets[band]
+            bucket.remove(text)
+            if not bucket:
+                del buckets[band]
+
+    def clear(self):
+        self.texts.clear()
+        self.groups.clear()
+        for buckets in self.buckets:
+            buckets.clear()
+
+    def candidates(self, text):
+        """与规范化文本落在同一个桶中的其他文本"""
+        found = set()
+        for buckets, band in zip(self.buckets, band_keys(text)):
+            found.update(buckets.get(band, ()))
+        found.discard(text)
+        return found
+
+    def similar(self, text, limit=5):
+        """可能与 text 重复的任务 id，最相似的在前"""
+        text = normalize(text)
+        if not text:
+            return []
+        scored = [(1.0, key) for key in self.groups.get(text, ())]
+        for other in self.candidates(text):
+            score = similarity(text, other)
+            if score >= self.threshold:
+                scored.extend((score, key) for key in self.groups[other])
+        scored.sort(key=lambda item: -item[0])
+        return [key for _, key in scored[:limit]]
+
+    def stars(self):
+        """逐个产生以每个尚未分组的文本为中心的组 (中心文本的任务 id 列表, 其他相似任务的 id 列表)
+
+        组中只收入与中心相似度不低于阈值的文本，相似关系不传递，保留中心任务、
+        删除其余任务时不会误删不相似的任务。没有重复的文本也产生一组（其他任务为空），
+        调用方可以在每组之间检查时间、分批取用；两次取用之间索引可以变化。
+        """
+        grouped = set()
+        for text in list(self.groups):
+            if text in grouped or text not in self.groups:
+                continue
+            grouped.add(text)
+            center = shingles(text)
+            members = []
+            for buckets, band in zip(self.buckets, band_keys(text)):
+                bucket = buckets.get(band, ())
+                if len(bucket) > MAX_BUCKET:
+                    continue
+                for other in bucket:
+                    if other in grouped:
+                        continue
+                    other_shingles = shingles(other)
+                    if len(center & other_shingles) / len(center | other_shingles) >= self.threshold:
+                        grouped.add(other)
+                        members.append(other)
+            yield (sorted(self.groups.get(text, ())),
+                   [key for member in members for key in sorted(self.groups.get(member, ()))])
+
+    def clusters(self):
+        """所有重复组（每组至少两个任务 id，中心文本的任务在前）"""
+        return [center + others for center, others in self.stars() if len(center) + len(others) > 1]
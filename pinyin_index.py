@@ -0,0 +1,154 @@
+"""拼音搜索索引：用全拼或首字母查找中文任务，例如 wcpcb 可以找到“完成pcb绘制”
+
+索引保存在内存中，添加或修改任务时只更新这一个任务。汉字转拼音使用可选的
+pypinyin 库；没有安装时只能按原文查找。
+"""
+import bisect
+import re
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+SEPARATOR = "\0"       # 前缀列表中分隔拼写形式和任务 id
+
+def is_cjk(char):
+    return "㐀" <= char <= "鿿"
+
+class PinyinIndex:
+    """任务 id -> (原文, 全拼, 首字母)，支持前缀匹配和首字母子序列匹配"""
+
+    def __init__(self):
+        self.entries = {}
+        self.postings = {}       # 字符 -> 含有该字符的任务 id 集合
+        self.prefixes = []       # 按字母顺序排列的“拼写形式\0任务 id”，用于前缀查找
+        self.prefixes_sorted = True
+        self.spellings = {}      # 字符 -> (原文, 全拼, 首字母)，多数任务只用到几千个常用字
+        self.last_query = None   # 上一次完整求出的查询及其结果，输入下一个字符时在其中继续筛选
+        self.last_matches = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def spelling(self, char):
+        """单个字符的 (原文, 全拼, 首字母)；空白和标点不参与匹配"""
+        if is_cjk(char):
+            syllable = lazy_pinyin(char)[0].lower() if lazy_pinyin else char
+            spelling = (char, syllable, syllable[0])
+        elif char.isalnum():
+            spelling = (char, char, char)
+        else:
+            spelling = ("", "", "")
+        self.spellings[char] = spelling
+        return spelling
+
+    def forms(self, text):
+        """返回 (原文, 全拼, 首字母)，都转为小写；英文和数字原样保留"""
+        spellings = self.spellings
+        parts = [spellings.get(char) or self.spelling(char) for char in text.lower()]
+        return ("".join(part[0] for part in parts),
+                "".join(part[1] for part in parts),
+                "".join(part[2] for part in parts))
+
+    def add(self, key, text):
+        """添加任务，或在文本修改后更新它"""
+        self.add_many([(key, text)])
+
+    def add_many(self, items):
+        """批量添加 (任务 id, 文本)，加载数据时使用"""
+        added = []
+        for key, text in items:
+            forms = self.forms(text)
+            if self.entries.get(key) == forms:
+                continue
+            self.remove(key)
+            self.entries[key] = forms
+            for char in set(forms[0]) | set(forms[1]):
+                self.postings.setdefault(char, set()).add(key)
+            added.extend(f"{form}{SEPARATOR}{key}" for form in set(forms))
+        if len(added) <= 8 and self.prefixes_sorted:
+            for item in added:
+                bisect.insort(self.prefixes, item)
+        else:
+            # 批量添加时先追加，到下一次查询时再统一排序
+            self.prefixes.extend(added)
+            self.prefixes_sorted = False
+        self.last_query = None
+
+    def remove(self, key):
+        forms = self.entries.pop(key, None)
+        if forms is None:
+            return
+        for char in set(forms[0]) | set(forms[1]):
+            keys = self.postings[char]
+            keys.discard(key)
+            if not keys:
+                del self.postings[char]
+        if self.prefixes_sorted:
+            for form in set(forms):
+                del self.prefixes[bisect.bisect_left(self.prefixes, f"{form}{SEPARATOR}{key}")]
+        else:
+            stale = {f"{form}{SEPARATOR}{key}" for form in forms}
+            self.prefixes = [item for item in self.prefixes if item not in stale]
+        self.last_query = None
+
+    def clear(self):
+        self.entries.clear()
+        self.postings.clear()
+        self.prefixes.clear()
+        self.prefixes_sorted = True
+        self.last_query = None
+
+    def sort_prefixes(self):
+        """批量添加之后排序前缀列表；加载完成时调用，避免第一次查询时等待"""
+        if not self.prefixes_sorted:
+            self.prefixes.sort()
+            self.prefixes_sorted = True
+
+    def entry_key(self, item):
+        """从前缀列表的项中取出任务 id"""
+        return int(item.rpartition(SEPARATOR)[2])
+
+    def search(self, query, limit=None):
+        """查找任务 id：先返回以查询开头的任务，再返回包含查询或首字母依次包含查询的任务
+
+        总是求出全部匹配并保存下来，输入下一个字符时在其中继续筛选；limit 只限制返回的数量。
+        """
+        query = self.forms(query)[0]
+        if not query:
+            return []
+
+        # 前缀匹配：在排好序的列表中二分查找
+        self.sort_prefixes()
+        results = []
+        matches = set()
+        i = bisect.bisect_left(self.prefixes, query)
+        while i < len(self.prefixes) and self.prefixes[i].startswith(query):
+            key = self.entry_key(self.prefixes[i])
+            if key not in matches:
+                matches.add(key)
+                results.append(key)
+            i += 1
+
+        # 候选任务必须含有查询中的每个字符
+        if self.last_query is not None and query.startswith(self.last_query):
+            candidates = self.last_matches
+        else:
+            sets = sorted((self.postings.get(char, set()) for char in set(query)), key=len)
+            candidates = sets[0].intersection(*sets[1:])
+
+        subsequence = re.compile(".*?".join(map(re.escape, query)))
+        for key in candidates:
+            if key in matches:
+                continue
+            plain, full, initials = self.entries[key]
+            if query in plain or query in full or subsequence.search(initials):
+                matches.add(key)
+                results.append(key)
+
+        self.last_query, self.last_matches = query, matches
+        return results if limit is None else results[:limit]
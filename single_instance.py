@@ -0,0 +1,155 @@
+"""单实例运行：第一个实例监听本地套接字，之后启动的实例把命令转交给它后立即退出
+
+这个模块只使用标准库，转交命令时不需要导入界面库。
+"""
+import argparse
+import json
+import os
+import queue
+import secrets
+import socket
+import sys
+import threading
+
+CONNECT_TIMEOUT = 0.5   # 连接已运行实例的超时时间（秒）
+
+def parse_args(argv):
+    """解析命令行参数，返回要执行的命令"""
+    parser = argparse.ArgumentParser(description="BoBoMaker 智能清单")
+    parser.add_argument("--add", metavar="TEXT", help="添加任务")
+    parser.add_argument("--category", metavar="NAME", help="任务所属类别（默认为当前类别）")
+    args, _ = parser.parse_known_args(argv)
+    if args.add:
+        return {"action": "add", "text": args.add, "category": args.category}
+    return {"action": "show"}
+
+def get_runtime_dir():
+    """存放套接字等运行时文件的用户目录"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "BoBoMaker")
+    else:
+        base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("XDG_CACHE_HOME") \
+            or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, "bobomaker")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+def use_unix_socket():
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+def get_address_path():
+    """Unix 下为套接字文件；Windows 下为记录端口和口令的文件"""
+    if use_unix_socket():
+        return os.path.join(get_runtime_dir(), "instance.sock")
+    return os.path.join(get_runtime_dir(), "instance.port")
+
+def connect():
+    """连接已运行的实例，返回 (套接字, 口令)；没有实例时返回 (None, None)"""
+    path = get_address_path()
+    try:
+        if use_unix_socket():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            return sock, ""
+        with open(path, encoding="utf-8") as f:
+            port, token = f.read().split()
+        sock = socket.create_connection(("127.0.0.1", int(port)), timeout=CONNECT_TIMEOUT)
+        return sock, token
+    except (OSError, ValueError):
+        return None, None
+
+def forward_to_running_instance(argv):
+    """把命令行命令转交给已运行的实例，成功时返回 True"""
+    sock, token = connect()
+    if sock is None:
+        return False
+    command = dict(parse_args(argv), token=token)
+    try:
+        with sock:
+            sock.sendall(json.dumps(command, ensure_ascii=False).encode("utf-8") + b"\n")
+            return sock.makefile("rb").readline().strip() == b"ok"
+    except OSError:
+        return False
+
+class InstanceServer:
+    """在后台线程中接收其他实例转交的命令，放入 commands 队列由界面线程处理
+
+    notify 在每个命令放入队列后由后台线程调用，用于唤醒界面线程。
+    """
+
+    def __init__(self, notify=None):
+        self.commands = queue.Queue()
+        self.notify = notify
+        self.sock = None
+        self.path = get_address_path()
+        self.token = ""
+        self.already_running = False   # start() 发现已有实例在监听
+
+    def start(self):
+        """开始监听；已有实例在监听（already_running 为 True）或监听失败时返回 False"""
+        probe, _ = connect()
+        if probe is not None:
+            probe.close()
+            self.already_running = True
+            return False
+        try:
+            if use_unix_socket():
+                # 连不上，说明是上次异常退出留下的套接字文件，可以删除
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.bind(self.path)
+                os.chmod(self.path, 0o600)
+            else:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.sock.bind(("127.0.0.1", 0))
+                self.token = secrets.token_hex(16)
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(f"{self.sock.getsockname()[1]} {self.token}")
+            self.sock.listen(8)
+        except OSError as e:
+            print(f"Error starting instance server: {str(e)}")
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            return False
+
+        threading.Thread(target=self.serve, daemon=True).start()
+        return True
+
+    def serve(self):
+        sock = self.sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return  # 套接字已关闭
+            with conn:
+                try:
+                    conn.settimeout(CONNECT_TIMEOUT)
+                    line = conn.makefile("rb").readline()
+                    if not line:
+                        continue  # 其他实例启动时的探测连接
+                    command = json.loads(line.decode("utf-8"))
+                    if command.pop("token", "") != self.token:
+                        conn.sendall(b"denied\n")
+                        continue
+                    self.commands.put(command)
+                    conn.sendall(b"ok\n")
+                    if self.notify is not None:
+                        self.notify()
+                except (OSError, ValueError) as e:
+                    print(f"Error receiving instance command: {str(e)}")
+
+    def close(self):
+        """停止监听并删除地址文件"""
+        if self.sock is None:
+            return
+        self.sock.close()
+        self.sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+"""智能视图：跨类别的任务查询，例如“全部未完成”“最近完成”
+
+每个视图同时编译为 SQL 条件（从数据库取出初始结果，使用索引）和 Python 判断函数
+（任务变化时只重新判断变化的任务）。只依赖标准库，界面程序和命令行工具共用。
+"""
+import bisect
+import heapq
+from datetime import datetime, timedelta
+
+from task_store import casefold, now, parse_tags, parse_tag_query
+
+# 内置视图；用户定义的视图使用相同的字段，所有条件同时满足
+BUILTIN_VIEWS = [
+    {"name": "今天", "created_days": 0},
+    {"name": "已逾期", "state": "open", "overdue": True},
+    {"name": "最近完成", "state": "done", "completed_days": 7},
+    {"name": "全部未完成", "state": "open"},
+]
+
+def day_start(days_ago):
+    """days_ago 天前零点，格式与任务的日期字段相同，可以直接按字符串比较"""
+    day = datetime.now() - timedelta(days=days_ago)
+    return day.strftime("%Y-%m-%d 00:00")
+
+class SmartView:
+    """一个智能视图的定义
+
+    definition 的字段（都可省略）：
+        state           "open" 只含未完成，"done" 只含已完成
+        created_days    创建于最近 N 天内（0 表示今天）
+        completed_days  完成于最近 N 天内
+        overdue         截止时间已过
+        query           标签条件和文字，语法与筛选框相同，例如 "#工作 -#等待 报告"
+        categories      限定的类别名称列表
+    """
+
+    def __init__(self, definition, builtin=False):
+        self.definition = dict(definition)
+        self.name = definition["name"]
+        self.builtin = builtin
+        self.categories = self.definition.get("categories")
+        self.tag_terms, words = parse_tag_query(definition.get("query", ""))
+        self.words = casefold(words).split()
+        self.day = None            # 编译时的日期，跨天后日期条件需要重新计算
+        self.members = None        # 物化的结果：{类别: {id(task): task}}，None 表示尚未物化
+        # 物化的结果按 (创建时间, -序号) 升序排列，增删时用二分查找维护，打开视图时不再排序
+        self.keys = []
+        self.rows = []             # 与 keys 对应的 (类别, 任务)
+        self.entries = {}          # id(task) -> 排序键
+        self.next_seq = 0
+        self.compile()
+
+    def compile(self):
+        """按当前日期计算日期条件"""
+        self.day = datetime.now().strftime("%Y-%m-%d")
+        definition = self.definition
+        self.created_after = (day_start(definition["created_days"])
+                              if definition.get("created_days") is not None else None)
+        self.completed_after = (day_start(definition["completed_days"])
+                                if definition.get("completed_days") is not None else None)
+
+    def is_stale(self):
+        """跨天后日期条件过期"""
+        return self.day != datetime.now().strftime("%Y-%m-%d")
+
+    def query(self, store):
+        """从数据库读取视图中的任务，产生 (类别名称, 任务字典)"""
+        state = self.definition.get("state")
+        completed = None if state is None else state == "done"
+        return store.iter_tasks(completed=completed, tags=self.tag_terms, where=self.sql())
+
+    def sql(self):
+        """完成状态和标签以外的条件 (条件, 参数)"""
+        conditions, params = [], []
+        if self.created_after is not None:
+            conditions.append("t.created_date >= ?")
+            params.append(self.created_after)
+        if self.completed_after is not None:
+            conditions.append("t.completed_date >= ?")
+            params.append(self.completed_after)
+        if self.definition.get("overdue"):
+            # 与当前时间比较，每次查询时重新取时间
+            conditions.append("t.due_date <= ?")
+            params.append(now())
+        if self.categories is not None:
+            conditions.append(f"c.name IN ({', '.join('?' * len(self.categories))})")
+            params.extend(self.categories)
+        for word in self.words:
+            conditions.append("instr(casefold(t.text), ?) > 0")
+            params.append(word)
+        return " AND ".join(conditions), params
+
+    def matches(self, task, category):
+        """与 query() 相同的条件，用于判断单个任务"""
+        state = self.definition.get("state")
+        if state is not None and task["completed"] != (state == "done"):
+            return False
+        if self.created_after is not None and (task["created_date"] or "") < self.created_after:
+            return False
+        if self.completed_after is not None and (task["completed_date"] or "") < self.completed_after:
+            return False
+        if self.definition.get("overdue") and not (task.get("due_date") and task["due_date"] <= now()):
+            return False
+        if self.categories is not None and category not in self.categories:
+            return False
+        if self.words:
+            text = casefold(task["text"])
+            if not all(word in text for word in self.words):
+                return False
+        if self.tag_terms:
+            tags = set(parse_tags(task["text"]))
+            for negate, names in self.tag_terms:
+                if any(name in tags for name in names) == negate:
+                    return False
+        return True
+
+    def depends_on(self, category):
+        """category 中的任务变化是否可能影响这个视图"""
+        return self.categories is None or category in self.categories
+
+    def count(self):
+        return len(self.rows) if self.members is not None else 0
+
+    def tasks(self):
+        """视图中的任务 [(类别, 任务)]，最新创建的在前，创建时间相同时先加入的在前"""
+        return self.rows[::-1]
+
+    def key_of(self, task, seq):
+        return (task["created_date"] or "", -seq)
+
+    def reset(self, rows=None):
+        """用 [(类别, 任务)] 重新物化；rows 为 None 时回到尚未物化的状态"""
+        self.members = None if rows is None else {}
+        self.keys, self.rows, self.entries, self.next_seq = [], [], {}, 0
+        if rows:
+            self.replace_category(None, rows)
+
+    def add(self, category, task):
+        """加入任务，或在任务修改后移动到新位置"""
+        old = self.entries.get(id(task))
+        if old is None:
+            seq, self.next_seq = self.next_seq, self.next_seq + 1
+        else:
+            seq = -old[-1]
+        key = self.key_of(task, seq)
+        if key == old and task is self.members.get(category, {}).get(id(task)):
+            return
+        self.discard(task)
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, (category, task))
+        self.entries[id(task)] = key
+        self.members.setdefault(category, {})[id(task)] = task
+
+    def discard(self, task):
+        """移出任务，任务原来在视图中时返回 True"""
+        key = self.entries.pop(id(task), None)
+        if key is None:
+            return False
+        i = bisect.bisect_left(self.keys, key)
+        category = self.rows[i][0]
+        del self.keys[i]
+        del self.rows[i]
+        matched = self.members[category]
+        del matched[id(task)]
+        if not matched:
+            del self.members[category]
+        return True
+
+    def replace_category(self, category, rows):
+        """把 category 中的任务换成 rows [(类别, 任务)]（category 为 None 时只加入）
+
+        过滤一遍再归并，不逐个插入。
+        """
+        if category is not None and self.members.pop(category, None) is not None:
+            kept = [(key, row) for key, row in zip(self.keys, self.rows) if row[0] != category]
+            self.entries = {id(row[1]): key for key, row in kept}
+        else:
+            kept = list(zip(self.keys, self.rows))
+        added = []
+        for row in rows:
+            key = self.key_of(row[1], self.next_seq)
+            self.next_seq += 1
+            added.append((key, row))
+            self.entries[id(row[1])] = key
+            self.members.setdefault(row[0], {})[id(row[1])] = row[1]
+        added.sort(key=lambda item: item[0])
+        merged = list(heapq.merge(kept, added, key=lambda item: item[0]))
+        self.keys = [key for key, _ in merged]
+        self.rows = [row for _, row in merged]
+
+    def drop_category(self, category):
+        self.replace_category(category, [])
+
+    def rename_category(self, old_name, new_name):
+        if old_name not in self.members:
+            return
+        self.members[new_name] = self.members.pop(old_name)
+        self.rows = [(new_name, task) if name == old_name else (name, task) for name, task in self.rows]
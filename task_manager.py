@@ -1,14 +1,56 @@
-﻿import tkinter as tk
+﻿import sys
+
+if __name__ == "__main__":
+    # 已有实例在运行时，把命令转交给它后立即退出（此时还没有导入界面库）
+    from single_instance import forward_to_running_instance
+    if forward_to_running_instance(sys.argv[1:]):
+        sys.exit(0)
+
+import tkinter as tk
 import customtkinter as ctk
+import bisect
+import heapq
 import json
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
-import sqlite3
 from PIL import Image
-import tkinter.font as tkFont
-from PIL import ImageTk  # 添加 ImageTk 的导入
 import os
-import sys
-import webbrowser
+import weakref
+from single_instance import InstanceServer, parse_args
+from task_store import (TaskStore, DB_PATH, now, parse_time, parse_tags, parse_tag_query,
+                        validate_import)
+from pinyin_index import PinyinIndex
+from duplicate_index import DuplicateIndex, skip_duplicates
+from smart_views import SmartView, BUILTIN_VIEWS
+
+def longest_increasing_subsequence(values):
+    """返回最长严格递增子序列在 values 中的下标列表"""
+    tails = []        # tails[k] 为长度 k+1 的子序列结尾元素的下标
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[tails[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo > 0:
+            previous[i] = tails[lo - 1]
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    
+    result = []
+    i = tails[-1] if tails else -1
+    while i != -1:
+        result.append(i)
+        i = previous[i]
+    return result[::-1]
 
 def get_resource_path(relative_path):
     """ 获取资源文件的绝对路径 """
@@ -20,13 +62,527 @@ def get_resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
+def get_cache_dir():
+    """用户缓存目录（不存在时创建）"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "BoBoMaker", "cache")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, "bobomaker")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def get_cached_icon(relative_path, size, fmt="PNG"):
+    """返回缩放后的图标文件路径；以源文件修改时间为键缓存，源文件不变时不再调用 PIL"""
+    source = get_resource_path(relative_path)
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    prefix = f"{stem}_{size[0]}x{size[1]}_"
+    name = f"{prefix}{os.stat(source).st_mtime_ns}.{fmt.lower()}"
+    cache_dir = get_cache_dir()
+    path = os.path.join(cache_dir, name)
+    if os.path.exists(path):
+        return path
+    
+    image = Image.open(source).resize(size)
+    if 'A' not in image.mode:
+        image = image.convert('RGBA')
+    # 先写临时文件再改名，避免其他实例读到写了一半的文件
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    if fmt == "ICO":
+        image.save(temp_path, format=fmt, sizes=[size])
+    else:
+        image.save(temp_path, format=fmt)
+    os.replace(temp_path, path)
+    
+    # 删除源文件旧版本生成的缓存
+    for old_name in os.listdir(cache_dir):
+        if old_name.startswith(prefix) and old_name != name:
+            try:
+                os.remove(os.path.join(cache_dir, old_name))
+            except OSError:
+                pass
+    return path
+
+def load_task_data(db_path, results, first_category=None, chunk_size=2000):
+    """在后台线程中读取类别和任务，按类别分批放入 results 队列
+    
+    消息依次为 ("categories", 类别名列表, 计数)、若干 ("tasks", 类别名, 任务列表)，
+    最后是 ("done", None) 或 ("error", 错误信息)。first_category 的任务最先读取。
+    """
+    store = None
+    try:
+        # SQLite 连接不能跨线程使用，后台线程单独打开
+        store = TaskStore(db_path)
+        store.ensure_default_categories()
+        counts = store.category_counts()
+        names = list(counts)
+        results.put(("categories", names, counts))
+        
+        # 先读取首先显示的类别
+        for name in sorted(names, key=lambda name: name != first_category):
+            batch = []
+            for _, task in store.iter_tasks(name, batch_size=chunk_size):
+                batch.append(task)
+                if len(batch) >= chunk_size:
+                    results.put(("tasks", name, batch))
+                    batch = []
+            if batch:
+                results.put(("tasks", name, batch))
+        results.put(("done", None))
+    except Exception as e:
+        results.put(("error", str(e)))
+    finally:
+        if store is not None:
+            store.close()
+
+def ease_out_cubic(t):
+    """缓出曲线"""
+    return 1 - (1 - t) ** 3
+
+class ChangeEvent:
+    """数据变更事件"""
+    CATEGORIES = "categories"   # 类别增删、改名或排序
+    COUNTS = "counts"           # 类别的完成计数变化
+    TASKS = "tasks"             # 某个类别中的任务增删改
+    SELECTION = "selection"     # 当前类别切换
+
+    __slots__ = ("kind", "category", "renamed", "tasks", "removed")
+
+    def __init__(self, kind, category=None, renamed=None, tasks=None, removed=None):
+        self.kind = kind
+        self.category = category    # None 表示影响所有类别
+        self.renamed = renamed      # 类别改名时为 {旧名: 新名}
+        # 只有个别任务变化时列出这些任务，订阅者可以只处理它们；都为 None 时视为整个类别变化
+        self.tasks = tasks          # 新增或修改的任务
+        self.removed = removed      # 移出该类别或删除的任务
+
+class EventBus:
+    """收集数据变更事件，在空闲时一次性通知订阅的视图"""
+
+    def __init__(self, root):
+        self.root = root
+        self.subscribers = []   # [(callback, kinds)]，按订阅顺序通知
+        self.pending = []
+        self.flush_job = None
+
+    def subscribe(self, callback, *kinds):
+        """订阅事件；每次批量通知时 callback 只调用一次，参数为相关事件列表"""
+        self.subscribers.append((callback, set(kinds)))
+
+    def publish(self, kind, category=None, renamed=None, tasks=None, removed=None):
+        self.pending.append(ChangeEvent(kind, category, renamed, tasks, removed))
+        if self.flush_job is None:
+            self.flush_job = self.root.after_idle(self.flush)
+
+    def flush(self):
+        """立即处理所有待通知的事件"""
+        if self.flush_job is not None:
+            self.root.after_cancel(self.flush_job)
+            self.flush_job = None
+        events, self.pending = self.pending, []
+        if not events:
+            return
+        for callback, kinds in self.subscribers:
+            matched = [event for event in events if event.kind in kinds]
+            if matched:
+                try:
+                    callback(matched)
+                except Exception as e:
+                    print(f"Error handling change events: {str(e)}")
+
+class TimerRegistry:
+    """按所属控件登记 after 回调，控件销毁时自动取消，避免回调落到已销毁的控件上"""
+
+    def __init__(self, root):
+        self.root = root
+        self.timers = {}    # 控件路径 -> {after id}
+        self.owners = {}    # after id -> 控件路径
+
+    def after(self, owner, delay_ms, callback):
+        """延迟 delay_ms 毫秒执行 callback，owner 销毁时自动取消"""
+        return self.schedule(owner, callback, delay_ms)
+
+    def after_idle(self, owner, callback):
+        """空闲时执行 callback，owner 销毁时自动取消"""
+        return self.schedule(owner, callback, None)
+
+    def schedule(self, owner, callback, delay_ms):
+        key = str(owner)
+        if key not in self.timers:
+            self.timers[key] = set()
+            # 根窗口与程序同生命周期，不需要监听销毁
+            if owner is not self.root:
+                # 直接绑定到控件本身（CTk 控件的 bind 只绑定到内部画布）
+                tk.Misc.bind(owner, "<Destroy>",
+                             lambda event: self.on_destroy(event, key), "+")
+        
+        def run():
+            self.forget(after_id)
+            callback()
+        
+        if delay_ms is None:
+            after_id = self.root.after_idle(run)
+        else:
+            after_id = self.root.after(delay_ms, run)
+        self.timers[key].add(after_id)
+        self.owners[after_id] = key
+        return after_id
+
+    def forget(self, after_id):
+        key = self.owners.pop(after_id, None)
+        if key is not None:
+            self.timers[key].discard(after_id)
+
+    def cancel(self, after_id):
+        """取消一个回调（已执行或已取消的忽略）"""
+        if after_id in self.owners:
+            self.root.after_cancel(after_id)
+            self.forget(after_id)
+
+    def cancel_all(self, owner):
+        """取消 owner 的所有回调"""
+        for after_id in list(self.timers.get(str(owner), ())):
+            self.cancel(after_id)
+
+    def on_destroy(self, event, key):
+        # 顶层窗口会收到子控件的 <Destroy>，只处理自身的
+        if str(event.widget) != key:
+            return
+        for after_id in self.timers.pop(key, ()):
+            self.owners.pop(after_id, None)
+            try:
+                self.root.after_cancel(after_id)
+            except tk.TclError:
+                pass
+
+    def live_count(self, owner=None):
+        """尚未执行的回调数量（默认统计全部）"""
+        if owner is None:
+            return len(self.owners)
+        return len(self.timers.get(str(owner), ()))
+
+class AnimationScheduler:
+    """用同一个定时器驱动所有动画，进度按单调时钟计算，迟到的帧直接跳到对应进度"""
+
+    def __init__(self, root, frame_ms=16):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.animations = {}      # 动画名称 -> 动画状态
+        self.tick_job = None
+        self.last_tick = None
+        self.dropped_frames = 0   # 因定时器迟到而跳过的帧数
+
+    def animate(self, key, start, end, duration_ms, on_update, on_done=None, easing=ease_out_cubic):
+        """启动动画；同名动画正在进行时会被替换，start 为 None 时从它当前的值继续"""
+        current = self.animations.get(key)
+        if start is None:
+            start = current["value"] if current else end
+        
+        self.animations[key] = {
+            "start": start,
+            "end": end,
+            "value": start,
+            "start_time": time.monotonic(),
+            "duration": max(duration_ms, 1) / 1000,
+            "on_update": on_update,
+            "on_done": on_done,
+            "easing": easing,
+        }
+        
+        if self.tick_job is None:
+            self.last_tick = time.monotonic()
+            self.tick_job = self.root.after(self.frame_ms, self.tick)
+
+    def cancel(self, key):
+        """取消动画（不调用完成回调）"""
+        self.animations.pop(key, None)
+        if not self.animations and self.tick_job is not None:
+            self.root.after_cancel(self.tick_job)
+            self.tick_job = None
+
+    def is_running(self, key):
+        return key in self.animations
+
+    def tick(self):
+        """推进所有正在进行的动画"""
+        self.tick_job = None
+        now = time.monotonic()
+        
+        # 统计丢帧
+        late_frames = int((now - self.last_tick) * 1000 / self.frame_ms) - 1
+        if late_frames > 0:
+            self.dropped_frames += late_frames
+        self.last_tick = now
+        
+        finished = []
+        for key, animation in list(self.animations.items()):
+            progress = min(1.0, (now - animation["start_time"]) / animation["duration"])
+            value = animation["start"] + (animation["end"] - animation["start"]) * animation["easing"](progress)
+            animation["value"] = value
+            try:
+                animation["on_update"](value)
+            except Exception as e:
+                print(f"Animation error: {str(e)}")
+                progress = 1.0
+            if progress >= 1.0:
+                finished.append((key, animation))
+        
+        for key, animation in finished:
+            # 回调中可能已经启动了同名的新动画
+            if self.animations.get(key) is animation:
+                del self.animations[key]
+            if animation["on_done"]:
+                try:
+                    animation["on_done"]()
+                except Exception as e:
+                    print(f"Animation completion error: {str(e)}")
+        
+        if self.animations:
+            self.tick_job = self.root.after(self.frame_ms, self.tick)
+
+class WindowDock:
+    """窗口顶部停靠与自动隐藏：显式状态机，窗口几何信息来自缓存，不轮询指针位置"""
+
+    FLOATING = "floating"   # 未停靠
+    SHOWN = "shown"         # 已停靠并完整显示
+    HIDING = "hiding"       # 已停靠，等待收起
+    HIDDEN = "hidden"       # 已停靠并收起（或正在收起）
+
+    def __init__(self, root, animations, timers, dock_width=350, dock_height=5,
+                 hide_delay=500, snap_distance=20, margin=2):
+        self.root = root
+        self.animations = animations
+        self.timers = timers
+        self.dock_width = dock_width        # 收起时的固定宽度
+        self.dock_height = dock_height      # 收起时露出的高度
+        self.hide_delay = hide_delay        # 鼠标离开后多久收起（毫秒）
+        self.snap_distance = snap_distance  # 距离顶部多近时停靠
+        self.margin = margin                # 判断鼠标是否离开时的余量
+        
+        self.state = self.FLOATING
+        self.moving = False
+        self.full_size = None               # 停靠前的 (宽, 高)
+        self.hide_timer = None
+        
+        # 缓存窗口位置和大小，由 <Configure> 事件更新
+        self.x = root.winfo_x()
+        self.y = root.winfo_y()
+        self.width = root.winfo_width()
+        self.height = root.winfo_height()
+        self.screen_width = root.winfo_screenwidth()
+        
+        root.bind("<Configure>", self.on_configure, add="+")
+        root.bind("<Enter>", self.on_enter, add="+")
+        root.bind("<Leave>", self.on_leave, add="+")
+
+    @property
+    def is_docked(self):
+        return self.state != self.FLOATING
+
+    def on_configure(self, event):
+        """更新缓存的窗口几何信息（子控件的事件也会冒泡到这里，需要过滤）"""
+        if event.widget is self.root:
+            self.x, self.y = event.x, event.y
+            self.width, self.height = event.width, event.height
+
+    def contains(self, x_root, y_root):
+        """判断屏幕坐标是否在窗口范围内"""
+        margin = self.margin
+        return (self.x - margin <= x_root <= self.x + self.width + margin and
+                self.y - margin <= y_root <= self.y + self.height + margin)
+
+    def on_enter(self, event):
+        """鼠标进入窗口区域"""
+        if self.moving:
+            return
+        if self.state in (self.HIDING, self.HIDDEN):
+            self.show()
+
+    def on_leave(self, event):
+        """鼠标离开窗口区域（移入子控件时坐标仍在窗口内，忽略）"""
+        if self.moving or self.state != self.SHOWN:
+            return
+        if not self.contains(event.x_root, event.y_root):
+            self.schedule_hide()
+
+    def begin_move(self):
+        """开始拖动窗口"""
+        self.moving = True
+        self.cancel_timers()
+
+    def end_move(self):
+        """拖动结束：靠近顶部时停靠，离开顶部时取消停靠"""
+        self.moving = False
+        if self.y < self.snap_distance:
+            if not self.is_docked:
+                self.dock()
+        elif self.is_docked:
+            self.undock()
+
+    def dock(self):
+        """停靠到屏幕顶部，稍后自动收起"""
+        self.full_size = (self.width, self.height)
+        self.state = self.SHOWN
+        self.root.wm_geometry(f"+{self.x}+0")
+        self.schedule_hide()
+
+    def restore(self, x, width, height):
+        """恢复上次退出时的停靠状态（窗口已放在屏幕顶部）"""
+        self.x, self.y, self.width, self.height = x, 0, width, height
+        self.full_size = (width, height)
+        self.state = self.SHOWN
+        self.schedule_hide()
+
+    def undock(self):
+        """取消停靠，恢复原来的大小"""
+        if not self.is_docked:
+            return
+        self.cancel_timers()
+        # 显示动画进行到一半时状态已是 SHOWN，但窗口还没到完整大小
+        interrupted = self.animations.is_running("dock")
+        self.animations.cancel("dock")
+        if (interrupted or self.state != self.SHOWN) and self.full_size:
+            width, height = self.full_size
+            self.root.geometry(f"{width}x{height}+{self.x}+{self.y}")
+        self.state = self.FLOATING
+        self.full_size = None
+
+    def schedule_hide(self):
+        """计划收起窗口"""
+        self.cancel_timers()
+        self.state = self.HIDING
+        self.hide_timer = self.timers.after(self.root, self.hide_delay, self.hide)
+
+    def hide(self):
+        """收起窗口，只留下一小部分"""
+        self.hide_timer = None
+        if self.state != self.HIDING:
+            return
+        self.state = self.HIDDEN
+        self.animate_to(self.x, self.dock_width, self.dock_height)
+
+    def show(self):
+        """显示完整窗口"""
+        self.cancel_timers()
+        if not self.is_docked or not self.full_size:
+            return
+        self.state = self.SHOWN
+        width, height = self.full_size
+        # 确保窗口不超出屏幕右边界
+        x = min(self.x, max(0, self.screen_width - width))
+        self.animate_to(x, width, height)
+
+    def animate_to(self, x, width, height, duration=150):
+        """以动画方式调整窗口大小（同时进行的停靠动画会被替换）"""
+        start_width, start_height = self.width, self.height
+        
+        def update_size(progress):
+            new_width = round(start_width + (width - start_width) * progress)
+            new_height = round(start_height + (height - start_height) * progress)
+            self.root.geometry(f"{new_width}x{new_height}+{x}+0")
+        
+        self.animations.animate("dock", 0.0, 1.0, duration, update_size)
+
+    def cancel_timers(self):
+        """取消收起定时器"""
+        if self.hide_timer:
+            self.timers.cancel(self.hide_timer)
+            self.hide_timer = None
+
+class StyleRegistry:
+    """记录控件属性与颜色名称的对应关系，切换主题时直接更新已有控件"""
+
+    def __init__(self):
+        # 控件 -> {属性名: 颜色名}，控件销毁后自动移除
+        self.entries = weakref.WeakKeyDictionary()
+        # 自行绘制的组件（如画布列表、菜单）在主题切换时收到新的配色
+        self.listeners = []
+
+    def register(self, widget, **options):
+        """登记控件属性使用的颜色名称，例如 register(frame, fg_color="bg")"""
+        self.entries.setdefault(widget, {}).update(options)
+        return widget
+
+    def unregister(self, widget, *options):
+        """取消登记（不指定属性时取消该控件的全部登记）"""
+        if not options:
+            self.entries.pop(widget, None)
+            return
+        registered = self.entries.get(widget)
+        if registered:
+            for option in options:
+                registered.pop(option, None)
+
+    def add_listener(self, callback):
+        """登记主题切换回调 callback(colors)"""
+        self.listeners.append(callback)
+
+    def apply(self, old_colors, colors):
+        """一次性更新所有登记的控件，只修改颜色实际变化的属性"""
+        for widget, options in list(self.entries.items()):
+            changes = {
+                option: colors[token]
+                for option, token in options.items()
+                if old_colors.get(token) != colors[token]
+            }
+            if not changes:
+                continue
+            try:
+                widget.configure(**changes)
+            except tk.TclError:
+                # 控件已被销毁
+                self.entries.pop(widget, None)
+        
+        for callback in self.listeners:
+            callback(colors)
+
+class OutsideClickDispatcher:
+    """统一处理“点击弹出区域以外”的事件，整个程序只绑定一次 <Button-1>"""
+
+    def __init__(self, root):
+        self.root = root
+        self.popups = {}   # 弹出区域 -> [contains(event), on_outside(), 是否已生效]
+        root.bind_all("<Button-1>", self.dispatch, add="+")
+
+    def register(self, owner, contains, on_outside):
+        """登记弹出区域；登记在空闲时才生效，避免打开它的那次点击立即把它关掉"""
+        entry = [contains, on_outside, False]
+        self.popups[owner] = entry
+        self.root.after_idle(lambda: entry.__setitem__(2, True))
+
+    def unregister(self, owner):
+        self.popups.pop(owner, None)
+
+    def dispatch(self, event):
+        for owner, (contains, on_outside, armed) in list(self.popups.items()):
+            if armed and not contains(event):
+                on_outside()
+
+    @staticmethod
+    def inside(event, *widgets):
+        """判断事件是否发生在这些控件（或其子控件）内，只比较控件路径，不查询几何信息"""
+        name = str(event.widget)
+        for widget in widgets:
+            path = str(widget)
+            if name == path or name.startswith(path + "."):
+                return True
+        return False
+
 class CustomMenu(ctk.CTkFrame):
-    def __init__(self, master, text, commands, colors, **kwargs):
+    # 当前打开的菜单，同一时间只打开一个
+    open_menu = None
+
+    def __init__(self, master, text, commands, colors, click_dispatcher, timers, **kwargs):
         super().__init__(master, fg_color="transparent", **kwargs)
         self.master = master  # 保存主窗口引用
         self.colors = colors
         self.commands = commands
-        self.dropdown = None
+        self.click_dispatcher = click_dispatcher
+        self.timers = timers
+        self.dropdown = None          # 下拉窗口，第一次打开时创建，之后复用
+        self.dropdown_visible = False
+        self.leave_timer = None
         
         # 创建菜单按钮
         self.menu_button = ctk.CTkButton(
@@ -41,127 +597,108 @@ class CustomMenu(ctk.CTkFrame):
             command=self.show_dropdown
         )
         self.menu_button.pack(fill="x")
+
+    def build_dropdown(self):
+        """创建下拉菜单窗口（只创建一次）"""
+        self.dropdown = tk.Toplevel()
+        self.dropdown.withdraw()  # 先隐藏窗口
+        self.dropdown.overrideredirect(True)
+        self.dropdown.attributes('-topmost', True)
+        
+        # 设置 Toplevel 窗口的背景色
+        self.dropdown.configure(bg=self.colors["sidebar"])
+        
+        # 创建下拉菜单框架
+        self.dropdown_frame = ctk.CTkFrame(
+            self.dropdown,
+            fg_color=self.colors["sidebar"],
+            border_width=1,
+            border_color=self.colors["border"]
+        )
+        self.dropdown_frame.pack(fill="both", expand=True, padx=0, pady=0)
+        
+        # 添加菜单项
+        self.dropdown_buttons = []
+        self.dropdown_separators = []
+        for label, command in self.commands.items():
+            if label == "-":  # 分隔线
+                separator = ctk.CTkFrame(
+                    self.dropdown_frame,
+                    height=1,
+                    fg_color=self.colors["border"]
+                )
+                separator.pack(fill="x", padx=5, pady=2)
+                self.dropdown_separators.append(separator)
+            else:
+                btn = ctk.CTkButton(
+                    self.dropdown_frame,
+                    text=label,
+                    font=("微软雅黑", 11),
+                    fg_color="transparent",
+                    text_color=self.colors["text"],
+                    hover_color=self.colors["hover"],
+                    anchor="w",
+                    height=30,
+                    command=lambda c=command: self.execute_command(c)
+                )
+                btn.pack(fill="x", padx=1, pady=1)
+                self.dropdown_buttons.append(btn)
+        
+        # 鼠标离开一段时间后收起，重新进入则取消（子控件的事件也会传到窗口上）
+        self.dropdown.bind("<Leave>", self.on_menu_leave)
+        self.dropdown.bind("<Enter>", self.on_menu_enter)
         
     def show_dropdown(self):
-        # 如果有其他打开的菜单，先关闭它们
-        for widget in self.master.winfo_children():
-            if isinstance(widget, CustomMenu) and widget != self:
-                if widget.dropdown is not None:
-                    widget.hide_dropdown()
+        if self.dropdown_visible:
+            self.hide_dropdown()
+            return
+        
+        # 如果有其他打开的菜单，先关闭它
+        if CustomMenu.open_menu is not None and CustomMenu.open_menu is not self:
+            CustomMenu.open_menu.hide_dropdown()
         
         if self.dropdown is None:
-            # 获取菜单按钮位置
-            x = self.winfo_rootx()
-            y = self.winfo_rooty() + self.winfo_height()
-            
-            # 创建下拉菜单窗口
-            self.dropdown = tk.Toplevel()
-            self.dropdown.withdraw()  # 先隐藏窗口
-            self.dropdown.overrideredirect(True)
-            
-            # 设置 Toplevel 窗口的背景色
-            self.dropdown.configure(bg=self.colors["sidebar"])
-            
-            # 创建下拉菜单框架
-            menu_frame = ctk.CTkFrame(
-                self.dropdown,
-                fg_color=self.colors["sidebar"],
-                border_width=1,
-                border_color=self.colors["border"]
-            )
-            menu_frame.pack(fill="both", expand=True, padx=0, pady=0)
-            
-            # 添加菜单项
-            for label, command in self.commands.items():
-                if label == "-":  # 分隔线
-                    separator = ctk.CTkFrame(
-                        menu_frame,
-                        height=1,
-                        fg_color=self.colors["border"]
-                    )
-                    separator.pack(fill="x", padx=5, pady=2)
-                else:
-                    btn = ctk.CTkButton(
-                        menu_frame,
-                        text=label,
-                        font=("微软雅黑", 11),
-                        fg_color="transparent",
-                        text_color=self.colors["text"],
-                        hover_color=self.colors["hover"],
-                        anchor="w",
-                        height=30,
-                        command=lambda c=command: self.execute_command(c)
-                    )
-                    btn.pack(fill="x", padx=1, pady=1)
-            
-            # 设置窗口位置并显示
-            self.dropdown.geometry(f"+{x}+{y}")
-            self.dropdown.update_idletasks()
-            self.dropdown.deiconify()
-            self.dropdown.attributes('-topmost', True)
-            
-            # 绑定事件
-            self.dropdown.bind("<Leave>", self.on_menu_leave)
-            self.winfo_toplevel().bind_all("<Button-1>", self.on_click_outside, "+")
-        else:
-            self.hide_dropdown()
+            self.build_dropdown()
+        
+        # 设置窗口位置并显示
+        x = self.winfo_rootx()
+        y = self.winfo_rooty() + self.winfo_height()
+        self.dropdown.geometry(f"+{x}+{y}")
+        self.dropdown.deiconify()
+        self.dropdown.lift()
+        
+        self.dropdown_visible = True
+        CustomMenu.open_menu = self
+        self.click_dispatcher.register(
+            self,
+            lambda event: OutsideClickDispatcher.inside(event, self.dropdown, self),
+            self.hide_dropdown
+        )
 
     def on_menu_leave(self, event):
         """处理鼠标离开菜单事件"""
-        if self.dropdown:
-            # 获取当前鼠标位置
-            x = self.dropdown.winfo_pointerx()
-            y = self.dropdown.winfo_pointery()
-            
-            # 检查鼠标是否真的离开了菜单区域
-            menu_x = self.dropdown.winfo_x()
-            menu_y = self.dropdown.winfo_y()
-            menu_width = self.dropdown.winfo_width()
-            menu_height = self.dropdown.winfo_height()
-            
-            # 只有当鼠标真的离开菜单区域时才隐藏
-            if not (menu_x <= x <= menu_x + menu_width and 
-                   menu_y <= y <= menu_y + menu_height):
-                self.dropdown.after(200, self.check_mouse_position)
-
-    def check_mouse_position(self):
-        """检查鼠标位置，决定是否隐藏菜单"""
-        if self.dropdown:
-            x = self.dropdown.winfo_pointerx()
-            y = self.dropdown.winfo_pointery()
-            menu_x = self.dropdown.winfo_x()
-            menu_y = self.dropdown.winfo_y()
-            menu_width = self.dropdown.winfo_width()
-            menu_height = self.dropdown.winfo_height()
-            
-            if not (menu_x <= x <= menu_x + menu_width and 
-                   menu_y <= y <= menu_y + menu_height):
-                self.hide_dropdown()
-
-    def on_click_outside(self, event):
-        """处理点击其他区域事件"""
-        if self.dropdown:
-            x = event.x_root
-            y = event.y_root
-            menu_x = self.dropdown.winfo_x()
-            menu_y = self.dropdown.winfo_y()
-            menu_width = self.dropdown.winfo_width()
-            menu_height = self.dropdown.winfo_height()
-            
-            if not (menu_x <= x <= menu_x + menu_width and 
-                   menu_y <= y <= menu_y + menu_height):
-                self.hide_dropdown()
+        if self.dropdown_visible and self.leave_timer is None:
+            self.leave_timer = self.timers.after(self.dropdown, 200, self.hide_dropdown)
+
+    def on_menu_enter(self, event):
+        """鼠标回到菜单内，取消收起"""
+        if self.leave_timer is not None:
+            self.timers.cancel(self.leave_timer)
+            self.leave_timer = None
 
     def hide_dropdown(self, event=None):
-        """隐藏下拉菜单"""
-        if self.dropdown:
-            try:
-                self.winfo_toplevel().unbind_all("<Button-1>")
-                self.dropdown.destroy()
-            except:
-                pass
-            finally:
-                self.dropdown = None
+        """隐藏下拉菜单（保留窗口供下次使用）"""
+        if self.leave_timer is not None:
+            self.timers.cancel(self.leave_timer)
+            self.leave_timer = None
+        if not self.dropdown_visible:
+            return
+        
+        self.dropdown.withdraw()
+        self.dropdown_visible = False
+        self.click_dispatcher.unregister(self)
+        if CustomMenu.open_menu is self:
+            CustomMenu.open_menu = None
 
     def execute_command(self, command):
         """执行菜单命令"""
@@ -176,38 +713,657 @@ class CustomMenu(ctk.CTkFrame):
             text_color=colors["text"],
             hover_color=colors["hover"]
         )
+        if self.dropdown is not None:
+            self.dropdown.configure(bg=colors["sidebar"])
+            self.dropdown_frame.configure(fg_color=colors["sidebar"], border_color=colors["border"])
+            for separator in self.dropdown_separators:
+                separator.configure(fg_color=colors["border"])
+            for btn in self.dropdown_buttons:
+                btn.configure(text_color=colors["text"], hover_color=colors["hover"])
+
+class NgramIndex:
+    """单个类别中任务文本的 n-gram 索引，输入筛选文字时逐步缩小结果
+
+    任务以 id(task) 作为键：任务字典在内存中一直是同一个对象，编辑时原地修改。
+    """
+
+    N = 2
+
+    def __init__(self):
+        self.texts = {}       # id(task) -> 小写文本
+        self.grams = {}       # 单字和 n-gram -> id(task) 集合
+        self.last_query = None
+        self.last_result = None
+
+    def grams_of(self, text):
+        """文本中的全部单字和 n-gram"""
+        grams = set(text)
+        grams.update(text[i:i + self.N] for i in range(len(text) - self.N + 1))
+        return grams
+
+    def query_grams(self, query):
+        """查询只需要用到最长的 gram"""
+        if len(query) < self.N:
+            return {query}
+        return {query[i:i + self.N] for i in range(len(query) - self.N + 1)}
+
+    def add(self, key, text):
+        self.remove(key)
+        text = text.lower()
+        self.texts[key] = text
+        for gram in self.grams_of(text):
+            self.grams.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        for gram in self.grams_of(text):
+            keys = self.grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self.grams[gram]
+
+    def sync(self, tasks):
+        """与类别当前的任务列表同步，只重新索引新增或文本变化的任务"""
+        current = {id(task): task["text"].lower() for task in tasks}
+        for key in self.texts.keys() - current.keys():
+            self.remove(key)
+        for key, text in current.items():
+            if self.texts.get(key) != text:
+                self.add(key, text)
+        self.last_query = None
+
+    def search(self, query):
+        """返回文本包含 query 的任务键集合；query 在上一次查询后面追加字符时只在上次结果中筛选"""
+        query = query.lower()
+        grams = self.query_grams(query)
+        if self.last_query is not None and query.startswith(self.last_query):
+            candidates = self.last_result
+            grams -= self.query_grams(self.last_query)
+        else:
+            candidates = None
+        for gram in sorted(grams, key=lambda g: len(self.grams.get(g, ()))):
+            keys = self.grams.get(gram, set())
+            candidates = keys if candidates is None else candidates & keys
+            if not candidates:
+                break
+        if len(query) <= self.N:
+            result = set(candidates)
+        else:
+            # n-gram 都出现不代表它们相邻，最后确认一次
+            result = {key for key in candidates if query in self.texts[key]}
+        self.last_query, self.last_result = query, result
+        return result
+
+# 优先级在任务文字前显示的标记
+PRIORITY_MARKS = {1: "!", 2: "!!", 3: "!!!"}
+PRIORITY_NAMES = {3: "高", 2: "中", 1: "低", 0: "无"}
+
+def display_text(task):
+    """任务列表中显示的文字（带优先级标记和截止时间）"""
+    mark = PRIORITY_MARKS.get(task.get("priority", 0))
+    text = f"{mark} {task['text']}" if mark else task["text"]
+    if task.get("due_date") and not task["completed"]:
+        text = f"{text}  · 截止 {task['due_date'][5:]}"
+    return text
+
+def is_overdue(task):
+    """未完成且截止时间已过"""
+    return not task["completed"] and bool(task.get("due_date")) and task["due_date"] <= now()
+
+INVERT_DIGITS = str.maketrans("0123456789", "9876543210")
+
+def newest_first(date):
+    """日期字符串按升序排列时最新的在前；没有日期的排在最后"""
+    return date.translate(INVERT_DIGITS) if date else "~"
+
+# 排序方式：名称 -> (显示名称, 排序键)；排序键按升序排列即为显示顺序
+TASK_SORT_KEYS = {
+    "manual": ("添加顺序", None),
+    "created": ("创建时间", lambda task: newest_first(task["created_date"])),
+    "completed": ("完成时间", lambda task: newest_first(task["completed_date"])),
+    "text": ("文字", lambda task: task["text"].casefold()),
+    "priority": ("优先级", lambda task: -task.get("priority", 0)),
+    "due": ("截止时间", lambda task: task.get("due_date") or "~"),
+}
+
+class SortedTaskIndex:
+    """一个类别中按 (完成状态, 主排序键, 次排序键, 序号) 排好序的任务
+
+    修改单个任务时用二分查找删除旧位置、插入新位置，不需要重新排序整个类别。
+    序号是任务在类别中的先后，保证键唯一，相同排序键的任务保持添加顺序。
+    """
+
+    def __init__(self, primary, secondary=None):
+        self.fields = [TASK_SORT_KEYS[name][1] for name in (primary, secondary)
+                       if name is not None and TASK_SORT_KEYS[name][1] is not None]
+        self.keys = []
+        self.tasks = []
+        self.entries = {}    # id(task) -> 排序键
+        self.next_seq = 0
+
+    def key_of(self, task, seq):
+        return (task["completed"], *(field(task) for field in self.fields), seq)
+
+    def sync(self, tasks):
+        """按类别中的全部任务重建"""
+        items = sorted((self.key_of(task, i), task) for i, task in enumerate(tasks))
+        self.keys = [key for key, _ in items]
+        self.tasks = [task for _, task in items]
+        self.entries = {id(task): key for key, task in items}
+        self.next_seq = len(tasks)
+
+    def update(self, task):
+        """添加任务，或在任务修改后移动到新位置"""
+        old = self.entries.get(id(task))
+        if old is None:
+            seq, self.next_seq = self.next_seq, self.next_seq + 1
+        else:
+            seq = old[-1]
+        key = self.key_of(task, seq)
+        if key == old:
+            return
+        self.remove(task)
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.tasks.insert(i, task)
+        self.entries[id(task)] = key
+
+    def remove(self, task):
+        key = self.entries.pop(id(task), None)
+        if key is None:
+            return
+        i = bisect.bisect_left(self.keys, key)
+        del self.keys[i]
+        del self.tasks[i]
+
+    def sections(self):
+        """(未完成的任务, 已完成的任务)，各自按排序键排列"""
+        i = bisect.bisect_left(self.keys, (True,))
+        return self.tasks[:i], self.tasks[i:]
+
+class DeadlineScheduler:
+    """截止时间和提醒时间的最小堆，只用一个 after 定时到最近的一项，不轮询
+
+    任务修改后直接压入新的条目；旧条目留在堆中，到达堆顶时发现时间已经不是任务
+    当前的时间就丢弃。已经过去的时间不登记（逾期状态在显示时判断）。
+    """
+    FIELDS = (("due", "due_date"), ("remind", "remind_at"))
+    MAX_DELAY_MS = 24 * 3600 * 1000   # 更远的时间先定时一天，到时再重新定时
+
+    def __init__(self, timers, owner, on_fire):
+        self.timers = timers
+        self.owner = owner
+        self.on_fire = on_fire      # on_fire([(类型, 任务)])，类型为 "due" 或 "remind"
+        self.heap = []              # (时间, 序号, 类型, 任务)
+        self.current = {}           # (任务 id, 类型) -> 当前有效的时间
+        self.seq = 0
+        self.job = None
+        self.armed_at = None
+
+    def __len__(self):
+        return len(self.current)
+
+    def schedule(self, tasks):
+        """按任务当前的截止和提醒时间登记，然后重新定时"""
+        current_time = now()
+        for task in tasks:
+            for kind, field in self.FIELDS:
+                key = (task["id"], kind)
+                when = task.get(field)
+                if not when or when <= current_time:
+                    self.current.pop(key, None)
+                    continue
+                if self.current.get(key) == when:
+                    continue
+                self.current[key] = when
+                heapq.heappush(self.heap, (when, self.seq, kind, task))
+                self.seq += 1
+        # 失效的条目太多时整理一次
+        if len(self.heap) > 2 * len(self.current) + 64:
+            self.heap = [entry for entry in self.heap if self.is_valid(entry)]
+            heapq.heapify(self.heap)
+        self.arm()
+
+    def remove(self, tasks):
+        for task in tasks:
+            for kind, _ in self.FIELDS:
+                self.current.pop((task.get("id"), kind), None)
+        self.arm()
+
+    def clear(self):
+        self.heap.clear()
+        self.current.clear()
+        self.arm()
+
+    def is_valid(self, entry):
+        when, _, kind, task = entry
+        return self.current.get((task["id"], kind)) == when
+
+    def arm(self):
+        """定时到最近的有效条目；已经定时到同一时间时不变"""
+        heap = self.heap
+        while heap and not self.is_valid(heap[0]):
+            heapq.heappop(heap)
+        when = heap[0][0] if heap else None
+        if when == self.armed_at:
+            return
+        if self.job is not None:
+            self.timers.cancel(self.job)
+            self.job = None
+        self.armed_at = when
+        if when is None:
+            return
+        delay = (datetime.strptime(when, "%Y-%m-%d %H:%M") - datetime.now()).total_seconds() * 1000
+        self.job = self.timers.after(self.owner, int(min(max(delay, 0), self.MAX_DELAY_MS)) + 1,
+                                     self.fire)
+
+    def fire(self):
+        """弹出所有已到时间的条目，通知后定时到下一项"""
+        self.job = None
+        self.armed_at = None
+        current_time = now()
+        fired = []
+        while self.heap and self.heap[0][0] <= current_time:
+            entry = heapq.heappop(self.heap)
+            if self.is_valid(entry):
+                _, _, kind, task = entry
+                del self.current[(task["id"], kind)]
+                fired.append((kind, task))
+        if fired:
+            self.on_fire(fired)
+        self.arm()
+
+class TagIndex:
+    """标签 -> 位集：每个任务占一位，按标签查询时用整数的与、或、非代替逐个检查任务
+
+    任务以 id(task) 作为键，与 NgramIndex 相同。
+    """
+
+    def __init__(self):
+        self.slots = {}            # id(task) -> 位序号
+        self.entries = []          # 位序号 -> (任务, 类别, 文本)；空位为 None
+        self.free = []             # 可复用的位序号
+        self.bits = {}             # 标签 -> 位集
+        self.category_bits = {}    # 类别 -> 位集
+        self.slot_tags = {}        # 位序号 -> 标签列表
+
+    def set(self, task, category):
+        """添加任务，或在任务的文本、类别变化后更新它"""
+        text = task["text"]
+        slot = self.slots.get(id(task))
+        if slot is not None:
+            _, old_category, old_text = self.entries[slot]
+            if old_category == category and old_text == text:
+                return
+            self.remove_slot(slot)
+        
+        slot = self.free.pop() if self.free else len(self.entries)
+        if slot == len(self.entries):
+            self.entries.append(None)
+        self.entries[slot] = (task, category, text)
+        self.slots[id(task)] = slot
+        bit = 1 << slot
+        self.category_bits[category] = self.category_bits.get(category, 0) | bit
+        tags = parse_tags(text) if "#" in text else []
+        if tags:
+            self.slot_tags[slot] = tags
+            for tag in tags:
+                self.bits[tag] = self.bits.get(tag, 0) | bit
+
+    def remove_slot(self, slot):
+        task, category, _ = self.entries[slot]
+        mask = ~(1 << slot)
+        self.category_bits[category] &= mask
+        if not self.category_bits[category]:
+            del self.category_bits[category]
+        for tag in self.slot_tags.pop(slot, ()):
+            self.bits[tag] &= mask
+            if not self.bits[tag]:
+                del self.bits[tag]
+        del self.slots[id(task)]
+        self.entries[slot] = None
+        self.free.append(slot)
+
+    def sync(self, category, tasks):
+        """与类别当前的任务列表同步，移走或删除的任务从索引中去掉"""
+        current = set()
+        for task in tasks:
+            current.add(id(task))
+            self.set(task, category)
+        for slot in self.slots_of(self.category_bits.get(category, 0)):
+            if id(self.entries[slot][0]) not in current:
+                self.remove_slot(slot)
+
+    def drop_missing(self, categories):
+        """去掉已删除类别中的任务"""
+        for category in [c for c in self.category_bits if c not in categories]:
+            for slot in self.slots_of(self.category_bits[category]):
+                self.remove_slot(slot)
+
+    def query(self, terms, category=None):
+        """按 parse_tag_query 得到的条件求出位集，可限定在一个类别中"""
+        if category is None:
+            mask = 0
+            for bits in self.category_bits.values():
+                mask |= bits
+        else:
+            mask = self.category_bits.get(category, 0)
+        for negate, names in terms:
+            union = 0
+            for name in names:
+                union |= self.bits.get(name, 0)
+            mask = mask & ~union if negate else mask & union
+        return mask
+
+    def slots_of(self, mask):
+        """位集中为 1 的位序号"""
+        digits = bin(mask)[:1:-1]
+        slots = []
+        i = digits.find("1")
+        while i >= 0:
+            slots.append(i)
+            i = digits.find("1", i + 1)
+        return slots
+
+    def tasks_of(self, mask):
+        """位集中的任务，产生 (类别, 任务)"""
+        for slot in self.slots_of(mask):
+            task, category, _ = self.entries[slot]
+            yield category, task
+
+    def tag_counts(self):
+        return {tag: bin(bits).count("1") for tag, bits in self.bits.items()}
+
+class CanvasTaskList(ctk.CTkFrame):
+    """在单个 tk.Canvas 上绘制任务列表，只绘制可见行，适合任务量很大的类别"""
+
+    ROW_HEIGHT = 36      # 每行占用的高度（含行间距）
+    ROW_GAP = 4          # 行与行之间的间距
+    TASK_INDENT = 25     # 任务行相对分组标题的缩进
+    CHECKBOX_SIZE = 15
+
+    def __init__(self, master, colors, expand_symbols, on_toggle, on_select, on_context, **kwargs):
+        super().__init__(master, fg_color=colors["bg"], **kwargs)
+        self.colors = colors
+        self.expand_symbols = expand_symbols
+        self.on_toggle = on_toggle      # 点击复选框: on_toggle(task_index)
+        self.on_select = on_select      # 点击任务: on_select(task)
+        self.on_context = on_context    # 右键任务: on_context(event, task, task_index)
+
+        self.sections = []        # [(key, title, [(task_index, task), ...]), ...]
+        self.rows = []            # 扁平化后的行: ("header", key, title, count) 或 ("task", task_index, task)
+        self.collapsed = set()    # 已收起的分组
+        self.visible = None       # 筛选后要显示的任务（id(task) 集合），None 表示全部显示
+        self.selected_task = None
+        self.slots = []           # 复用的画布图元，每个可见行一组
+
+        # 只有任务很多时才用到画布列表，字体模块在这里再导入
+        import tkinter.font as tkFont
+        
+        # CTkFont 的字号是像素值，这里用负数保持一致
+        self.task_font = tkFont.Font(family="微软雅黑", size=-14)
+        self.header_font = tkFont.Font(family="微软雅黑", size=-14, weight="bold")
+
+        self.canvas = tk.Canvas(self,
+                                bg=colors["bg"],
+                                highlightthickness=0,
+                                bd=0,
+                                yscrollincrement=self.ROW_HEIGHT)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        # 绑定事件
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Button-3>", self.on_right_click)
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_units(3))
+
+    def set_sections(self, sections):
+        """设置要显示的分组，保持当前滚动位置"""
+        top = self.canvas.canvasy(0)
+        self.sections = sections
+        self.rebuild_rows()
+
+        total_height = len(self.rows) * self.ROW_HEIGHT
+        if total_height:
+            self.canvas.yview_moveto(min(top, total_height) / total_height)
+        self.redraw()
+
+    def rebuild_rows(self):
+        """把分组展开为行列表并更新滚动区域"""
+        self.rows = []
+        for key, title, items in self.sections:
+            if not items:
+                continue
+            self.rows.append(("header", key, title, len(items)))
+            if key not in self.collapsed:
+                visible = self.visible
+                self.rows.extend(("task", index, task) for index, task in items
+                                 if visible is None or id(task) in visible)
+
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(),
+                                            len(self.rows) * self.ROW_HEIGHT))
+
+    def set_filter(self, visible):
+        """只显示 visible 中的任务，None 表示全部显示"""
+        self.visible = visible
+        self.rebuild_rows()
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def set_selected(self, task):
+        """设置高亮显示的任务"""
+        if self.selected_task is not task:
+            self.selected_task = task
+            self.redraw()
+
+    def update_colors(self, colors):
+        """更新颜色"""
+        self.colors = colors
+        self.configure(fg_color=colors["bg"])
+        self.canvas.configure(bg=colors["bg"])
+        self.redraw()
+
+    def yview(self, *args):
+        """滚动条回调"""
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def scroll_units(self, units):
+        """按行滚动"""
+        self.canvas.yview_scroll(units, "units")
+        self.redraw()
+
+    def on_mousewheel(self, event):
+        """处理鼠标滚轮（Windows 上 delta 为 120 的倍数，macOS 上为较小的值）"""
+        if abs(event.delta) >= 120:
+            units = -int(event.delta / 120) * 3
+        else:
+            units = -event.delta
+        if units:
+            self.scroll_units(units)
+
+    def create_slot(self):
+        """创建一组可复用的行图元"""
+        canvas = self.canvas
+        return {
+            "bg": canvas.create_rectangle(0, 0, 0, 0, state="hidden"),
+            "bar": canvas.create_rectangle(0, 0, 0, 0, width=0, state="hidden"),
+            "box": canvas.create_oval(0, 0, 0, 0, state="hidden"),
+            "mark": canvas.create_line(0, 0, 0, 0, width=2, state="hidden"),
+            "text": canvas.create_text(0, 0, anchor="w", state="hidden"),
+            "strike": canvas.create_line(0, 0, 0, 0, state="hidden"),
+        }
+
+    def hide_slot(self, slot, names=None):
+        """隐藏一组行图元"""
+        for name in names or slot:
+            self.canvas.itemconfigure(slot[name], state="hidden")
+
+    def redraw(self):
+        """只绘制当前可见范围内的行"""
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1:
+            return
+
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.ROW_HEIGHT))
+        last = min(len(self.rows), int((top + height) // self.ROW_HEIGHT) + 1)
+
+        while len(self.slots) < last - first:
+            self.slots.append(self.create_slot())
+
+        for slot_index, slot in enumerate(self.slots):
+            row_index = first + slot_index
+            if row_index < last:
+                self.draw_row(slot, row_index, width)
+            else:
+                self.hide_slot(slot)
+
+    def draw_row(self, slot, row_index, width):
+        """把一行绘制到给定的图元组上"""
+        canvas = self.canvas
+        colors = self.colors
+        row = self.rows[row_index]
+        y0 = row_index * self.ROW_HEIGHT
+        y1 = y0 + self.ROW_HEIGHT - self.ROW_GAP
+        y_mid = (y0 + y1) / 2
+
+        if row[0] == "header":
+            _, key, title, count = row
+            symbol = self.expand_symbols["collapsed" if key in self.collapsed else "expanded"]
+            canvas.coords(slot["bg"], 0, y0, width - 1, y1)
+            canvas.itemconfigure(slot["bg"], fill=colors["sidebar"], outline=colors["border"], state="normal")
+            canvas.coords(slot["text"], 10, y_mid)
+            canvas.itemconfigure(slot["text"],
+                                 text=f"{symbol}  {title} ({count})",
+                                 font=self.header_font,
+                                 fill=colors["text"],
+                                 state="normal")
+            self.hide_slot(slot, ("bar", "box", "mark", "strike"))
+            return
+
+        _, _, task = row
+        completed = task["completed"]
+        x0 = self.TASK_INDENT
+
+        # 背景和状态指示条
+        fill = colors["selected"] if task is self.selected_task else colors["sidebar"]
+        canvas.coords(slot["bg"], x0, y0, width - 1, y1)
+        canvas.itemconfigure(slot["bg"], fill=fill, outline=colors["border"], state="normal")
+        canvas.coords(slot["bar"], x0, y0, x0 + 3, y1)
+        canvas.itemconfigure(slot["bar"],
+                             fill="#999999" if completed else
+                             colors["overdue"] if is_overdue(task) else colors["accent"],
+                             state="normal")
+
+        # 复选框
+        box_x0, box_x1 = self.checkbox_span()
+        box_y0 = y_mid - self.CHECKBOX_SIZE / 2
+        canvas.coords(slot["box"], box_x0, box_y0, box_x1, box_y0 + self.CHECKBOX_SIZE)
+        canvas.itemconfigure(slot["box"],
+                             fill=colors["accent"] if completed else colors["bg"],
+                             outline=colors["accent"] if completed else colors["border"],
+                             state="normal")
+        if completed:
+            canvas.coords(slot["mark"],
+                          box_x0 + 4, y_mid,
+                          box_x0 + 7, y_mid + 3,
+                          box_x0 + 11, y_mid - 3)
+            canvas.itemconfigure(slot["mark"], fill="white", state="normal")
+        else:
+            canvas.itemconfigure(slot["mark"], state="hidden")
+
+        # 任务文本
+        canvas.coords(slot["text"], box_x1 + 10, y_mid)
+        canvas.itemconfigure(slot["text"],
+                             text=display_text(task),
+                             font=self.task_font,
+                             fill="#AAAAAA" if completed else
+                             colors["overdue"] if is_overdue(task) else colors["text"],
+                             state="normal")
+
+        # 删除线
+        if completed:
+            bbox = canvas.bbox(slot["text"])
+            if bbox:
+                canvas.coords(slot["strike"], bbox[0], y_mid, bbox[2], y_mid)
+                canvas.itemconfigure(slot["strike"], fill="#AAAAAA", state="normal")
+        else:
+            canvas.itemconfigure(slot["strike"], state="hidden")
+
+    def checkbox_span(self):
+        """复选框的水平范围"""
+        x0 = self.TASK_INDENT + 13
+        return x0, x0 + self.CHECKBOX_SIZE
+
+    def row_at(self, event):
+        """根据鼠标位置找到对应的行"""
+        index = int(self.canvas.canvasy(event.y) // self.ROW_HEIGHT)
+        if 0 <= index < len(self.rows):
+            return self.rows[index]
+        return None
+
+    def on_click(self, event):
+        """处理左键点击：分组标题收起/展开，复选框切换状态，其余位置显示详情"""
+        row = self.row_at(event)
+        if row is None:
+            return
+
+        if row[0] == "header":
+            key = row[1]
+            if key in self.collapsed:
+                self.collapsed.discard(key)
+            else:
+                self.collapsed.add(key)
+            self.rebuild_rows()
+            self.redraw()
+            return
+
+        _, task_index, task = row
+        box_x0, box_x1 = self.checkbox_span()
+        if box_x0 - 4 <= self.canvas.canvasx(event.x) <= box_x1 + 4:
+            self.on_toggle(task_index)
+        else:
+            self.on_select(task)
+
+    def on_right_click(self, event):
+        """处理右键点击"""
+        row = self.row_at(event)
+        if row is not None and row[0] == "task":
+            _, task_index, task = row
+            self.on_context(event, task, task_index)
 
 class TaskManager:
-    def __init__(self, root):
+    def __init__(self, root, instance_server=None):
         self.root = root
         self.version = "V1.2"
         
-        # 设置窗口图标
+        # 设置窗口图标（缩放后的图标缓存在用户目录中）
         try:
-            # 加载并转换图标
-            icon_path = get_resource_path("logo.png")
-            icon_image = Image.open(icon_path)
-            # 创建临时ico文件
-            icon_image = icon_image.resize((32, 32))  # Windows图标推荐尺寸
-            
-            # 如果图片是PNG格式且有透明通道，需要确保它有RGBA模式
-            if 'A' not in icon_image.mode:
-                icon_image = icon_image.convert('RGBA')
-            
-            # 保存为临时ico文件
-            icon_image.save("temp_icon.ico", format='ICO', sizes=[(32, 32)])
-            
-            # 设置窗口图标
-            self.root.iconbitmap("temp_icon.ico")
-            
-            # 删除临时文件
-            os.remove("temp_icon.ico")
+            if sys.platform == "win32":
+                self.root.iconbitmap(get_cached_icon("logo.png", (32, 32), "ICO"))  # Windows图标推荐尺寸
+            else:
+                self.window_icon = tk.PhotoImage(file=get_cached_icon("logo.png", (32, 32)))
+                self.root.iconphoto(True, self.window_icon)
         except Exception as e:
             print(f"Error setting window icon: {str(e)}")
         
         # 初始化数据库
+        self.db_path = DB_PATH
         self.init_database()
         
+        # 上次退出时保存的界面状态；窗口位置和大小在窗口第一次显示之前恢复
+        self.read_ui_state()
+        self.docked_geometry = self.restore_window_geometry()
+        
         # 设置窗口基本属性
         self.root.title(f"BoBoMaker 智能清单 {self.version}")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -215,19 +1371,8 @@ class TaskManager:
         # 确保窗口已创建
         self.root.update_idletasks()
         
-        # 加载主题图标
-        self.theme_icons = {
-            "light": ctk.CTkImage(
-                light_image=Image.open(get_resource_path("icons/moon.png")),
-                dark_image=Image.open(get_resource_path("icons/moon.png")),
-                size=(20, 20)
-            ),
-            "dark": ctk.CTkImage(
-                light_image=Image.open(get_resource_path("icons/sun.png")),
-                dark_image=Image.open(get_resource_path("icons/sun.png")),
-                size=(20, 20)
-            )
-        }
+        # 主题图标在第一次用到时加载
+        self.theme_icons = {}
         
         # 定义展开/收起符号
         self.expand_symbols = {
@@ -235,42 +1380,29 @@ class TaskManager:
             "collapsed": "▶"
         }
         
-        try:
-            import ctypes
-            from ctypes import windll, wintypes
-            
-            # 获取窗口句柄
-            hwnd = windll.user32.GetParent(self.root.winfo_id())
-            
-            # 定义窗口样式常量
-            GWL_STYLE = -16
-            GWL_EXSTYLE = -20
-            WS_CAPTION = 0x00C00000
-            WS_THICKFRAME = 0x00040000
-            WS_EX_APPWINDOW = 0x00040000
-            
-            #口样式
-            style = windll.user32.GetWindowLongW(hwnd, GWL_STYLE)
-            
-            # 移除标题栏和边框
-            style &= ~(WS_CAPTION | WS_THICKFRAME)
-            
-            # 设置新样式
-            windll.user32.SetWindowLongW(hwnd, GWL_STYLE, style)
-            
-            # 设置扩展样式，确保在任务栏显示
-            exstyle = windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
-            exstyle |= WS_EX_APPWINDOW
-            windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, exstyle)
-            
-            # 强制更新窗口
-            windll.user32.SetWindowPos(
-                hwnd, 0, 0, 0, 0, 0,
-                0x0002 | 0x0004 | 0x0020  # SWP_NOMOVE | SWP_NOSIZE | SWP_FRAMECHANGED
-            )
-            
-        except Exception as e:
-            print(f"Error setting window style: {str(e)}")
+        # 任务数超过该值时改用画布绘制任务列表
+        self.canvas_render_threshold = 500
+        
+        # 分批创建任务行的设置
+        self.render_queue = deque()
+        self.render_job = None
+        
+        # 任务筛选：每个类别一个 n-gram 索引，以及控件渲染器中按显示顺序排列的任务行
+        self.filter_indexes = {}
+        self.tag_index = None       # 第一次按标签查询时建立
+        self.task_filter = ""
+        self.task_filter_keys = None
+        self.task_rows = []
+        self.hidden_task_rows = set()
+        # 任务排序和完成状态筛选；按添加顺序以外的方式排序时，每个类别维护一个有序索引
+        self.task_sort = {"primary": "manual", "secondary": None, "state": "all"}
+        self.sort_indexes = {}
+        self.render_slice_ms = 12          # 每批最多占用的时间（毫秒）
+        self.task_row_height_estimate = 44  # 估算的任务行高度，用于计算首屏行数
+        
+        # Windows 下去掉系统标题栏
+        if sys.platform == "win32":
+            self.apply_windows_style()
         
         # 设置主题
         ctk.set_default_color_theme("blue")
@@ -290,7 +1422,8 @@ class TaskManager:
                 "titlebar": "#F8F9FA",     # 标题栏背景色
                 "menubar": "#F8F9FA",      # 菜单栏背景色
                 "container": "#F8F9FA",    # 容器背景色
-                "selected": "#E6F0FF"      # 选中项背景色
+                "selected": "#E6F0FF",     # 选中项背景色
+                "overdue": "#E74C3C"       # 逾期任务
             },
             "dark": {
                 "bg": "#1A1B1E",           # 深色背景
@@ -305,13 +1438,29 @@ class TaskManager:
                 "titlebar": "#252526",     # 更深的标题背景色
                 "menubar": "#252526",      # 菜单背景色
                 "container": "#252526",    # 容器背色
-                "selected": "#2D3748"      # 选中项背景色
+                "selected": "#2D3748",     # 选中项背景色
+                "overdue": "#FF6B5B"       # 逾期任务
             }
         }
         
         # 加载主题设置
         self.load_theme_preference()
         
+        # 控件颜色登记表，用于原地切换主题
+        self.styles = StyleRegistry()
+        
+        # 统一的动画调度器
+        self.animations = AnimationScheduler(self.root)
+        
+        # 按控件管理的定时回调
+        self.timers = TimerRegistry(self.root)
+        
+        # 统一的“点击外部区域”处理
+        self.click_dispatcher = OutsideClickDispatcher(self.root)
+        
+        # 数据变更事件，视图按需订阅并在空闲时批量刷新
+        self.events = EventBus(self.root)
+        
         # 创建自定义标题栏
         self.create_title_bar()
         
@@ -319,18 +1468,63 @@ class TaskManager:
         self.root.bind("<Map>", self.on_map)
         self.root.bind("<Unmap>", self.on_unmap)
         
-        # 加载创建任务数据
-        self.categories = {
-            "工作": [],
-            "个人": [],
-            "学习": [],
-            "其他": []
-        }
-        self.current_category = "工作"
+        # 任务数据在后台线程中加载，加载完成前为空
+        self.categories = {}
+        self.current_category = None
         self.selected_task = None
+        self.loading = False
+        self.load_queue = None
+        self.pending_new_tasks = []   # 加载期间输入的任务，加载完成后再添加
+        
+        # 搜索结果窗口，分页显示
+        self.search_window = None
+        self.search_query = ""
+        self.search_offset = 0
+        self.search_page_size = 50
+        self.search_shown = set()
+        self.search_tag_results = None
+        
+        # 拼音搜索索引（任务 id -> 全拼和首字母），以及任务 id -> (类别, 任务) 的缓存
+        self.pinyin_index = PinyinIndex()
+        self.task_locations = None
+        
+        # 重复任务检测索引；加载的大批任务在空闲时分批计算签名
+        self.duplicate_index = DuplicateIndex()
+        self.duplicate_backlog = deque()
+        self.duplicate_removed = set()
+        self.duplicate_job = None
+        self.duplicate_search = None       # 正在分批查找的重复组 (生成器, 已找到的组)
+        self.duplicate_report_size = 100   # 报告中最多列出（也最多合并）的组数
+        
+        # 截止和提醒时间：最小堆加一个定时器，到时间时刷新逾期显示并弹出通知
+        self.deadlines = DeadlineScheduler(self.timers, self.root, self.on_deadlines)
+        self.notification = None
+        
+        # 界面状态（上次退出时保存）
+        self.collapsed_sections = set()   # 已收起的任务分组
+        self.pending_scroll = None        # 加载完成后要恢复的任务列表滚动位置
+        self.load_ui_state()
+        
+        # 智能视图：内置视图和用户定义的视图，加载完成后物化，之后随变更事件增量更新
+        self.smart_views = ([SmartView(definition, builtin=True) for definition in BUILTIN_VIEWS]
+                            + self.load_smart_views())
+        self.current_view = self.find_view(self.ui_state.get("selected_view"))
+        self.view_tasks = []            # 当前视图显示的 [(类别, 任务)]
+        self.view_button_map = {}
+        self.changed_views = set()      # 最近一批事件中内容有变化的视图
+        # 跨天后日期条件（例如“今天”）需要重新计算
+        self.timers.after(self.root, 60000, self.check_view_dates)
+        
+        # 每个类别的 [已完成数, 总数]，随增删改增量维护
+        self.category_counts = {}
         
         self.drag_data = {"widget": None, "y": 0}
         self.drag_window = None
+        self.press_data = None
+        self.drag_geometry = None       # 拖动开始时缓存的按钮位置
+        self.drag_placeholder = None    # 可复用的占位框
+        self.drag_motion_job = None
+        self.drag_frame_ms = 16         # 拖动处理的最小间隔，约等于一帧
         
         # 最后设置窗口样式并显示
         self.setup_window()
@@ -339,64 +1533,87 @@ class TaskManager:
         self.setup_gui()
         self.load_tasks()
         
-        # 添加窗口停靠相关的属性
-        self.is_docked = False
+        # 窗口停靠
         self.is_dragging = False  # 添加拖动状态标志
-        self.dock_timer = None
-        self.hide_timer = None
-        self.show_timer = None
-        self.dock_height = 5  # 隐藏时露出的高度
-        self.dock_width = 350  # 使用固定的停靠宽度
-        self.original_geometry = None  # 保存原始位置和大小
-        
-        # 绑定鼠标进入和离开事件
-        self.root.bind("<Enter>", self.on_mouse_enter)
-        self.root.bind("<Leave>", self.on_mouse_leave)
+        self.dock = WindowDock(self.root, self.animations, self.timers)
+        if self.docked_geometry is not None:
+            self.dock.restore(*self.docked_geometry)
+        
+        # 单实例：接收之后启动的实例转交的命令（由调用方开始监听）
+        self.instance_server = instance_server or InstanceServer()
+        self.instance_server.notify = self.notify_instance_command
+        self.root.bind("<<InstanceCommand>>", self.process_instance_commands)
+        # 主循环开始前收到的命令无法唤醒界面线程，开始后处理一次
+        self.timers.after(self.root, 100, self.process_instance_commands)
 
-    def init_database(self):
-        """初始化数据库"""
+    def apply_windows_style(self):
+        """移除 Windows 系统标题栏和边框，并保持在任务栏显示"""
         try:
-            self.conn = sqlite3.connect('bobomaker.db')
-            self.cursor = self.conn.cursor()
+            from ctypes import windll
             
-            # 创建类别表
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE,
-                    position INTEGER NOT NULL
-                )
-            ''')
+            # 获取窗口句柄
+            hwnd = windll.user32.GetParent(self.root.winfo_id())
             
-            # 创建任务表
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_id INTEGER,
-                    text TEXT NOT NULL,
-                    completed BOOLEAN NOT NULL DEFAULT 0,
-                    created_date TEXT NOT NULL,
-                    completed_date TEXT,
-                    FOREIGN KEY (category_id) REFERENCES categories (id)
-                )
-            ''')
+            # 定义窗口样式常量
+            GWL_STYLE = -16
+            GWL_EXSTYLE = -20
+            WS_CAPTION = 0x00C00000
+            WS_THICKFRAME = 0x00040000
+            WS_EX_APPWINDOW = 0x00040000
             
-            # 创建设置表
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL
-                )
-            ''')
+            #口样式
+            style = windll.user32.GetWindowLongW(hwnd, GWL_STYLE)
+            
+            # 移除标题栏和边框
+            style &= ~(WS_CAPTION | WS_THICKFRAME)
+            
+            # 设置新样式
+            windll.user32.SetWindowLongW(hwnd, GWL_STYLE, style)
+            
+            # 设置扩展样式，确保在任务栏显示
+            exstyle = windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+            exstyle |= WS_EX_APPWINDOW
+            windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, exstyle)
+            
+            # 强制更新窗口
+            windll.user32.SetWindowPos(
+                hwnd, 0, 0, 0, 0, 0,
+                0x0002 | 0x0004 | 0x0020  # SWP_NOMOVE | SWP_NOSIZE | SWP_FRAMECHANGED
+            )
             
-            self.conn.commit()
+        except Exception as e:
+            print(f"Error setting window style: {str(e)}")
+
+    def get_theme_icon(self, mode):
+        """按需加载主题按钮图标"""
+        icon = self.theme_icons.get(mode)
+        if icon is None:
+            # 亮色主题显示月亮，暗色主题显示太阳；缓存两倍大小，高分屏下仍然清晰
+            image = Image.open(get_cached_icon(
+                "icons/moon.png" if mode == "light" else "icons/sun.png", (40, 40)))
+            icon = ctk.CTkImage(light_image=image, dark_image=image, size=(20, 20))
+            self.theme_icons[mode] = icon
+        return icon
+
+    def init_database(self):
+        """初始化数据库"""
+        try:
+            self.store = TaskStore(self.db_path)
         except Exception as e:
             print(f"Database initialization error: {str(e)}")
 
+    def store_write(self, method, *args):
+        """执行一次数据库写入；失败时打印错误，内存中的数据保持不变"""
+        try:
+            return method(*args)
+        except Exception as e:
+            print(f"Error saving tasks: {str(e)}")
+
     def setup_gui(self):
         # 主容器
         self.main_frame = ctk.CTkFrame(self.root, fg_color=self.colors["bg"])
         self.main_frame.pack(fill="both", expand=True)
+        self.styles.register(self.main_frame, fg_color="bg")
         
         # 创建自定义菜单栏
         self.create_menu_bar()
@@ -413,13 +1630,13 @@ class TaskManager:
                                    border_color=self.colors["border"])
         self.sidebar.pack(side="left", fill="y", padx=(0, 5))
         self.sidebar.pack_propagate(False)
+        self.styles.register(self.sidebar, fg_color="sidebar", border_color="border")
         
         # 初始化侧边栏状态
         self.is_animating = False
         self.is_expanded = True
         self.sidebar_width = 120
         self.max_width = 120  # 在这里初始化 max_width
-        self.animation_id = None
         
         # 创建标题栏框架并保存引用
         self.title_bar_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
@@ -433,6 +1650,7 @@ class TaskManager:
             font=("微软雅黑", 13)
         )
         self.category_title.pack(side="left", padx=10)
+        self.styles.register(self.category_title, text_color="text")
         
         # 添加展开/收起按钮
         self.sidebar_toggle_btn = ctk.CTkButton(
@@ -448,29 +1666,29 @@ class TaskManager:
             command=self.toggle_sidebar
         )
         self.sidebar_toggle_btn.pack(side="right", padx=5)
+        self.styles.register(self.sidebar_toggle_btn, text_color="text", hover_color="hover")
         
-        # 类别列表
-        self.category_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
-        self.category_frame.pack(fill="both", expand=True, padx=10)
+        # 智能视图按钮
+        self.view_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        self.view_frame.pack(fill="x", padx=(10, 0), pady=(0, 6))
+        self.sync_view_buttons()
         
+        # 类别列表（类别很多时可以滚动）
+        self.category_frame = ctk.CTkScrollableFrame(
+            self.sidebar,
+            fg_color="transparent",
+            scrollbar_button_color=self.colors["sidebar"],
+            scrollbar_button_hover_color=self.colors["border"]
+        )
+        self.category_frame.pack(fill="both", expand=True, padx=(10, 0))
+        self.styles.register(self.category_frame,
+                             scrollbar_button_color="sidebar",
+                             scrollbar_button_hover_color="border")
+        
+        # 按类别名称索引的按钮，以及按显示顺序排列的按钮列表
+        self.category_button_map = {}
         self.category_buttons = []
-        for category in self.categories:
-            btn = ctk.CTkButton(self.category_frame,
-                               text=category,
-                               command=None,
-                               fg_color="transparent",
-                               text_color=self.colors["text"],
-                               hover_color=self.colors["hover"],
-                               anchor="w",
-                               height=28,
-                               font=("微软雅黑", 11))
-            btn.pack(fill="x", pady=2)
-            # 绑定菜单和按钮事件
-            btn.bind("<Button-3>", lambda e, c=category: self.show_category_menu(e, c))
-            btn.bind("<Button-1>", lambda e, b=btn, c=category: self.on_button_press(e, b, c))
-            btn.bind("<B1-Motion>", self.on_drag_motion)
-            btn.bind("<ButtonRelease-1>", self.on_button_release)
-            self.category_buttons.append(btn)
+        self.sync_category_buttons()
         
         # 右侧任务区域
         self.right_pane = ctk.CTkFrame(main_content, 
@@ -478,11 +1696,13 @@ class TaskManager:
                                       border_width=1,
                                       border_color=self.colors["border"])
         self.right_pane.pack(side="left", fill="both", expand=True, padx=(5, 0))
+        self.styles.register(self.right_pane, fg_color="bg", border_color="border")
         
         # 任务列表区域
         self.task_frame = ctk.CTkFrame(self.right_pane, 
                                       fg_color=self.colors["sidebar"])  # 使用侧边栏颜色
         self.task_frame.pack(side="left", fill="both", expand=True)
+        self.styles.register(self.task_frame, fg_color="sidebar")
         
         # 任务输入框 - 简样式
         self.task_entry = ctk.CTkEntry(self.task_frame,
@@ -492,23 +1712,71 @@ class TaskManager:
                                        border_color=self.colors["border"])
         self.task_entry.pack(fill="x", padx=15, pady=(15, 10))
         self.task_entry.bind('<Return>', self.add_task)
+        self.styles.register(self.task_entry,
+                             border_color="border",
+                             fg_color="sidebar",
+                             text_color="text")
+        
+        # 筛选当前类别的任务
+        self.filter_entry = ctk.CTkEntry(self.task_frame,
+                                         placeholder_text="筛选任务...",
+                                         height=28,
+                                         font=("微软雅黑", 11),
+                                         border_color=self.colors["border"])
+        self.filter_entry.pack(fill="x", padx=15, pady=(0, 10))
+        self.filter_entry.bind('<KeyRelease>', self.on_filter_key)
+        self.filter_entry.bind('<Escape>', self.clear_task_filter)
+        self.styles.register(self.filter_entry,
+                             border_color="border",
+                             fg_color="sidebar",
+                             text_color="text")
+        self.create_sort_bar()
         
         # 任务列表滚动区域
         self.task_scroll = ctk.CTkScrollableFrame(self.task_frame,
                                                 fg_color=self.colors["bg"])  # 改用主背景色
         self.task_scroll.pack(fill="both", expand=True, padx=20)
+        self.styles.register(self.task_scroll, fg_color="bg")
+        
+        # 大类别使用的画布列表（按需创建）
+        self.canvas_task_list = None
+        self.task_renderer = "widgets"
         
         # 任务详情面板初始隐藏
-        self.detail_frame = ctk.CTkFrame(self.right_pane, 
-                                       fg_color=self.colors["sidebar"],
-                                       width=300)
+        self.create_detail_panel()
+        
+        # 订阅数据变更（按顺序：筛选索引、智能视图、排序索引、侧边栏、任务列表、详情面板）
+        self.events.subscribe(self.on_filter_index_changed,
+                              ChangeEvent.TASKS, ChangeEvent.CATEGORIES)
+        self.events.subscribe(self.on_smart_views_changed,
+                              ChangeEvent.TASKS, ChangeEvent.CATEGORIES)
+        self.events.subscribe(self.on_sort_index_changed,
+                              ChangeEvent.TASKS, ChangeEvent.CATEGORIES)
+        self.events.subscribe(self.on_sidebar_changed,
+                              ChangeEvent.CATEGORIES, ChangeEvent.COUNTS, ChangeEvent.SELECTION)
+        self.events.subscribe(self.on_task_list_changed,
+                              ChangeEvent.TASKS, ChangeEvent.SELECTION)
+        self.events.subscribe(self.on_detail_changed,
+                              ChangeEvent.TASKS, ChangeEvent.SELECTION, ChangeEvent.CATEGORIES)
+        self.events.subscribe(self.on_task_locations_changed,
+                              ChangeEvent.TASKS, ChangeEvent.CATEGORIES)
+        
+        # 恢复上次收起的侧边栏（不播放动画）
+        if self.ui_state.get("sidebar_expanded") == "0":
+            self.is_expanded = False
+            self.category_title.pack_forget()
+            self.view_frame.pack_forget()
+            self.category_frame.pack_forget()
+            self.sidebar_toggle_btn.configure(text="▶")
+            self.sidebar.configure(width=30)
         
     def select_category(self, category):
+        # 用户切换了类别，不再恢复上次的滚动位置
+        self.pending_scroll = None
+        self.current_view = None
         # 确保类别存在
         if category in self.categories:
             self.current_category = category
-            self.update_task_list()
-            self.update_category_list()
         else:
             # 如果类别不存在，选择第一个可用的类别
             if self.categories:
@@ -522,93 +1790,644 @@ class TaskManager:
                     "其他": []
                 }
                 self.current_category = "工作"
-            self.update_task_list()
-            self.update_category_list()
+                self.recount_categories()
+                self.events.publish(ChangeEvent.CATEGORIES)
+        self.events.publish(ChangeEvent.SELECTION, self.current_category)
 
     def add_task(self, event=None):
         """添加新任务"""
         task_text = self.task_entry.get().strip()
         if task_text:
-            try:
-                # 创建新任务
-                task = {
-                    "text": task_text,
-                    "completed": False,
-                    "created_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                    "completed_date": None
-                }
-                
-                # 添加到当前类别
-                if self.current_category not in self.categories:
-                    self.categories[self.current_category] = []
-                self.categories[self.current_category].append(task)
-                
-                # 清空输入框
-                self.task_entry.delete(0, "end")
-                
-                # 保存到数据库
-                try:
-                    # 获取类别ID
-                    self.cursor.execute('SELECT id FROM categories WHERE name = ?', 
-                                      (self.current_category,))
-                    category_id = self.cursor.fetchone()
-                    
-                    if category_id is None:
-                        # 如果类别不存在，先创建类别
-                        self.cursor.execute('''
-                            INSERT INTO categories (name, position) 
-                            VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM categories))
-                        ''', (self.current_category,))
-                        category_id = self.cursor.lastrowid
-                    else:
-                        category_id = category_id[0]
-                    
-                    # 插入任务
-                    self.cursor.execute('''
-                        INSERT INTO tasks (category_id, text, completed, created_date, completed_date)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (category_id, task["text"], task["completed"], 
-                         task["created_date"], task["completed_date"]))
-                    
-                    self.conn.commit()
-                except Exception as e:
-                    print(f"Error saving task to database: {str(e)}")
-                    self.conn.rollback()
-                
-                # 更新显示
-                self.update_task_list()
-                self.update_category_list()
-                
-            except Exception as e:
-                print(f"Error adding task: {str(e)}")
+            # 清空输入框
+            self.task_entry.delete(0, "end")
+            created_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+            
+            if self.loading:
+                # 数据尚未加载完，先记下来
+                self.pending_new_tasks.append((self.current_category, task_text, created_date))
+                return
+            
+            # 提示可能重复的任务
+            similar = list(self.find_tasks(self.duplicate_index.similar(task_text, limit=2)))
+            if similar:
+                lines = "\n".join(f"{category} · {task['text'][:20]}" for category, task in similar)
+                if not self.show_confirm("可能重复", f"已有相似的任务：\n{lines}\n仍然添加吗？"):
+                    self.task_entry.insert(0, task_text)
+                    return
+            self.create_task(self.current_category, task_text, created_date)
+
+    def create_task(self, category, task_text, created_date):
+        """在指定类别中创建任务并写入数据库"""
+        try:
+            # 创建新任务
+            task = {
+                "text": task_text,
+                "completed": False,
+                "created_date": created_date,
+                "completed_date": None,
+                "priority": 0,
+                "due_date": None,
+                "remind_at": None
+            }
+            
+            # 添加到类别
+            if category not in self.categories:
+                self.categories[category] = []
+                self.events.publish(ChangeEvent.CATEGORIES, category)
+            self.categories[category].append(task)
+            self.adjust_category_count(category, total=1)
+            
+            # 保存到数据库（同时得到任务 id）
+            self.store_write(self.store.add_task, category, task)
+            self.index_tasks([task])
+            
+            # 通知视图更新
+            self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
+            
+        except Exception as e:
+            print(f"Error adding task: {str(e)}")
 
     def update_task_list(self):
+        # 取消仍在进行的渲染
+        self.cancel_task_render()
+        
+        if self.current_view is not None:
+            self.view_tasks = self.current_view.tasks() if self.current_view.members is not None else []
+            tasks = [task for _, task in self.view_tasks]
+        else:
+            tasks = self.categories.get(self.current_category, [])
+        self.task_filter_keys = self.filter_task_keys()
+        # 保存任务在原始列表中的索引，避免逐个查找
+        uncompleted_tasks, completed_tasks = self.sorted_sections(tasks)
+        if self.task_sort["state"] == "open":
+            completed_tasks = []
+        elif self.task_sort["state"] == "done":
+            uncompleted_tasks = []
+        
+        # 任务很多时使用画布绘制
+        if len(tasks) > self.canvas_render_threshold:
+            self.show_canvas_task_list([
+                ("uncompleted", "未完成", uncompleted_tasks),
+                ("completed", "已完成", completed_tasks)
+            ])
+            self.restore_scroll_position()
+            return
+        
+        self.show_widget_task_list()
+        
         # 清除现有任务
         for widget in self.task_scroll.winfo_children():
             widget.destroy()
+        self.task_rows = []
+        self.hidden_task_rows = set()
         
-        tasks = self.categories[self.current_category]
-        completed_tasks = [t for t in tasks if t["completed"]]
-        uncompleted_tasks = [t for t in tasks if not t["completed"]]
-        
-        # 创建未完成任务分组
+        # 先创建分组标题，任务行稍后分批创建
+        pending_rows = []
         if uncompleted_tasks:
-            self.create_task_section("未完成", uncompleted_tasks, False)
-        
-        # 创建已完成任务分
+            pending_rows.extend(self.create_task_section("未完成", uncompleted_tasks, False))
         if completed_tasks:
-            self.create_task_section("已完成", completed_tasks, True)
+            pending_rows.extend(self.create_task_section("已完成", completed_tasks, True))
+        self.render_queue = deque(pending_rows)
+        
+        # 首屏立即创建，其余行在空闲时分批创建
+        for _ in range(min(self.first_screen_rows(), len(self.render_queue))):
+            self.create_task_row(*self.render_queue.popleft())
+        if self.render_queue:
+            self.render_job = self.timers.after_idle(self.task_scroll, self.continue_task_render)
+        else:
+            self.restore_scroll_position()
+    
+    def first_screen_rows(self):
+        """估算一屏能显示的任务行数"""
+        height = self.task_scroll.winfo_height()
+        if height <= 1:
+            # 窗口尚未显示时按窗口高度估算
+            height = max(self.root.winfo_height(), 600)
+        return height // self.task_row_height_estimate + 1
     
+    def continue_task_render(self):
+        """在限定时间内创建一批任务行，未完成的部分留到下一次"""
+        self.render_job = None
+        deadline = time.perf_counter() + self.render_slice_ms / 1000
+        while self.render_queue and time.perf_counter() < deadline:
+            self.create_task_row(*self.render_queue.popleft())
+        
+        if self.render_queue:
+            # 让出事件循环处理输入后再继续
+            self.render_job = self.timers.after(self.task_scroll, 1, self.continue_task_render)
+        else:
+            self.restore_scroll_position()
+    
+    def task_scroll_position(self):
+        """任务列表当前的滚动位置（0~1）"""
+        if self.task_renderer == "canvas":
+            return self.canvas_task_list.canvas.yview()[0]
+        return self.task_scroll._parent_canvas.yview()[0]
+
+    def restore_scroll_position(self):
+        """数据加载完、任务行全部创建后恢复上次的滚动位置"""
+        if self.pending_scroll is None or self.loading or self.render_queue:
+            return
+        fraction, self.pending_scroll = self.pending_scroll, None
+        if self.task_renderer == "canvas":
+            self.canvas_task_list.yview("moveto", fraction)
+        else:
+            self.task_scroll._parent_canvas.yview_moveto(fraction)
+
+    def cancel_task_render(self):
+        """取消尚未完成的分批渲染"""
+        if self.render_job:
+            self.timers.cancel(self.render_job)
+            self.render_job = None
+        self.render_queue.clear()
+    
+    def show_canvas_task_list(self, sections):
+        """切换到画布渲染器并显示任务"""
+        if self.canvas_task_list is None:
+            self.canvas_task_list = CanvasTaskList(
+                self.task_frame,
+                self.colors,
+                self.expand_symbols,
+                on_toggle=self.toggle_task,
+                on_select=lambda task: self.show_task_details(task, None),
+                on_context=self.show_task_menu
+            )
+            self.styles.add_listener(self.canvas_task_list.update_colors)
+            # 与控件渲染器共用收起状态
+            self.canvas_task_list.collapsed = self.collapsed_sections
+        
+        if self.task_renderer != "canvas":
+            # 释放控件渲染器占用的任务行
+            for widget in self.task_scroll.winfo_children():
+                widget.destroy()
+            self.task_scroll.pack_forget()
+            self.canvas_task_list.pack(fill="both", expand=True, padx=20)
+            self.task_renderer = "canvas"
+        
+        self.canvas_task_list.visible = self.task_filter_keys
+        self.canvas_task_list.set_sections(sections)
+    
+    def show_widget_task_list(self):
+        """切换回控件渲染器"""
+        if self.task_renderer != "widgets":
+            self.canvas_task_list.pack_forget()
+            self.canvas_task_list.set_selected(None)
+            self.task_scroll.pack(fill="both", expand=True, padx=20)
+            self.task_renderer = "widgets"
+    
+    def create_sort_bar(self):
+        """排序方式（主、次）和完成状态筛选"""
+        bar = ctk.CTkFrame(self.task_frame, fg_color="transparent")
+        bar.pack(fill="x", padx=15, pady=(0, 10))
+        labels = {name: label for name, (label, _) in TASK_SORT_KEYS.items()}
+        names = {label: name for name, label in labels.items()}
+        
+        def option_menu(values, current, on_change):
+            menu = ctk.CTkOptionMenu(bar,
+                                     values=values,
+                                     width=90,
+                                     height=26,
+                                     font=("微软雅黑", 11),
+                                     fg_color=self.colors["sidebar"],
+                                     button_color=self.colors["border"],
+                                     button_hover_color=self.colors["hover"],
+                                     text_color=self.colors["text"],
+                                     dropdown_fg_color=self.colors["sidebar"],
+                                     dropdown_text_color=self.colors["text"],
+                                     dropdown_hover_color=self.colors["hover"],
+                                     command=on_change)
+            menu.set(current)
+            menu.pack(side="left", padx=(0, 5))
+            self.styles.register(menu,
+                                 fg_color="sidebar",
+                                 button_color="border",
+                                 button_hover_color="hover",
+                                 text_color="text",
+                                 dropdown_fg_color="sidebar",
+                                 dropdown_text_color="text",
+                                 dropdown_hover_color="hover")
+            return menu
+        
+        option_menu(list(names), labels[self.task_sort["primary"]],
+                    lambda label: self.set_task_sort(primary=names[label]))
+        option_menu(["无", *[label for label in names if names[label] != "manual"]],
+                    labels.get(self.task_sort["secondary"], "无"),
+                    lambda label: self.set_task_sort(secondary=names.get(label)))
+        
+        states = {"全部": "all", "未完成": "open", "已完成": "done"}
+        state_button = ctk.CTkSegmentedButton(
+            bar,
+            values=list(states),
+            height=26,
+            font=("微软雅黑", 11),
+            command=lambda label: self.set_task_sort(state=states[label]))
+        state_button.set(next(label for label, state in states.items()
+                              if state == self.task_sort["state"]))
+        state_button.pack(side="right")
+
+    def set_task_sort(self, **changes):
+        """修改排序方式或状态筛选；排序键变化时丢弃已建立的有序索引"""
+        if any(key != "state" and self.task_sort[key] != value for key, value in changes.items()):
+            self.sort_indexes = {}
+        self.task_sort.update(changes)
+        # 先处理尚未通知的变更，索引与类别保持一致
+        self.events.flush()
+        self.update_task_list()
+
+    def get_sort_index(self, category):
+        """类别的有序索引，第一次使用时建立，之后随任务变化逐个更新"""
+        index = self.sort_indexes.get(category)
+        if index is None:
+            index = self.sort_indexes[category] = SortedTaskIndex(self.task_sort["primary"],
+                                                                   self.task_sort["secondary"])
+            index.sync(self.categories[category])
+        return index
+
+    def sorted_sections(self, tasks):
+        """(未完成的任务, 已完成的任务)，元素为 (在 tasks 中的索引, 任务)，按当前排序方式排列"""
+        primary, secondary = self.task_sort["primary"], self.task_sort["secondary"]
+        if primary == "manual" and secondary is None:
+            return ([(i, t) for i, t in enumerate(tasks) if not t["completed"]],
+                    [(i, t) for i, t in enumerate(tasks) if t["completed"]])
+        positions = {id(task): i for i, task in enumerate(tasks)}
+        if self.current_view is None:
+            index = self.get_sort_index(self.current_category)
+            if len(index.tasks) != len(tasks):
+                index.sync(tasks)
+            uncompleted, completed = index.sections()
+        else:
+            # 视图中的任务来自多个类别，直接排序
+            index = SortedTaskIndex(primary, secondary)
+            index.sync(tasks)
+            uncompleted, completed = index.sections()
+        return ([(positions[id(t)], t) for t in uncompleted],
+                [(positions[id(t)], t) for t in completed])
+
+    def on_sort_index_changed(self, events):
+        """按事件列出的任务逐个更新有序索引；没有列出任务时重建该类别的索引"""
+        for event in events:
+            for old_name, new_name in (event.renamed or {}).items():
+                if old_name in self.sort_indexes:
+                    self.sort_indexes[new_name] = self.sort_indexes.pop(old_name)
+        for category in list(self.sort_indexes):
+            if category not in self.categories:
+                del self.sort_indexes[category]
+                continue
+            index = self.sort_indexes[category]
+            for event in events:
+                if event.kind != ChangeEvent.TASKS or event.category not in (None, category):
+                    continue
+                if event.category is None or (event.tasks is None and event.removed is None):
+                    index.sync(self.categories[category])
+                    break
+                for task in event.removed or ():
+                    index.remove(task)
+                for task in event.tasks or ():
+                    index.update(task)
+
+    def on_filter_key(self, event=None):
+        """筛选文字变化时更新任务列表"""
+        query = self.filter_entry.get().strip()
+        if query != self.task_filter:
+            self.task_filter = query
+            self.apply_task_filter()
+
+    def clear_task_filter(self, event=None):
+        self.filter_entry.delete(0, "end")
+        self.on_filter_key()
+
+    def filter_task_keys(self):
+        """当前类别（或视图涉及的类别）中符合筛选文字和标签条件的任务（id(task) 集合），
+        没有筛选时返回 None"""
+        if not self.task_filter:
+            return None
+        if self.current_view is not None:
+            categories = [category for category in (self.current_view.members or {})
+                          if category in self.categories]
+        elif self.current_category in self.categories:
+            categories = [self.current_category]
+        else:
+            return None
+        terms, words = parse_tag_query(self.task_filter)
+        keys = None
+        if words:
+            keys = set()
+            for category in categories:
+                index = self.filter_indexes.get(category)
+                if index is None:
+                    # 第一次在这个类别中筛选时建立索引，之后随任务变化同步
+                    index = self.filter_indexes[category] = NgramIndex()
+                    index.sync(self.categories[category])
+                keys |= index.search(words)
+        if terms:
+            self.get_tag_index()
+            tagged = set()
+            for category in categories:
+                mask = self.tag_index.query(terms, category)
+                tagged.update(id(task) for _, task in self.tag_index.tasks_of(mask))
+            keys = tagged if keys is None else keys & tagged
+        return keys
+
+    def get_tag_index(self):
+        """标签索引，第一次使用时建立，之后随任务变化同步"""
+        if self.tag_index is None:
+            self.tag_index = TagIndex()
+            for category, tasks in self.categories.items():
+                self.tag_index.sync(category, tasks)
+        return self.tag_index
+
+    def apply_task_filter(self):
+        """按筛选结果显示任务，不重建任务列表"""
+        self.task_filter_keys = self.filter_task_keys()
+        if self.task_renderer == "canvas":
+            self.canvas_task_list.set_filter(self.task_filter_keys)
+            return
+        
+        # 从后往前处理，重新显示的行放在其后第一个可见行之前，保持原有顺序
+        keys = self.task_filter_keys
+        next_visible = {}
+        for key, frame in reversed(self.task_rows):
+            parent = frame.master
+            visible = keys is None or key in keys
+            if visible and key in self.hidden_task_rows:
+                self.hidden_task_rows.discard(key)
+                if parent in next_visible:
+                    frame.pack(fill="x", pady=(0, 8), before=next_visible[parent])
+                else:
+                    frame.pack(fill="x", pady=(0, 8))
+            elif not visible and key not in self.hidden_task_rows:
+                self.hidden_task_rows.add(key)
+                frame.pack_forget()
+            if visible:
+                next_visible[parent] = frame
+
     def update_category_list(self):
-        for btn, category in zip(self.category_buttons, self.categories):
-            tasks = self.categories[category]
-            completed = sum(1 for task in tasks if task["completed"])
-            total = len(tasks)
-            # 存储原始类别名称为按钮的属性
-            btn._category_name = category
-            btn.configure(text=f"{category} ({completed}/{total})")
+        for category in self.categories:
+            btn = self.category_button_map.get(category)
+            if btn is None:
+                continue
+            completed, total = self.category_counts.get(category, (0, 0))
+            
+            # 只在文字变化时更新按钮
+            text = f"{category} ({completed}/{total})"
+            if getattr(btn, "_label_text", None) != text:
+                btn.configure(text=text)
+                btn._label_text = text
+            
+            # 只在选中状态或主题变化时更新颜色
+            selected = category == self.current_category and self.current_view is None
+            style = (selected, self.theme_mode)
+            if getattr(btn, "_label_style", None) == style:
+                continue
+            btn._label_style = style
+            if selected:
+                btn.configure(fg_color=self.colors["accent"],
+                            text_color="white",
+                            hover_color=self.colors["accent"])
+            else:
+                btn.configure(fg_color="transparent",
+                            text_color=self.colors["text"],
+                            hover_color=self.colors["hover"])
+    
+    def adjust_category_count(self, category, completed=0, total=0):
+        """增量调整类别的计数"""
+        counts = self.category_counts.setdefault(category, [0, 0])
+        counts[0] += completed
+        counts[1] += total
+        self.events.publish(ChangeEvent.COUNTS, category)
+    
+    def recount_categories(self, categories=None):
+        """重新统计指定类别（默认全部）的计数，用于批量修改之后"""
+        if categories is None:
+            self.category_counts = {}
+            categories = self.categories
+        for category in categories:
+            tasks = self.categories.get(category)
+            if tasks is None:
+                self.category_counts.pop(category, None)
+            else:
+                self.category_counts[category] = [
+                    sum(1 for task in tasks if task["completed"]), len(tasks)
+                ]
+        self.events.publish(ChangeEvent.COUNTS)
+
+    def on_sidebar_changed(self, events):
+        """类别或计数变化时更新侧边栏"""
+        if any(event.kind == ChangeEvent.CATEGORIES for event in events):
+            renamed = {}
+            for event in events:
+                renamed.update(event.renamed or {})
+            # 同步按钮时会顺带更新计数和选中状态
+            self.sync_category_buttons(renamed=renamed)
+        else:
+            self.update_category_list()
+        self.update_view_buttons()
+
+    def on_filter_index_changed(self, events):
+        """同步已建立的筛选索引；类别被删除或重命名时丢弃对应的索引"""
+        if self.tag_index is not None:
+            if any(event.kind == ChangeEvent.CATEGORIES for event in events):
+                self.tag_index.drop_missing(self.categories)
+                changed = self.categories
+            else:
+                changed = {event.category for event in events}
+                if None in changed:
+                    changed = self.categories
+            for category in changed:
+                if category in self.categories:
+                    self.tag_index.sync(category, self.categories[category])
+        
+        for category in list(self.filter_indexes):
+            if category not in self.categories:
+                del self.filter_indexes[category]
+            elif any(event.kind == ChangeEvent.TASKS and event.category in (None, category)
+                     for event in events):
+                self.filter_indexes[category].sync(self.categories[category])
+
+    def on_task_list_changed(self, events):
+        """只有当前类别（或当前视图）受影响时才重建任务列表"""
+        if self.current_view is not None:
+            if (any(event.kind == ChangeEvent.SELECTION for event in events)
+                    or self.current_view in self.changed_views):
+                self.update_task_list()
+        elif any(event.kind == ChangeEvent.SELECTION
+                 or event.category in (None, self.current_category)
+                 for event in events):
+            self.update_task_list()
+
+    def on_task_locations_changed(self, events):
+        """任务增删或移动后，下次搜索时重新建立 id -> (类别, 任务) 的对应"""
+        self.task_locations = None
+
+    def on_detail_changed(self, events):
+        """详情面板中的任务被移走或删除时关闭面板，否则刷新显示"""
+        task = self.current_detail_task
+        if task is None:
+            return
+        if self.current_view is not None:
+            tasks = [t for _, t in self.view_tasks]
+        else:
+            tasks = self.categories.get(self.current_category, [])
+        if any(t is task for t in tasks):
+            self.refresh_task_details()
+        else:
+            self.hide_task_details()
+
+    def load_smart_views(self):
+        """用户定义的智能视图，以 JSON 保存在设置中"""
+        try:
+            definitions = json.loads(self.ui_state.get("smart_views", "[]"))
+            return [SmartView(definition) for definition in definitions]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error loading smart views: {str(e)}")
+            return []
+
+    def save_smart_views(self):
+        definitions = [view.definition for view in self.smart_views if not view.builtin]
+        try:
+            self.store.set_settings({"smart_views": json.dumps(definitions, ensure_ascii=False)})
+        except Exception as e:
+            print(f"Error saving smart views: {str(e)}")
+
+    def find_view(self, name):
+        return next((view for view in self.smart_views if view.name == name), None)
+
+    def materialize_view(self, view):
+        """用索引查询从数据库取出视图中的任务，对应到内存中的任务对象"""
+        if view.is_stale():
+            view.compile()
+        try:
+            task_ids = [task["id"] for _, task in view.query(self.store)]
+        except Exception as e:
+            print(f"Error loading smart view: {str(e)}")
+            # 数据库不可用时在内存中逐个判断
+            view.reset([])
+            for category in self.categories:
+                self.rescan_view(view, category)
+            return
+        # 缓存可能还没有收到最近的变更事件，重新建立
+        self.task_locations = None
+        view.reset(list(self.find_tasks(task_ids)))
+
+    def materialize_views(self):
+        for view in self.smart_views:
+            self.materialize_view(view)
+        self.update_view_buttons()
+        if self.current_view is not None:
+            self.events.publish(ChangeEvent.SELECTION, self.current_category)
+
+    def rescan_view(self, view, category):
+        """重新判断一个类别中的全部任务"""
+        tasks = self.categories.get(category) if view.depends_on(category) else None
+        view.replace_category(category, [(category, task) for task in tasks or ()
+                                         if view.matches(task, category)])
+
+    def on_smart_views_changed(self, events):
+        """按事件列出的任务增量更新已物化的视图；没有列出任务时重新判断整个类别"""
+        self.changed_views = set()
+        if self.loading:
+            # 加载完成时统一物化
+            return
+        renamed = {}
+        for event in events:
+            renamed.update(event.renamed or {})
+        structural = any(event.kind == ChangeEvent.CATEGORIES for event in events)
+        
+        # 限定了类别的视图跟随类别改名
+        renamed_views = False
+        for view in self.smart_views:
+            for old_name, new_name in renamed.items():
+                if view.categories and old_name in view.categories:
+                    view.categories[view.categories.index(old_name)] = new_name
+                    renamed_views = True
+        if renamed_views:
+            self.save_smart_views()
+        
+        for view in self.smart_views:
+            members = view.members
+            if members is None:
+                continue
+            if view.is_stale():
+                self.materialize_view(view)
+                self.changed_views.add(view)
+                continue
+            for old_name, new_name in renamed.items():
+                view.rename_category(old_name, new_name)
+            if structural:
+                for category in [c for c in members if c not in self.categories]:
+                    view.drop_category(category)
+                    self.changed_views.add(view)
             
-            if category == self.current_category:
+            for event in events:
+                if event.kind != ChangeEvent.TASKS:
+                    continue
+                if event.tasks is None and event.removed is None:
+                    categories = self.categories if event.category is None else [event.category]
+                    for category in categories:
+                        if category in members or view.depends_on(category):
+                            self.rescan_view(view, category)
+                            self.changed_views.add(view)
+                    continue
+                
+                category = event.category
+                for task in event.removed or ():
+                    if view.discard(task):
+                        self.changed_views.add(view)
+                for task in event.tasks or ():
+                    if view.matches(task, category):
+                        view.add(category, task)
+                        self.changed_views.add(view)
+                    elif view.discard(task):
+                        self.changed_views.add(view)
+        
+        if self.changed_views:
+            self.update_view_buttons()
+
+    def check_view_dates(self):
+        """跨天后重新物化带日期条件的视图"""
+        stale = [view for view in self.smart_views
+                 if view.members is not None and view.is_stale()]
+        for view in stale:
+            self.materialize_view(view)
+        if stale:
+            self.update_view_buttons()
+            if self.current_view in stale:
+                self.events.publish(ChangeEvent.SELECTION, self.current_category)
+        self.timers.after(self.root, 60000, self.check_view_dates)
+
+    def sync_view_buttons(self):
+        """为每个视图创建按钮（视图增删时调用）"""
+        for btn in self.view_button_map.values():
+            btn.destroy()
+        self.view_button_map = {}
+        for view in self.smart_views:
+            btn = ctk.CTkButton(self.view_frame,
+                               text=view.name,
+                               command=lambda v=view: self.select_view(v),
+                               fg_color="transparent",
+                               text_color=self.colors["text"],
+                               hover_color=self.colors["hover"],
+                               anchor="w",
+                               height=28,
+                               font=("微软雅黑", 11))
+            btn.bind("<Button-3>", lambda e, v=view: self.show_view_menu(e, v), add="+")
+            btn.pack(fill="x", pady=2)
+            self.view_button_map[view] = btn
+        self.update_view_buttons()
+
+    def update_view_buttons(self):
+        """更新视图按钮的计数和选中状态"""
+        for view, btn in self.view_button_map.items():
+            count = view.count() if view.members is not None else "…"
+            text = f"☆ {view.name} ({count})"
+            if getattr(btn, "_label_text", None) != text:
+                btn.configure(text=text)
+                btn._label_text = text
+            style = (view is self.current_view, self.theme_mode)
+            if getattr(btn, "_label_style", None) == style:
+                continue
+            btn._label_style = style
+            if view is self.current_view:
                 btn.configure(fg_color=self.colors["accent"],
                             text_color="white",
                             hover_color=self.colors["accent"])
@@ -617,118 +2436,207 @@ class TaskManager:
                             text_color=self.colors["text"],
                             hover_color=self.colors["hover"])
 
-    def save_tasks(self):
-        """保存任务到数据库"""
-        try:
-            # 开始事务
-            self.cursor.execute('BEGIN TRANSACTION')
-            
-            # 清空现有数据
-            self.cursor.execute('DELETE FROM tasks')
-            self.cursor.execute('DELETE FROM categories')
-            
-            # 保存类别和任务
-            for position, (category_name, tasks) in enumerate(self.categories.items()):
-                # 插入类别（只插入一次）
-                self.cursor.execute(
-                    'INSERT INTO categories (name, position) VALUES (?, ?)',
-                    (category_name, position)
-                )
-                category_id = self.cursor.lastrowid
-                
-                # 保存该类别下的所有任务
-                for task in tasks:
-                    self.cursor.execute('''
-                        INSERT INTO tasks (
-                            category_id, text, completed, 
-                            created_date, completed_date
-                        ) VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        category_id,
-                        task['text'],
-                        1 if task['completed'] else 0,  # 确保布尔值正确保存
-                        task['created_date'],
-                        task['completed_date']
-                    ))
-            
-            # 提交事务
-            self.conn.commit()
-        except Exception as e:
-            print(f"Error saving tasks: {str(e)}")
-            self.conn.rollback()
+    def select_view(self, view):
+        """显示智能视图中的任务"""
+        self.pending_scroll = None
+        self.current_view = view
+        if view.members is not None and view.is_stale():
+            self.materialize_view(view)
+        self.events.publish(ChangeEvent.SELECTION, self.current_category)
 
-    def load_tasks(self):
-        """从数据库加载任务"""
+    def show_view_menu(self, event, view):
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.add_command(label="新建智能视图", command=self.create_smart_view)
+        if not view.builtin:
+            menu.add_command(label="删除", command=lambda: self.delete_smart_view(view))
+        
+        # 设置菜单样式
+        menu.configure(
+            font=("微软雅黑", 10),
+            bg=self.colors["sidebar"],
+            fg=self.colors["text"],
+            activebackground=self.colors["accent"],
+            activeforeground="white"
+        )
+        
         try:
-            # 清空现有数据
-            self.categories = {}
-            
-            # 加载所有类别
-            self.cursor.execute('''
-                SELECT id, name, position FROM categories 
-                ORDER BY position
-            ''')
-            categories = self.cursor.fetchall()
-            
-            # 如果没有类别，创建默认类别
-            if not categories:
-                default_categories = ["工作", "个人", "学习", "其他"]
-                for i, category in enumerate(default_categories):
-                    self.cursor.execute('''
-                        INSERT INTO categories (name, position) VALUES (?, ?)
-                    ''', (category, i))
-                self.conn.commit()
-                
-                # 重新加载类别
-                self.cursor.execute('''
-                    SELECT id, name, position FROM categories 
-                    ORDER BY position
-                ''')
-                categories = self.cursor.fetchall()
-            
-            # 初始化类别字典
-            for category_id, category_name, _ in categories:
-                self.categories[category_name] = []
-                
-                # 加载该类别的所有任务
-                self.cursor.execute('''
-                    SELECT text, completed, created_date, completed_date 
-                    FROM tasks 
-                    WHERE category_id = ?
-                ''', (category_id,))
-                
-                tasks = self.cursor.fetchall()
-                for task_data in tasks:
-                    self.categories[category_name].append({
-                        'text': task_data[0],
-                        'completed': bool(task_data[1]),
-                        'created_date': task_data[2],
-                        'completed_date': task_data[3]
-                    })
-            
-            # 设置当前类别
-            if not self.current_category or self.current_category not in self.categories:
-                self.current_category = next(iter(self.categories))
-            
-            # 更新显示
-            self.update_category_list()
-            self.update_task_list()
+            menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            menu.grab_release()
+
+    def create_smart_view(self):
+        """新建智能视图：名称、条件（与筛选框语法相同）、完成状态和天数"""
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title("新建智能视图")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        self.center_window(dialog, 400, 300)
+        
+        ctk.CTkLabel(dialog, text="名称:", font=("微软雅黑", 12)).pack(pady=(15, 2))
+        name_entry = ctk.CTkEntry(dialog, width=350)
+        name_entry.pack(padx=20)
+        name_entry.focus()
+        
+        ctk.CTkLabel(dialog, text="条件（例如 #工作 -#等待 报告，可留空）:",
+                     font=("微软雅黑", 12)).pack(pady=(10, 2))
+        query_entry = ctk.CTkEntry(dialog, width=350)
+        query_entry.pack(padx=20)
+        
+        state = ctk.CTkSegmentedButton(dialog, values=["全部", "未完成", "已完成"])
+        state.set("未完成")
+        state.pack(pady=(10, 2))
+        
+        days_entry = ctk.CTkEntry(dialog, width=350,
+                                  placeholder_text="最近几天内创建（已完成时为完成），留空表示不限")
+        days_entry.pack(padx=20, pady=(5, 0))
+        
+        def save_view():
+            name = name_entry.get().strip()
+            if not name or self.find_view(name) is not None:
+                name_entry.configure(border_color="red")
+                return
+            definition = {"name": name}
+            query = query_entry.get().strip()
+            if query:
+                definition["query"] = query
+            if state.get() != "全部":
+                definition["state"] = "done" if state.get() == "已完成" else "open"
+            days = days_entry.get().strip()
+            if days:
+                if not days.isdigit():
+                    days_entry.configure(border_color="red")
+                    return
+                key = "completed_days" if state.get() == "已完成" else "created_days"
+                definition[key] = int(days)
+            dialog.destroy()
             
-        except Exception as e:
-            print(f"Error loading tasks: {str(e)}")
-            # 使用默认类别
-            self.categories = {
-                "工作": [],
-                "个人": [],
-                "学习": [],
-                "其他": []
-            }
-            self.current_category = "工作"
-            self.update_category_list()
-            self.update_task_list()
+            view = SmartView(definition)
+            self.smart_views.append(view)
+            self.save_smart_views()
+            self.materialize_view(view)
+            self.sync_view_buttons()
+            self.select_view(view)
         
-        # 重新创建所有类别按钮
-        self.repack_category_buttons()
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.pack(pady=(15, 10))
+        ctk.CTkButton(button_frame, text="确定", command=save_view,
+                      width=80).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="取消", command=dialog.destroy,
+                      width=80).pack(side="left", padx=10)
+        name_entry.bind("<Return>", lambda e: save_view())
+
+    def delete_smart_view(self, view):
+        if not self.show_confirm("确认删除", f"确定要删除视图“{view.name}”吗？"):
+            return
+        self.smart_views.remove(view)
+        self.save_smart_views()
+        self.sync_view_buttons()
+        if self.current_view is view:
+            self.select_category(self.current_category)
+
+    def locate_task(self, task_index):
+        """任务列表中的索引 -> (类别, 在类别中的索引)；视图中的任务按对象查找"""
+        if self.current_view is None:
+            return self.current_category, task_index
+        category, task = self.view_tasks[task_index]
+        return category, next(i for i, t in enumerate(self.categories[category]) if t is task)
+
+    def task_category(self, task):
+        """显示中的任务所在的类别"""
+        if self.current_view is not None:
+            return next((c for c, t in self.view_tasks if t is task), self.current_category)
+        return self.current_category
+
+    def load_tasks(self):
+        """在后台线程中加载任务，界面先显示出来，数据分批填充"""
+        self.loading = True
+        self.load_queue = queue.Queue()
+        # 加载完成后重新物化智能视图
+        for view in self.smart_views:
+            view.reset()
+        self.task_entry.configure(placeholder_text="正在加载任务，可以先输入...")
+        threading.Thread(
+            target=load_task_data,
+            args=(self.db_path, self.load_queue, self.current_category),
+            daemon=True
+        ).start()
+        self.timers.after(self.root, 10, self.poll_loading)
+
+    def poll_loading(self):
+        """在界面线程中处理后台加载的结果，每次最多占用一个时间片"""
+        deadline = time.perf_counter() + self.render_slice_ms / 1000
+        while time.perf_counter() < deadline:
+            try:
+                message = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if not self.apply_load_message(*message):
+                return
+        self.timers.after(self.root, 10, self.poll_loading)
+
+    def apply_load_message(self, kind, *data):
+        """处理一条加载消息，加载结束时返回 False"""
+        if kind == "categories":
+            names, counts = data
+            # 加载期间用户新建的类别保留在后面
+            self.categories = {**{name: [] for name in names}, **self.categories}
+            for name in names:
+                self.category_counts[name] = counts.get(name, [0, 0])
+            if self.current_category not in self.categories:
+                self.current_category = names[0]
+            self.events.publish(ChangeEvent.CATEGORIES)
+            self.events.publish(ChangeEvent.SELECTION, self.current_category)
+            # 侧边栏立即显示
+            self.events.flush()
+        elif kind == "tasks":
+            name, tasks = data
+            # 类别可能在加载期间被删除
+            if name in self.categories:
+                existing = self.categories[name]
+                if existing:
+                    # 加载期间移入该类别的任务已经在内存中了
+                    known = {task["id"] for task in existing}
+                    tasks = [task for task in tasks if task["id"] not in known]
+                existing.extend(tasks)
+                self.index_tasks(tasks)
+                self.events.publish(ChangeEvent.TASKS, name)
+        else:
+            if kind == "error":
+                print(f"Error loading tasks: {data[0]}")
+                # 使用默认类别
+                if not self.categories:
+                    self.categories = {
+                        "工作": [],
+                        "个人": [],
+                        "学习": [],
+                        "其他": []
+                    }
+                if self.current_category not in self.categories:
+                    self.current_category = next(iter(self.categories))
+                self.recount_categories()
+                self.events.publish(ChangeEvent.CATEGORIES)
+                self.events.publish(ChangeEvent.SELECTION, self.current_category)
+            self.finish_loading()
+            return False
+        return True
+
+    def finish_loading(self):
+        """加载完成：添加加载期间输入的任务"""
+        self.loading = False
+        self.load_queue = None
+        self.task_entry.configure(placeholder_text="添加任务...")
+        self.pinyin_index.sort_prefixes()
+        self.materialize_views()
+        
+        pending, self.pending_new_tasks = self.pending_new_tasks, []
+        for category, task_text, created_date in pending:
+            # 未指定类别时添加到当前类别；指定的类别不存在时会新建
+            if not category:
+                category = self.current_category
+            self.create_task(category, task_text, created_date)
+        
+        # 任务列表刷新之后再恢复滚动位置
+        self.timers.after_idle(self.root, self.restore_scroll_position)
         
     def add_category(self):
         dialog = ctk.CTkInputDialog(text="输入新类别名称:",
@@ -736,19 +2644,9 @@ class TaskManager:
         new_name = dialog.get_input()
         if new_name and new_name not in self.categories:
             self.categories[new_name] = []
-            btn = ctk.CTkButton(self.category_frame,
-                               text=new_name,
-                               command=lambda c=new_name: self.select_category(c),
-                               fg_color="transparent",
-                               text_color=self.colors["text"],
-                               hover_color=self.colors["hover"],
-                               anchor="w",
-                               height=28,
-                               font=("微软雅黑", 11))
-            btn.pack(fill="x", pady=2)
-            self.category_buttons.append(btn)
-            self.save_tasks()
-            self.update_category_list()
+            self.category_counts[new_name] = [0, 0]
+            self.store_write(self.store.add_category, new_name)
+            self.events.publish(ChangeEvent.CATEGORIES, new_name)
 
     def edit_category(self):
         if not self.current_category:
@@ -787,12 +2685,15 @@ class TaskManager:
                 self.categories = dict(categories)
                 
                 # 更新当前选中类别
-                if self.current_category == self.current_category:
-                    self.current_category = new_name
+                old_name = self.current_category
+                self.current_category = new_name
+                self.category_counts[new_name] = self.category_counts.pop(old_name, [0, 0])
                 
-                # 重新创建按钮并更新显示
-                self.repack_category_buttons()
-                self.save_tasks()
+                self.store_write(self.store.rename_category, old_name, new_name)
+                # 复用原来的按钮并更新显示
+                self.events.publish(ChangeEvent.CATEGORIES, new_name,
+                                    renamed={old_name: new_name})
+                self.events.publish(ChangeEvent.SELECTION, new_name)
             dialog.destroy()
         
         # 添加按钮
@@ -818,14 +2719,16 @@ class TaskManager:
     def toggle_task(self, task_index):
         """切换任务状态"""
         try:
-            # 获取当前类别的所有任务
-            tasks = self.categories[self.current_category]
+            category, task_index = self.locate_task(task_index)
+            tasks = self.categories[category]
             
             # 确保任务索引有效
             if 0 <= task_index < len(tasks):
                 task = tasks[task_index]
                 # 切换状态
                 task["completed"] = not task["completed"]
+                self.adjust_category_count(category,
+                                           completed=1 if task["completed"] else -1)
                 
                 # 更新完成时间
                 if task["completed"]:
@@ -834,17 +2737,13 @@ class TaskManager:
                     task["completed_date"] = None
                 
                 # 保存更改
-                self.save_tasks()
+                self.store_write(self.store.update_task, task)
                 
-                # 更新显示
-                self.update_task_list()
-                self.update_category_list()
+                # 通知视图更新
+                self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
                 
-                # 如果有详情面板打开，也需要更新它
-                if (hasattr(self, 'detail_frame') and 
-                    hasattr(self, 'current_detail_task') and 
-                    self.detail_frame.winfo_exists() and 
-                    self.current_detail_task == task):
+                # 如果详情面板显示的正是这个任务，关闭它
+                if self.current_detail_task is task:
                     self.hide_task_details()
                     
         except Exception as e:
@@ -862,18 +2761,22 @@ class TaskManager:
                                    border_width=1,
                                    border_color=self.colors["border"])
         header_frame.pack(fill="x")
+        self.styles.register(header_frame, fg_color="sidebar", border_color="border")
         
         # 展开/收起按钮
+        key = "completed" if is_completed else "uncompleted"
+        collapsed = key in self.collapsed_sections
         expand_btn = ctk.CTkButton(header_frame,
-                                  text=self.expand_symbols["expanded"],
+                                  text=self.expand_symbols["collapsed" if collapsed else "expanded"],
                                   width=28,
                                   height=28,
-                                  command=lambda: self.toggle_section(expand_btn, tasks_frame),
+                                  command=lambda: self.toggle_section(expand_btn, tasks_frame, key),
                                   fg_color="transparent",
                                   text_color=self.colors["text"],
                                   hover_color=self.colors["hover"],
                                   font=("微软雅黑", 12))
         expand_btn.pack(side="left", padx=(2, 2), pady=2)
+        self.styles.register(expand_btn, text_color="text", hover_color="hover")
         
         # 分组标题和任务数量
         title_text = f"{title} ({len(tasks)})"
@@ -883,123 +2786,141 @@ class TaskManager:
                                   text_color=self.colors["text"],
                                   anchor="w")
         title_label.pack(side="left", padx=(2, 5), pady=3)
+        self.styles.register(title_label, text_color="text")
         
         # 任务表框架
         tasks_frame = ctk.CTkFrame(section_frame, 
                                   fg_color="transparent")
-        tasks_frame.pack(fill="x", pady=(5, 0))
-        
-        # 显示任务
-        for i, task in enumerate(tasks):
-            # 任务容器
-            task_frame = ctk.CTkFrame(tasks_frame, 
-                                     fg_color="transparent")
-            task_frame.pack(fill="x", pady=(0, 8))
-            
-            # 任务内容容器
-            content_frame = ctk.CTkFrame(task_frame,
-                                       fg_color=self.colors["sidebar"],
-                                       border_width=1,
-                                       border_color=self.colors["border"])
-            content_frame.pack(fill="x", padx=(25, 0))
-            
-            # 任务状态指示条
-            status_bar = ctk.CTkFrame(content_frame,
-                                    width=3,
-                                    height=28,  # 设置固定高度
-                                    fg_color=self.colors["accent"] if not task["completed"] else "#999999")
-            status_bar.pack(side="left")  # 移除 fill="y"
-            status_bar.pack_propagate(False)  # 保持固定大小
-            
-            # 复选框
-            checkbox = ctk.CTkCheckBox(content_frame,
-                                    text="",
-                                    width=15,
-                                    height=15,
-                                    border_width=1,
-                                    corner_radius=7.5,
-                                    border_color=self.colors["border"] if not task["completed"] else self.colors["accent"],
-                                    fg_color=self.colors["accent"],
-                                    hover_color=self.colors["accent"],
-                                    checkmark_color="white",
-                                    checkbox_width=15,
-                                    checkbox_height=15)
-            checkbox.pack(side="left", padx=(10, 5))
-            
-            # 设置初始状态
-            if task["completed"]:
-                checkbox.select()
-            else:
-                checkbox.deselect()
-            
-            # 获取任务在原始列表中的索引
-            original_index = self.categories[self.current_category].index(task)
-            
-            # 绑定命令
-            checkbox.configure(command=lambda idx=original_index: self.toggle_task(idx))
-            
-            # 计算可用宽度
-            available_width = content_frame.winfo_width() - 60  # 减去状态条、复选框和内边距的宽度
-            
-            # 使用 CTkFont 而不是 tkFont
-            task_font = ctk.CTkFont(
-                family="微软雅黑",
-                size=14,
-                slant="roman"
-            )
-            
-            # 任务文本
-            text = task["text"]
-            if task["completed"]:
-                # 方法1：使用双重删除线
-                text = ''.join([char + '\u0336\u0336' for char in text])
-                
-                # 或者方法2：使用粗删除线字符
-                # text = ''.join([char + '\u0335' for char in text])  # \u0335 是一个更粗的删除线字符
-            
-            # 任务文本标签
-            label = ctk.CTkLabel(content_frame,
-                                text=text,
-                                font=task_font,
-                                text_color="#AAAAAA" if task["completed"] else self.colors["text"],
-                                wraplength=400,  # 先设置一个初始值
-                                justify="left",
-                                anchor="w")
-            label.pack(side="left", 
-                      fill="x",
-                      expand=True,  # 改回 True，让标签能够占据可用空间
-                      padx=(5, 10),
-                      pady=(4, 4))
-            
-            def update_wraplength(label=label, content_frame=content_frame):
-                try:
-                    # 计算实际可用宽度
-                    content_width = content_frame.winfo_width()
-                    if content_width > 0:
-                        # 减去左侧状态条、复选框和内边距的宽度
-                        available_width = content_width - 60
-                        if available_width > 0:
-                            label.configure(wraplength=available_width)
-                            # 强制更新布局
-                            label.update_idletasks()
-                            content_frame.update_idletasks()
-                    # 删除这行，不要再次调度更新
-                    # label.after(100, lambda: update_wraplength(label, content_frame))
-                except Exception as e:
-                    print(f"Error updating wraplength: {str(e)}")
-            
-            # 绑定大小变化事件
-            content_frame.bind('<Configure>', lambda e, l=label, c=content_frame: update_wraplength(l, c))
-            
-            # 立即调用一次更新
-            self.root.after(10, lambda: update_wraplength(label, content_frame))
+        if not collapsed:
+            tasks_frame.pack(fill="x", pady=(5, 0))
+        
+        # 返回待创建的任务行，由调用方分批创建
+        return [(tasks_frame, original_index, task) for original_index, task in tasks]
+
+    def create_task_row(self, tasks_frame, original_index, task):
+        """创建单个任务行"""
+        # 任务容器
+        task_frame = ctk.CTkFrame(tasks_frame, 
+                                 fg_color="transparent")
+        task_frame.pack(fill="x", pady=(0, 8))
+        self.task_rows.append((id(task), task_frame))
+        if self.task_filter_keys is not None and id(task) not in self.task_filter_keys:
+            task_frame.pack_forget()
+            self.hidden_task_rows.add(id(task))
+        
+        # 任务内容容器
+        content_frame = ctk.CTkFrame(task_frame,
+                                   fg_color=self.colors["sidebar"],
+                                   border_width=1,
+                                   border_color=self.colors["border"])
+        content_frame.pack(fill="x", padx=(25, 0))
+        self.styles.register(content_frame, fg_color="sidebar", border_color="border")
+        
+        # 任务状态指示条（逾期时为红色）
+        overdue = is_overdue(task)
+        bar_token = "overdue" if overdue else "accent"
+        status_bar = ctk.CTkFrame(content_frame,
+                                width=3,
+                                height=28,  # 设置固定高度
+                                fg_color=self.colors[bar_token] if not task["completed"] else "#999999")
+        status_bar.pack(side="left")  # 移除 fill="y"
+        status_bar.pack_propagate(False)  # 保持固定大小
+        if not task["completed"]:
+            self.styles.register(status_bar, fg_color=bar_token)
+        
+        # 复选框
+        checkbox = ctk.CTkCheckBox(content_frame,
+                                text="",
+                                width=15,
+                                height=15,
+                                border_width=1,
+                                corner_radius=7.5,
+                                border_color=self.colors["border"] if not task["completed"] else self.colors["accent"],
+                                fg_color=self.colors["accent"],
+                                hover_color=self.colors["accent"],
+                                checkmark_color="white",
+                                checkbox_width=15,
+                                checkbox_height=15)
+        checkbox.pack(side="left", padx=(10, 5))
+        self.styles.register(checkbox,
+                             border_color="accent" if task["completed"] else "border",
+                             fg_color="accent",
+                             hover_color="accent")
+        
+        # 设置初始状态
+        if task["completed"]:
+            checkbox.select()
+        else:
+            checkbox.deselect()
+        
+        # 绑定命令
+        checkbox.configure(command=lambda idx=original_index: self.toggle_task(idx))
+        
+        # 计算可用宽度
+        available_width = content_frame.winfo_width() - 60  # 减去状态条、复选框和内边距的宽度
+        
+        # 使用 CTkFont 而不是 tkFont
+        task_font = ctk.CTkFont(
+            family="微软雅黑",
+            size=14,
+            slant="roman"
+        )
+        
+        # 任务文本
+        text = display_text(task)
+        if task["completed"]:
+            # 方法1：使用双重删除线
+            text = ''.join([char + '\u0336\u0336' for char in text])
             
-            # 绑定事件
-            for widget in [content_frame, label]:
-                widget.bind("<Button-1>", lambda e, t=task, f=task_frame: self.show_task_details(t, f))
-                widget.bind("<Button-3>", lambda e, t=task, i=i: self.show_task_menu(e, t, i))
+            # 或者方法2：使用粗删除线字符
+            # text = ''.join([char + '\u0335' for char in text])  # \u0335 是一个更粗的删除线字符
+        
+        # 任务文本标签
+        label = ctk.CTkLabel(content_frame,
+                            text=text,
+                            font=task_font,
+                            text_color="#AAAAAA" if task["completed"] else
+                            self.colors["overdue" if overdue else "text"],
+                            wraplength=400,  # 先设置一个初始值
+                            justify="left",
+                            anchor="w")
+        label.pack(side="left", 
+                  fill="x",
+                  expand=True,  # 改回 True，让标签能够占据可用空间
+                  padx=(5, 10),
+                  pady=(4, 4))
+        if not task["completed"]:
+            self.styles.register(label, text_color="overdue" if overdue else "text")
+        
+        def update_wraplength(label=label, content_frame=content_frame):
+            try:
+                # 计算实际可用宽度
+                content_width = content_frame.winfo_width()
+                if content_width > 0:
+                    # 减去左侧状态条、复选框和内边距的宽度
+                    available_width = content_width - 60
+                    if available_width > 0:
+                        label.configure(wraplength=available_width)
+                        # 强制更新布局
+                        label.update_idletasks()
+                        content_frame.update_idletasks()
+                # 删除这行，不要再次调度更新
+                # label.after(100, lambda: update_wraplength(label, content_frame))
+            except Exception as e:
+                print(f"Error updating wraplength: {str(e)}")
+        
+        # 绑定大小变化事件
+        content_frame.bind('<Configure>', lambda e, l=label, c=content_frame: update_wraplength(l, c))
+        
+        # 空闲时更新一次（随任务行销毁自动取消，重建列表时不会留下过期回调）
+        self.timers.after_idle(content_frame, update_wraplength)
+        
+        # 绑定事件
+        for widget in [content_frame, label]:
+            widget.bind("<Button-1>", lambda e, t=task, f=task_frame: self.show_task_details(t, f))
+            widget.bind("<Button-3>", lambda e, t=task, i=original_index: self.show_task_menu(e, t, i))
 
-    def toggle_section(self, button, content_frame):
+    def toggle_section(self, button, content_frame, key):
         """处理任务分组的展开/收起"""
         is_expanded = button.cget("text") == self.expand_symbols["expanded"]
         
@@ -1011,9 +2932,11 @@ class TaskManager:
         if is_expanded:  # 当前是展开状态，需要收起
             content_frame.pack_forget()
             button.configure(text=self.expand_symbols["collapsed"])
+            self.collapsed_sections.add(key)
         else:  # 当前是收起状态，需要展开
             content_frame.pack(fill="x", pady=(5, 0))
             button.configure(text=self.expand_symbols["expanded"])
+            self.collapsed_sections.discard(key)
         
         # 完成后重新绑定事件
         for widget in content_frame.winfo_children():
@@ -1034,38 +2957,17 @@ class TaskManager:
         
         return tasks.index(task)
         
-    def show_task_details(self, task, task_frame):
-        # 检查是否点击的是当前显示的任务
-        if (hasattr(self, 'detail_frame') and 
-            hasattr(self, 'current_detail_task') and 
-            self.detail_frame.winfo_exists() and 
-            self.current_detail_task == task):
-            self.hide_task_details()
-            return
-        
-        # 如果已经有详情面板，先关闭它
-        if hasattr(self, 'detail_frame') and self.detail_frame.winfo_exists():
-            self.detail_frame.destroy()
-        
-        # 取消之前选中的任务的高亮
-        if hasattr(self, 'last_selected_frame') and self.last_selected_frame:
-            try:
-                if self.last_selected_frame.winfo_exists():
-                    self.last_selected_frame.configure(fg_color="transparent")
-            except Exception:
-                pass
-        
-        # 高亮当前选中的任务
-        self.last_selected_frame = task_frame
-        task_frame.configure(fg_color=self.colors["selected"])
-        
-        # 保存当前显示的任务
-        self.current_detail_task = task
-        
-        # 创建详情面板
+    def create_detail_panel(self):
+        """创建任务详情面板（只创建一次，之后重新绑定到选中的任务）"""
         self.detail_frame = ctk.CTkFrame(self.right_pane, 
                                    fg_color=self.colors["sidebar"],
                                    width=300)
+        self.styles.register(self.detail_frame, fg_color="sidebar")
+        
+        # 当前显示的任务，以及各字段当前显示的值
+        self.current_detail_task = None
+        self.detail_values = {}
+        self.detail_visible = False
         
         # 内容区域
         content_frame = ctk.CTkFrame(self.detail_frame, fg_color="transparent")
@@ -1076,33 +2978,22 @@ class TaskManager:
         header_frame.pack(fill="x", pady=(0, 20))
         
         # 复选框
-        def on_checkbox_click():
-            # 获取任务在列表中的索引
-            tasks = self.categories[self.current_category]
-            task_index = tasks.index(task)
-            # 切换任务状态
-            self.toggle_task(task_index)
-            # 更新任务列表
-            self.update_task_list()
-            # 关闭详情面板
-            self.hide_task_details()
-        
-        checkbox = ctk.CTkCheckBox(header_frame,
+        self.detail_checkbox = ctk.CTkCheckBox(header_frame,
                                   text="",
-                                  command=on_checkbox_click,
+                                  command=self.on_detail_checkbox_click,
                                   width=15,
                                   height=15,
                                   border_width=1,
                                   corner_radius=7.5,
-                                  border_color=self.colors["border"] if not task["completed"] else self.colors["accent"],
+                                  border_color=self.colors["border"],
                                   fg_color=self.colors["accent"],
                                   hover_color=self.colors["accent"],
                                   checkmark_color="white",
                                   checkbox_width=15,
                                   checkbox_height=15)
-        checkbox.pack(side="left", anchor="n", pady=3)
-        if task["completed"]:
-            checkbox.select()
+        self.detail_checkbox.pack(side="left", anchor="n", pady=3)
+        self.styles.register(self.detail_checkbox, border_color="border",
+                             fg_color="accent", hover_color="accent")
         
         # 任务内容容器
         content_container = ctk.CTkFrame(header_frame, fg_color="transparent")
@@ -1111,7 +3002,7 @@ class TaskManager:
         # 任务内容标签（默认显示）
         self.content_label = ctk.CTkLabel(
             content_container,
-            text=task["text"],
+            text="",
             text_color=self.colors["text"],
             font=("微软雅黑", 14, "bold"),
             wraplength=250,
@@ -1131,142 +3022,193 @@ class TaskManager:
             height=100,  # 设置适当的高度
             width=250
         )
-        self.content_entry.insert("1.0", task["text"])
-
-        def start_edit(event=None):
-            # 隐藏标签，显示输入框
-            self.content_label.pack_forget()
-            self.content_entry.pack(fill="x", expand=True)  # 添加 expand=True 使文本框可以扩展
-            self.content_entry.focus()
-            return "break"  # 阻止事件继续传播
-        
-        def save_edit(event=None):
-            new_text = self.content_entry.get("1.0", "end-1c").strip()  # 获取文本框的所有内容
-            if new_text and new_text != task["text"]:
-                # 获取任务在列表中的索引
-                tasks = self.categories[self.current_category]
-                task_index = tasks.index(task)
-                # 更新任务文本
-                task["text"] = new_text
-                # 更新标签文本
-                self.content_label.configure(text=new_text)
-                # 保存更改
-                self.save_tasks()
-                # 更新任务列表显示
-                self.update_task_list()
-                # 更新类别列表（如果需要）
-                self.update_category_list()
-            
-            # 隐藏输入框，显示标签
-            self.content_entry.pack_forget()
-            self.content_label.pack(fill="x")
-            return "break"
-        
-        def cancel_edit(event=None):
-            # 取消编辑，恢复原文本
-            self.content_entry.pack_forget()
-            self.content_label.pack(fill="x")
-            return "break"
         
         # 绑事件
-        self.content_label.bind("<Button-1>", start_edit)  # 点击开始编辑
-        self.content_entry.bind("<Return>", save_edit)     # 回车保存
-        self.content_entry.bind("<FocusOut>", save_edit)   # 失去焦点时保存
-        self.content_entry.bind("<Escape>", cancel_edit)   # ESC取消编辑
+        self.content_label.bind("<Button-1>", self.start_detail_edit)  # 点击开始编辑
+        self.content_entry.bind("<Return>", self.save_detail_edit)     # 回车保存
+        self.content_entry.bind("<FocusOut>", self.save_detail_edit)   # 失去焦点时保存
+        self.content_entry.bind("<Escape>", self.cancel_detail_edit)   # ESC取消编辑
         
         # 任务信息
         info_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
         info_frame.pack(fill="x", pady=(0, 10))
         
-        # 所属清单
-        list_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
-        list_frame.pack(fill="x", pady=(0, 15))
-        list_label = ctk.CTkLabel(list_frame,
-                                 text="所属清单",
-                                 text_color=self.colors["text_secondary"],
-                                 font=("微软雅黑", 12))
-        list_label.pack(side="left", padx=(0, 15))
-        list_value = ctk.CTkLabel(list_frame,
-                                 text=self.current_category,
-                                 text_color=self.colors["text"],
-                                 font=("微软雅黑", 12))
-        list_value.pack(side="left")
-        
-        # 创建时间
-        create_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
-        create_frame.pack(fill="x", pady=(0, 15))
-        create_label = ctk.CTkLabel(create_frame,
-                                   text="创建时间",
-                                   text_color=self.colors["text_secondary"],
-                                   font=("微软雅黑", 12))
-        create_label.pack(side="left", padx=(0, 15))
-        create_value = ctk.CTkLabel(create_frame,
-                                   text=task["created_date"],
-                                   text_color=self.colors["text"],
-                                   font=("微软雅黑", 12))
-        create_value.pack(side="left")
-        
-        # 完成时间
-        complete_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
-        complete_frame.pack(fill="x")
-        complete_label = ctk.CTkLabel(complete_frame,
-                                     text="完成时间",
-                                     text_color=self.colors["text_secondary"],
-                                     font=("微软雅黑", 12))
-        complete_label.pack(side="left", padx=(0, 15))
-        completion_text = task["completed_date"] if task["completed"] else "未完成"
-        complete_value = ctk.CTkLabel(complete_frame,
-                                     text=completion_text,
-                                     text_color=self.colors["text"],
-                                     font=("微软雅黑", 12))
-        complete_value.pack(side="left")
+        # 所属清单、创建时间、完成时间
+        self.detail_value_labels = {}
+        for key, title in (("category", "所属清单"),
+                           ("priority", "优先级"),
+                           ("due", "截止时间"),
+                           ("remind", "提醒时间"),
+                           ("created", "创建时间"),
+                           ("completed_date", "完成时间")):
+            row_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
+            row_frame.pack(fill="x", pady=(0, 15))
+            title_label = ctk.CTkLabel(row_frame,
+                                       text=title,
+                                       text_color=self.colors["text_secondary"],
+                                       font=("微软雅黑", 12))
+            title_label.pack(side="left", padx=(0, 15))
+            value_label = ctk.CTkLabel(row_frame,
+                                       text="",
+                                       text_color=self.colors["text"],
+                                       font=("微软雅黑", 12))
+            value_label.pack(side="left")
+            self.styles.register(title_label, text_color="text_secondary")
+            self.styles.register(value_label, text_color="text")
+            self.detail_value_labels[key] = value_label
+        
+        for widget in (self.content_label, self.content_entry):
+            self.styles.register(widget, text_color="text")
+
+    def show_task_details(self, task, task_frame):
+        # 检查是否点击的是当前显示的任务
+        if self.detail_visible and self.current_detail_task is task:
+            self.hide_task_details()
+            return
         
-        # 修改点击外部区域关闭详情的逻辑
-        def on_click_outside(event):
+        # 取消之前选中的任务的高亮
+        if hasattr(self, 'last_selected_frame') and self.last_selected_frame:
             try:
-                # 确保详情面板还存在
-                if not hasattr(self, 'detail_frame') or not self.detail_frame.winfo_exists():
-                    self.root.unbind_all("<Button-1>")
-                    return
-                
-                # 获取点击位置相对于详情面板的坐标
-                x = event.x_root - self.detail_frame.winfo_rootx()
-                y = event.y_root - self.detail_frame.winfo_rooty()
-                
-                # 检查点击是否在详情面板外
-                if not (0 <= x <= self.detail_frame.winfo_width() and 
-                        0 <= y <= self.detail_frame.winfo_height()):
-                    self.hide_task_details()
-                    # 解绑点击事件
-                    self.root.unbind_all("<Button-1>")
-            except Exception as e:
-                # 如果发生错误，安全地关闭详情面板
-                if hasattr(self, 'detail_frame') and self.detail_frame.winfo_exists():
-                    self.hide_task_details()
-                self.root.unbind_all("<Button-1>")
+                self.styles.unregister(self.last_selected_frame)
+                if self.last_selected_frame.winfo_exists():
+                    self.last_selected_frame.configure(fg_color="transparent")
+            except Exception:
+                pass
+        
+        # 高亮当前选中的任务
+        self.last_selected_frame = task_frame
+        if task_frame is not None:
+            task_frame.configure(fg_color=self.colors["selected"])
+            self.styles.register(task_frame, fg_color="selected")
+        elif self.canvas_task_list is not None:
+            self.canvas_task_list.set_selected(task)
+        
+        # 把面板绑定到新的任务，只更新变化的字段
+        if self.current_detail_task is not task:
+            self.save_detail_edit()
+        self.current_detail_task = task
+        self.refresh_task_details()
+        
+        # 点击详情面板以外的区域时关闭（重新登记，避免这次点击立即关闭面板）
+        self.click_dispatcher.register(
+            self.detail_frame,
+            lambda event: OutsideClickDispatcher.inside(event, self.detail_frame),
+            self.hide_task_details
+        )
+        
+        if not self.detail_visible:
+            # 详情面板
+            self.detail_frame.pack(side="left", fill="y", padx=(10,0))
+            self.detail_visible = True
+
+    def refresh_task_details(self):
+        """用当前任务刷新详情面板，只修改与上次显示不同的字段"""
+        task = self.current_detail_task
+        if task is None:
+            return
+        
+        values = {
+            "text": task["text"],
+            "completed": task["completed"],
+            "category": self.task_category(task),
+            "priority": PRIORITY_NAMES.get(task.get("priority", 0), "无"),
+            "due": (task.get("due_date") or "无") + ("（已逾期）" if is_overdue(task) else ""),
+            "remind": task.get("remind_at") or "无",
+            "created": task["created_date"],
+            "completed_date": task["completed_date"] if task["completed"] else "未完成",
+        }
+        
+        for key, value in values.items():
+            if self.detail_values.get(key) == value:
+                continue
+            if key == "text":
+                self.content_label.configure(text=value)
+            elif key == "completed":
+                if value:
+                    self.detail_checkbox.select()
+                else:
+                    self.detail_checkbox.deselect()
+                border_token = "accent" if value else "border"
+                self.detail_checkbox.configure(border_color=self.colors[border_token])
+                self.styles.register(self.detail_checkbox, border_color=border_token)
+            else:
+                self.detail_value_labels[key].configure(text=value)
         
-        # 绑定点击事件
-        self.root.bind_all("<Button-1>", on_click_outside)
+        self.detail_values = values
+
+    def current_detail_index(self):
+        """详情面板中的任务在当前任务列表中的索引"""
+        if self.current_view is not None:
+            return next(i for i, (_, t) in enumerate(self.view_tasks) if t is self.current_detail_task)
+        tasks = self.categories[self.current_category]
+        return next(i for i, t in enumerate(tasks) if t is self.current_detail_task)
+
+    def on_detail_checkbox_click(self):
+        """详情面板中的复选框"""
+        if self.current_detail_task is None:
+            return
+        # 切换任务状态（会同时关闭详情面板）
+        self.toggle_task(self.current_detail_index())
+
+    def start_detail_edit(self, event=None):
+        # 隐藏标签，显示输入框
+        self.content_entry.delete("1.0", "end")
+        self.content_entry.insert("1.0", self.current_detail_task["text"])
+        self.content_label.pack_forget()
+        self.content_entry.pack(fill="x", expand=True)  # 添加 expand=True 使文本框可以扩展
+        self.content_entry.focus()
+        return "break"  # 阻止事件继续传播
+
+    def save_detail_edit(self, event=None):
+        task = self.current_detail_task
+        if task is None or not self.content_entry.winfo_ismapped():
+            return "break"
         
-        # 详情面板
-        self.detail_frame.pack(side="left", fill="y", padx=(10,0))
+        new_text = self.content_entry.get("1.0", "end-1c").strip()  # 获取文本框的所有内容
+        if new_text and new_text != task["text"]:
+            # 更新任务文本
+            task["text"] = new_text
+            # 更新标签文本
+            self.refresh_task_details()
+            # 保存更改
+            self.store_write(self.store.update_task, task)
+            # 同步拼音索引和重复检测索引
+            self.index_tasks([task])
+            # 通知视图更新
+            self.events.publish(ChangeEvent.TASKS, self.task_category(task), tasks=[task])
+        
+        # 隐藏输入框，显示标签
+        self.content_entry.pack_forget()
+        self.content_label.pack(fill="x")
+        return "break"
+
+    def cancel_detail_edit(self, event=None):
+        # 取消编辑，恢复原文本
+        if self.content_entry.winfo_ismapped():
+            self.content_entry.pack_forget()
+            self.content_label.pack(fill="x")
+        return "break"
 
     def hide_task_details(self):
-        """隐藏任务详情面板"""
-        if hasattr(self, 'detail_frame') and self.detail_frame.winfo_exists():
-            self.detail_frame.destroy()
+        """隐藏任务详情面板（保留控件供下次使用）"""
+        if self.detail_visible:
+            self.save_detail_edit()
+            self.detail_frame.pack_forget()
+            self.detail_visible = False
         if hasattr(self, 'last_selected_frame') and self.last_selected_frame:
             try:
+                self.styles.unregister(self.last_selected_frame)
                 if self.last_selected_frame.winfo_exists():
                     self.last_selected_frame.configure(fg_color="transparent")
             except Exception:
                 pass
+        if self.canvas_task_list is not None:
+            self.canvas_task_list.set_selected(None)
         # 清除当前显示的任务记录
-        if hasattr(self, 'current_detail_task'):
-            del self.current_detail_task
+        self.current_detail_task = None
         
-        # 解绑点击事件
-        self.root.unbind_all("<Button-1>")
+        # 取消点击外部区域的处理
+        self.click_dispatcher.unregister(self.detail_frame)
 
     # 添加创建菜单的方法
     def create_menu(self):
@@ -1279,6 +3221,7 @@ class TaskManager:
         view_menu.add_command(label="切换主题 (亮/暗)", command=self.toggle_theme)  # 修改菜单项文本
         view_menu.add_separator()
         view_menu.add_command(label="刷新", command=self.refresh_view)
+        view_menu.add_command(label="新建智能视图", command=self.create_smart_view)
         
         # 任务菜单
         task_menu = tk.Menu(menubar, tearoff=0)
@@ -1293,6 +3236,7 @@ class TaskManager:
         tools_menu.add_command(label="数据备份", command=self.backup_data)
         tools_menu.add_command(label="数据恢复", command=self.restore_data)
         tools_menu.add_separator()
+        tools_menu.add_command(label="合并重复任务", command=self.show_duplicates_report)
         tools_menu.add_command(label="清理已完成", command=self.clear_completed)
         
         # 帮助菜单
@@ -1303,7 +3247,9 @@ class TaskManager:
 
     # 添加菜单功能对应的方法
     def toggle_theme(self):
-        """切换主题并更新所有组件的颜色"""
+        """切换主题并原地更新所有组件的颜色"""
+        old_colors = self.colors
+        
         # 切换主题模式
         self.theme_mode = "dark" if self.theme_mode == "light" else "light"
         
@@ -1314,130 +3260,36 @@ class TaskManager:
         ctk.set_appearance_mode(self.theme_mode)
         
         # 更新所有组件颜色
-        self.update_theme_colors()
-        
-        # 更新菜单颜色
-        self.update_menu_colors()
+        self.update_theme_colors(old_colors)
         
         # 保存当前主题设置
         self.save_theme_preference()
 
-    def update_theme_colors(self):
-        """更新所有组件的颜色"""
-        # 更新主窗口
-        self.main_frame.configure(fg_color=self.colors["bg"])
-        
-        # 更新标题栏
-        self.title_bar.configure(fg_color=self.colors["titlebar"])
-        self.title_label.configure(text_color=self.colors["text"])
-        self.min_btn.configure(
-            text_color=self.colors["text"],
-            hover_color=self.colors["hover"]
-        )
-        self.close_btn.configure(
-            text_color=self.colors["text"],
-            hover_color="#FF4757"
-        )
-        
-        # 更新菜单栏
-        self.menu_bar.configure(fg_color=self.colors["menubar"])
-        
-        # 更新侧边栏
-        self.sidebar.configure(
-            fg_color=self.colors["sidebar"],
-            border_color=self.colors["border"]
-        )
-        
-        # 更新类别标题
-        self.category_title.configure(text_color=self.colors["text"])
-        
-        # 更新侧边栏切换按钮
-        self.sidebar_toggle_btn.configure(
-            text_color=self.colors["text"],
-            hover_color=self.colors["hover"]
-        )
-        
-        # 更新任务输入框
-        self.task_entry.configure(
-            border_color=self.colors["border"],
-            fg_color=self.colors["sidebar"],
-            text_color=self.colors["text"]
-        )
-        
-        # 更新右侧面板
-        self.right_pane.configure(
-            fg_color=self.colors["bg"],
-            border_color=self.colors["border"]
-        )
-        
-        # 更新任务框架
-        self.task_frame.configure(fg_color=self.colors["sidebar"])
-        
-        # 更新任务滚动区域
-        self.task_scroll.configure(fg_color=self.colors["bg"])
-        
-        # 更新主题按钮
+    def update_theme_colors(self, old_colors):
+        """按颜色登记表一次性更新已有组件，不重建任务列表"""
+        # 更新主题按钮图标
         self.theme_button.configure(
-            image=self.theme_icons["light" if self.theme_mode == "light" else "dark"],
-            text_color=self.colors["text"],
-            border_color=self.colors["border"],
-            hover_color=self.colors["hover"]
+            image=self.get_theme_icon("light" if self.theme_mode == "light" else "dark")
         )
         
-        # 更新类别按钮
-        self.update_category_list()
-        
-        # 更新任务列表
-        self.update_task_list()
+        # 更新登记过的控件、菜单和画布列表
+        self.styles.apply(old_colors, self.colors)
         
-        # 如果有任务详情面板，也需要更新它
-        if hasattr(self, 'detail_frame') and self.detail_frame.winfo_exists():
-            self.detail_frame.configure(fg_color=self.colors["sidebar"])
-            # 更新详情面板中的所有标签和按钮
-            for widget in self.detail_frame.winfo_children():
-                if isinstance(widget, ctk.CTkLabel):
-                    widget.configure(text_color=self.colors["text"])
-                elif isinstance(widget, ctk.CTkButton):
-                    widget.configure(
-                        text_color=self.colors["text"],
-                        hover_color=self.colors["hover"]
-                    )
-
-    def update_menu_colors(self):
-        """更新菜单相关的颜色"""
-        # 更新菜单栏背景
-        self.menu_bar.configure(fg_color=self.colors["menubar"])
-        
-        # 更新所有 CustomMenu 实例的颜色
-        for widget in self.menu_bar.winfo_children():
-            if isinstance(widget, ctk.CTkFrame):  # 菜单容器
-                for menu in widget.winfo_children():
-                    if isinstance(menu, CustomMenu):
-                        menu.update_colors(self.colors)
-                        # 更新菜单按钮颜色
-                        menu.menu_button.configure(
-                            text_color=self.colors["text"],
-                            hover_color=self.colors["hover"],
-                            fg_color="transparent"
-                        )
+        # 更新类别按钮和视图按钮
+        self.update_category_list()
+        self.update_view_buttons()
 
     def save_theme_preference(self):
         """保存主题设置到数据库"""
         try:
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO settings (key, value)
-                VALUES (?, ?)
-            ''', ('theme', self.theme_mode))
-            self.conn.commit()
+            self.store.set_settings({'theme': self.theme_mode})
         except Exception as e:
             print(f"Error saving theme: {str(e)}")
 
     def load_theme_preference(self):
         """从数据库加载主题设置"""
         try:
-            self.cursor.execute('SELECT value FROM settings WHERE key = ?', ('theme',))
-            result = self.cursor.fetchone()
-            self.theme_mode = result[0] if result else 'light'
+            self.theme_mode = self.store.get_settings().get('theme', 'light')
             self.colors = self.theme_colors[self.theme_mode]
             ctk.set_appearance_mode(self.theme_mode)
         except Exception as e:
@@ -1446,9 +3298,80 @@ class TaskManager:
             self.colors = self.theme_colors[self.theme_mode]
             ctk.set_appearance_mode(self.theme_mode)
 
+    def read_ui_state(self):
+        """从数据库读取上次退出时保存的界面状态"""
+        self.ui_state = {}
+        try:
+            self.ui_state = self.store.get_settings()
+        except Exception as e:
+            print(f"Error loading UI state: {str(e)}")
+
+    def load_ui_state(self):
+        """恢复上次退出时的类别、分组、排序和滚动位置"""
+        self.current_category = self.ui_state.get("selected_category") or None
+        try:
+            self.collapsed_sections = set(json.loads(self.ui_state.get("collapsed_sections", "[]")))
+            sort = json.loads(self.ui_state.get("task_sort", "{}"))
+            if sort.get("primary") in TASK_SORT_KEYS and sort.get("secondary") in (None, *TASK_SORT_KEYS):
+                self.task_sort.update(sort)
+            if "task_scroll" in self.ui_state:
+                self.pending_scroll = float(self.ui_state["task_scroll"])
+        except ValueError:
+            pass
+
+    def save_ui_state(self):
+        """把界面状态一次性写入数据库"""
+        try:
+            # 停靠收起时保存停靠前的大小
+            if self.dock.is_docked and self.dock.full_size:
+                width, height = self.dock.full_size
+            else:
+                width, height = self.dock.width, self.dock.height
+            state = {
+                "window_geometry": f"{width}x{height}+{self.dock.x}+{self.dock.y}",
+                "window_docked": "1" if self.dock.is_docked else "0",
+                "selected_category": self.current_category or "",
+                "selected_view": self.current_view.name if self.current_view else "",
+                "collapsed_sections": json.dumps(sorted(self.collapsed_sections)),
+                "task_sort": json.dumps(self.task_sort),
+                "task_scroll": str(self.task_scroll_position()),
+                "sidebar_expanded": "1" if self.is_expanded else "0",
+            }
+            self.store.set_settings(state)
+        except Exception as e:
+            print(f"Error saving UI state: {str(e)}")
+
+    def restore_window_geometry(self):
+        """恢复上次的窗口位置和大小，没有记录时居中显示
+
+        上次退出时处于停靠状态则返回 (x, 宽, 高)，创建停靠控制器后用它恢复停靠状态。
+        """
+        docked = self.ui_state.get("window_docked") == "1"
+        try:
+            size, x, y = self.ui_state["window_geometry"].split("+")
+            width, height = (int(v) for v in size.split("x"))
+            x, y = int(x), 0 if docked else int(y)
+            # 窗口至少要有一部分在屏幕内
+            if (width < 200 or height < 150 or
+                    not -width < x < self.root.winfo_screenwidth() or
+                    not 0 <= y < self.root.winfo_screenheight()):
+                raise ValueError("window outside screen")
+        except (KeyError, ValueError):
+            self.center_window(self.root, 900, 600)
+            return None
+        
+        self.root.geometry(f"{width}x{height}+{x}+{y}")
+        return (x, width, height) if docked else None
+
     def refresh_view(self):
-        self.update_category_list()
-        self.update_task_list()
+        """从数据库重新加载（其他程序，例如命令行工具，可能修改了数据）"""
+        if self.loading:
+            return
+        self.hide_task_details()
+        self.categories = {}
+        self.category_counts = {}
+        self.clear_indexes()
+        self.load_tasks()
 
     def import_tasks(self):
         # 实现导入任务功能
@@ -1460,14 +3383,32 @@ class TaskManager:
         if file_path:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    imported_data = json.load(f)
-                    self.categories.update(imported_data)
-                    self.save_tasks()
-                    self.update_category_list()
-                    self.update_task_list()
+                    imported_data = validate_import(json.load(f))
+                # 合并到同名类别中，跳过类别中已有的重复任务和文件中重复出现的任务
+                imported, skipped = self.skip_duplicate_imports(imported_data)
+                # 写入数据库，任务同时得到 id
+                self.store.import_categories(imported, merge=True)
+                for name, tasks in imported.items():
+                    self.categories.setdefault(name, []).extend(tasks)
+                    self.index_tasks(tasks)
+                self.recount_categories(imported)
+                self.events.publish(ChangeEvent.CATEGORIES)
+                self.events.publish(ChangeEvent.TASKS)
+                count = sum(len(tasks) for tasks in imported.values())
+                self.show_message("导入完成", f"导入了 {count} 个任务，跳过了 {skipped} 个重复任务")
             except Exception as e:
                 self.show_message("导入失败", f"导入务时出错：{str(e)}")
 
+    def skip_duplicate_imports(self, imported_data):
+        """去掉与目标类别中已有任务或文件中前面的任务重复的任务，返回 (保留的数据, 跳过的数量)"""
+        self.drain_duplicate_backlog()
+        
+        def existing(name, text):
+            return any(category == name for category, _ in
+                       self.find_tasks(self.duplicate_index.similar(text)))
+        
+        return skip_duplicates(imported_data, existing)
+
     def export_tasks(self):
         # 实现导出任务功能
         from tkinter import filedialog
@@ -1479,17 +3420,16 @@ class TaskManager:
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.categories, f, ensure_ascii=False, indent=2)
+                    json.dump(self.store.export_categories(), f, ensure_ascii=False, indent=2)
             except Exception as e:
                 self.show_message("失败", f"导出任务时出错：{str(e)}")
 
     def backup_data(self):
         # 实现数据备份
-        from datetime import datetime
         backup_file = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         try:
             with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(self.categories, f, ensure_ascii=False, indent=2)
+                json.dump(self.store.export_categories(), f, ensure_ascii=False, indent=2)
             self.show_message("备份成功", f"数据已备份至{backup_file}")
         except Exception as e:
             self.show_message("备份失败", f"备份数据时错：{str(e)}")
@@ -1504,27 +3444,144 @@ class TaskManager:
         if file_path:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    self.categories = json.load(f)
-                    self.save_tasks()
-                    self.update_category_list()
-                    self.update_task_list()
+                    categories = json.load(f)
+                # 用备份替换数据库中的全部数据；备份有误或为空时抛出异常，数据库不会改变
+                self.store.import_categories(categories, replace=True)
+                self.categories = categories
+                self.clear_indexes()
+                for tasks in categories.values():
+                    self.index_tasks(tasks)
+                if self.current_category not in self.categories:
+                    self.current_category = next(iter(self.categories))
+                self.hide_task_details()
+                self.recount_categories()
+                self.events.publish(ChangeEvent.CATEGORIES)
+                self.events.publish(ChangeEvent.TASKS)
                 self.show_message("恢复成功", "数据已恢复")
             except Exception as e:
                 self.show_message("恢复失败", f"恢复数据时出错：{str(e)}")
 
+    def show_duplicates_report(self):
+        """分批查找重复任务组，找到足够多的组或查找完毕后列出"""
+        if self.duplicate_search is not None:
+            return
+        self.drain_duplicate_backlog()
+        self.duplicate_search = (self.duplicate_index.stars(), [])
+        self.continue_duplicate_search()
+
+    def continue_duplicate_search(self):
+        """每次最多占用一个时间片查找，未完成的部分留到下一次"""
+        stars, groups = self.duplicate_search
+        deadline = time.perf_counter() + self.render_slice_ms / 1000
+        complete = False
+        while time.perf_counter() < deadline:
+            center_ids, other_ids = next(stars, (None, None))
+            if center_ids is None:
+                complete = True
+                break
+            center = list(self.find_tasks(center_ids))
+            if not center:
+                continue
+            # 中心文本的任务中优先保留未完成的，其次是最早创建的；其他任务只与中心相似
+            center.sort(key=lambda item: (item[1]["completed"], item[1]["id"]))
+            group = center + list(self.find_tasks(other_ids))
+            if len(group) > 1:
+                groups.append(group)
+                if len(groups) >= self.duplicate_report_size:
+                    break
+        else:
+            self.timers.after(self.root, 10, self.continue_duplicate_search)
+            return
+        self.duplicate_search = None
+        self.show_duplicate_groups(groups, complete)
+
+    def show_duplicate_groups(self, groups, complete):
+        """列出重复组，每组保留第一个任务；complete 为 False 时还有组未查找"""
+        if not groups:
+            self.show_message("合并重复任务", "没有找到重复的任务")
+            return
+        groups.sort(key=len, reverse=True)
+        extra = sum(len(group) - 1 for group in groups)
+        
+        window = ctk.CTkToplevel(self.root)
+        window.title("合并重复任务")
+        window.transient(self.root)
+        self.center_window(window, 560, 480)
+        
+        ctk.CTkLabel(window,
+                     text=f"找到 {len(groups)} 组重复任务，合并后将删除 {extra} 个任务",
+                     font=("微软雅黑", 13, "bold"),
+                     anchor="w").pack(fill="x", padx=15, pady=(15, 5))
+        
+        results = ctk.CTkScrollableFrame(window, fg_color="transparent")
+        results.pack(fill="both", expand=True, padx=10)
+        
+        # 只列出并合并最先找到的一部分组，其余的合并后再次查找
+        for group in groups:
+            group_frame = ctk.CTkFrame(results,
+                                       fg_color=self.colors["sidebar"],
+                                       border_width=1,
+                                       border_color=self.colors["border"])
+            group_frame.pack(fill="x", pady=(0, 8))
+            for i, (category, task) in enumerate(group):
+                mark = "保留" if i == 0 else "删除"
+                ctk.CTkLabel(group_frame,
+                             text=f"[{mark}] {category} · {task['text']}",
+                             font=("微软雅黑", 12),
+                             text_color=self.colors["text"] if i == 0 else self.colors["text_secondary"],
+                             anchor="w",
+                             justify="left").pack(fill="x", padx=10, pady=1)
+        if not complete:
+            ctk.CTkLabel(results,
+                         text="可能还有其他重复任务，合并后可以再次查找",
+                         font=("微软雅黑", 12),
+                         text_color=self.colors["text_secondary"]).pack(pady=5)
+        
+        def merge_all():
+            window.destroy()
+            self.merge_duplicates(groups)
+            self.show_message("合并完成", f"已删除 {extra} 个重复任务")
+        
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="全部合并", width=100,
+                      command=merge_all).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="取消", width=100,
+                      command=window.destroy).pack(side="left", padx=10)
+
+    def merge_duplicates(self, groups):
+        """每组保留第一个任务，删除其余任务"""
+        removed = {}
+        for group in groups:
+            for category, task in group[1:]:
+                removed.setdefault(category, set()).add(id(task))
+        task_ids = []
+        for category, keys in removed.items():
+            tasks = self.categories.get(category, [])
+            dropped = [task for task in tasks if id(task) in keys]
+            self.categories[category] = [task for task in tasks if id(task) not in keys]
+            task_ids.extend(task["id"] for task in dropped)
+            self.unindex_tasks(dropped)
+            self.events.publish(ChangeEvent.TASKS, category, removed=dropped)
+        self.store_write(self.store.delete_tasks, task_ids)
+        self.recount_categories(removed)
+
     def clear_completed(self):
         # 实现清已成任务功能
         if not self.show_confirm("确认清理", "确定要清理所有已完成的任务吗？"):
             return
         
+        self.store_write(self.store.clear_completed)
         for category in self.categories:
+            self.unindex_tasks(task for task in self.categories[category] if task["completed"])
             self.categories[category] = [
                 task for task in self.categories[category]
                 if not task["completed"]
             ]
-        self.save_tasks()
-        self.update_category_list()
-        self.update_task_list()
+            # 清理后剩下的都是未完成任务
+            self.category_counts[category] = [0, len(self.categories[category])]
+        self.events.publish(ChangeEvent.COUNTS)
+        self.events.publish(ChangeEvent.TASKS)
 
     def show_help(self):
         self.show_message("使用说明", 
@@ -1547,6 +3604,11 @@ class TaskManager:
             "让我们一起打造更好的软件生态！"
         )
 
+    def open_url(self, url):
+        """用默认浏览器打开链接"""
+        import webbrowser
+        webbrowser.open(url)
+
     def show_message(self, title, message):
         dialog = ctk.CTkToplevel(self.root)
         dialog.title(title)
@@ -1584,7 +3646,7 @@ class TaskManager:
                 cursor="hand2"
             )
             link_label.pack(pady=5)
-            link_label.bind("<Button-1>", lambda e: webbrowser.open(url_text))
+            link_label.bind("<Button-1>", lambda e: self.open_url(url_text))
             
             # 显示网址后的文本
             if post_text:
@@ -1723,10 +3785,12 @@ class TaskManager:
                 # 更新当前选中的类别
                 if self.current_category == category:
                     self.current_category = new_name
+                self.category_counts[new_name] = self.category_counts.pop(category, [0, 0])
                 
-                # 重新创建按钮并更新显示
-                self.repack_category_buttons()
-                self.save_tasks()
+                self.store_write(self.store.rename_category, category, new_name)
+                # 复用原来的按钮并更新显示
+                self.events.publish(ChangeEvent.CATEGORIES, new_name,
+                                    renamed={category: new_name})
             dialog.destroy()
         
         # 添加按钮
@@ -1756,16 +3820,199 @@ class TaskManager:
             return
         
         if self.show_confirm("确认删除", f"确定要删除类别 '{category}' 吗？\n该类别下的所有任务都将被删除。"):
-            del self.categories[category]
+            self.unindex_tasks(self.categories.pop(category))
+            self.category_counts.pop(category, None)
             if self.current_category == category:
                 self.current_category = next(iter(self.categories))
-            # 重创建所有类别按钮
-            self.repack_category_buttons()
             # 保存更改
-            self.save_tasks()
-            # 更新显示
-            self.update_category_list()
-            self.update_task_list()
+            self.store_write(self.store.delete_category, category)
+            # 移除对应的类别按钮并更新显示
+            self.events.publish(ChangeEvent.CATEGORIES, category)
+            self.events.publish(ChangeEvent.SELECTION, self.current_category)
+
+    def search_tasks(self, event=None):
+        """在所有类别中搜索任务，结果按相关度排列并分页显示"""
+        query = self.search_entry.get().strip()
+        if not query:
+            return
+        
+        if self.search_window is None or not self.search_window.winfo_exists():
+            self.search_window = ctk.CTkToplevel(self.root)
+            self.search_window.title("搜索结果")
+            self.search_window.transient(self.root)
+            self.center_window(self.search_window, 500, 450)
+            
+            self.search_title = ctk.CTkLabel(self.search_window,
+                                             text="",
+                                             font=("微软雅黑", 13, "bold"),
+                                             anchor="w")
+            self.search_title.pack(fill="x", padx=15, pady=(15, 5))
+            
+            self.search_results = ctk.CTkScrollableFrame(self.search_window, fg_color="transparent")
+            self.search_results.pack(fill="both", expand=True, padx=10)
+            
+            self.search_more_button = ctk.CTkButton(self.search_window,
+                                                    text="显示更多结果",
+                                                    width=120,
+                                                    command=self.show_more_search_results)
+        else:
+            for widget in self.search_results.winfo_children():
+                widget.destroy()
+            self.search_window.lift()
+        
+        self.search_query = query
+        self.search_offset = 0
+        self.search_shown = set()
+        
+        # 带 #标签 的查询直接在标签索引中求出全部结果
+        terms, words = parse_tag_query(query)
+        self.search_tag_results = None
+        if terms:
+            words = words.lower().split()
+            mask = self.get_tag_index().query(terms)
+            self.search_tag_results = [
+                (category, task) for category, task in self.tag_index.tasks_of(mask)
+                if all(word in task["text"].lower() for word in words)
+            ]
+        self.search_title.configure(text=f"“{query}” 的搜索结果")
+        self.show_more_search_results()
+
+    def on_search_key(self, event):
+        """搜索窗口打开时，随输入更新结果"""
+        query = self.search_entry.get().strip()
+        if (query and query != self.search_query
+                and self.search_window is not None and self.search_window.winfo_exists()):
+            self.search_tasks()
+
+    def index_tasks(self, tasks):
+        """把新增或修改了的任务加入拼音索引、重复检测索引和截止时间调度"""
+        tasks = [task for task in tasks if "id" in task]
+        self.pinyin_index.add_many((task["id"], task["text"]) for task in tasks)
+        self.deadlines.schedule(tasks)
+        if len(tasks) <= 20 and not self.duplicate_backlog:
+            self.duplicate_index.add_many((task["id"], task["text"]) for task in tasks)
+            return
+        # 大批任务（加载、导入）的签名在空闲时分批计算
+        self.duplicate_backlog.extend(tasks)
+        if self.duplicate_job is None:
+            self.duplicate_job = self.timers.after(self.root, 50, self.continue_duplicate_index)
+
+    def unindex_tasks(self, tasks):
+        """从索引中去掉已删除的任务"""
+        for task in tasks:
+            task_id = task.get("id")
+            self.pinyin_index.remove(task_id)
+            self.duplicate_index.remove(task_id)
+            self.deadlines.remove([task])
+            if self.duplicate_backlog:
+                self.duplicate_removed.add(task_id)
+
+    def clear_indexes(self):
+        self.pinyin_index.clear()
+        self.deadlines.clear()
+        self.duplicate_index.clear()
+        self.duplicate_backlog.clear()
+        self.duplicate_removed.clear()
+
+    def continue_duplicate_index(self):
+        """空闲时为一批任务计算签名，未完成的部分留到下一次"""
+        self.duplicate_job = None
+        self.index_duplicate_batch(time.perf_counter() + self.render_slice_ms / 1000)
+        if self.duplicate_backlog:
+            self.duplicate_job = self.timers.after(self.root, 20, self.continue_duplicate_index)
+
+    def index_duplicate_batch(self, deadline=None):
+        """处理待计算签名的任务，直到超过 deadline（None 表示全部处理完）"""
+        backlog = self.duplicate_backlog
+        while backlog and (deadline is None or time.perf_counter() < deadline):
+            task = backlog.popleft()
+            if task["id"] not in self.duplicate_removed:
+                self.duplicate_index.add(task["id"], task["text"])
+        if not backlog:
+            self.duplicate_removed.clear()
+
+    def drain_duplicate_backlog(self):
+        """需要完整结果时（重复报告、导入）立即处理剩余的任务"""
+        if self.duplicate_job is not None:
+            self.timers.cancel(self.duplicate_job)
+            self.duplicate_job = None
+        self.index_duplicate_batch()
+
+    def find_tasks(self, task_ids):
+        """按 id 找到任务，产生 (类别, 任务)"""
+        if self.task_locations is None:
+            self.task_locations = {
+                task.get("id"): (category, task)
+                for category, tasks in self.categories.items()
+                for task in tasks
+            }
+        for task_id in task_ids:
+            location = self.task_locations.get(task_id)
+            if location is not None:
+                yield location
+
+    def show_more_search_results(self):
+        """显示下一页搜索结果；第一页先列出拼音或首字母匹配的任务"""
+        if self.search_tag_results is not None:
+            results = self.search_tag_results[self.search_offset:
+                                              self.search_offset + self.search_page_size + 1]
+        else:
+            if self.search_offset == 0:
+                matches = self.pinyin_index.search(self.search_query, limit=self.search_page_size)
+                for category, task in self.find_tasks(matches):
+                    self.add_search_result(category, task)
+            try:
+                # 多取一条，用来判断是否还有下一页
+                results = list(self.store.search(self.search_query,
+                                                 limit=self.search_page_size + 1,
+                                                 offset=self.search_offset))
+            except Exception as e:
+                print(f"Error searching tasks: {str(e)}")
+                results = []
+        has_more = len(results) > self.search_page_size
+        results = results[:self.search_page_size]
+        
+        if self.search_offset == 0 and not results and not self.search_shown:
+            ctk.CTkLabel(self.search_results,
+                         text="没有找到匹配的任务",
+                         font=("微软雅黑", 12),
+                         text_color=self.colors["text_secondary"]).pack(pady=20)
+        self.search_offset += len(results)
+        
+        for category, task in results:
+            self.add_search_result(category, task)
+        
+        if has_more:
+            self.search_more_button.pack(pady=10)
+        else:
+            self.search_more_button.pack_forget()
+
+    def add_search_result(self, category, task):
+        """在搜索窗口中添加一条结果（已显示过的任务跳过）"""
+        if task["id"] in self.search_shown:
+            return
+        self.search_shown.add(task["id"])
+        ctk.CTkButton(
+            self.search_results,
+            text=f"{category}  ·  {task['text']}",
+            font=("微软雅黑", 12),
+            anchor="w",
+            fg_color="transparent",
+            text_color=self.colors["text_secondary"] if task["completed"] else self.colors["text"],
+            hover_color=self.colors["hover"],
+            command=lambda c=category, i=task["id"]: self.reveal_task(c, i)
+        ).pack(fill="x", pady=1)
+
+    def reveal_task(self, category, task_id):
+        """切换到任务所在的类别并显示任务详情"""
+        if category not in self.categories:
+            return
+        self.select_category(category)
+        # 先刷新任务列表，再打开详情面板
+        self.events.flush()
+        task = next((t for t in self.categories[category] if t.get("id") == task_id), None)
+        if task is not None:
+            self.show_task_details(task, None)
 
     # 添加数据分析窗口
     def show_category_analysis(self, category):
@@ -1874,85 +4121,102 @@ class TaskManager:
         y = widget.winfo_rooty()
         self.drag_window.geometry(f"+{x}+{y}")
 
+    def begin_category_drag(self):
+        """开始拖动：缓存一次按钮位置，并用占位框替换被拖动的按钮"""
+        widget = self.press_data["widget"]
+        self.is_dragging = True
+        
+        # 其余按钮在去掉被拖动按钮后的中线位置
+        start_index = self.category_buttons.index(widget)
+        slot_height = widget.winfo_height() + 4  # 按钮高度加上下间距
+        others = [btn for btn in self.category_buttons if btn is not widget]
+        midpoints = []
+        for i, btn in enumerate(others):
+            middle = btn.winfo_rooty() + btn.winfo_height() / 2
+            if i >= start_index:
+                middle -= slot_height
+            midpoints.append(middle)
+        
+        self.drag_geometry = {
+            "x": widget.winfo_rootx(),
+            "height": widget.winfo_height(),
+            "others": others,
+            "midpoints": midpoints,
+            "start_index": start_index,
+            "target_index": start_index,
+        }
+        
+        self.create_drag_window(widget, widget.cget("text"))
+        
+        # 占位框只创建一次
+        if self.drag_placeholder is None:
+            self.drag_placeholder = ctk.CTkFrame(self.category_frame, fg_color="transparent")
+        self.drag_placeholder.configure(height=widget.winfo_height())
+        self.drag_placeholder.pack(fill="x", pady=2, after=widget)
+        
+        # 隐藏原始按钮
+        widget.pack_forget()
+
     def on_drag_motion(self, event):
-        if not hasattr(self, 'press_data') or not self.press_data:
+        if not self.press_data:
             return
         
         # 检查是否已经拖拽足够长时间
         if event.time - self.press_data["time"] < 200:
             return
         
-        widget = self.press_data["widget"]
+        self.press_data["pointer_y"] = event.y_root
         
         # 创建拖拽预览窗口
         if not self.drag_window and abs(event.y_root - self.press_data["start_y"]) > 10:
-            self.is_dragging = True
-            self.create_drag_window(widget, widget.cget("text"))
-            # 隐藏原始按钮
-            widget.pack_forget()
+            self.begin_category_drag()
         
-        if self.drag_window:
-            # 移动预览窗口（使用整数坐标
-            x = int(widget.winfo_rootx())
-            y = int(event.y_root - widget.winfo_height()/2)
-            self.drag_window.geometry(f"+{x}+{y}")
-            
-            # 计算目标位置
-            current_index = self.category_buttons.index(widget)
-            target_index = current_index
-            
-            # 清除之前的占位
-            for w in self.category_frame.winfo_children():
-                if isinstance(w, ctk.CTkFrame) and w not in self.category_buttons:
-                    w.destroy()
-            
-            # 确定所有按钮都可见
-            for btn in self.category_buttons:
-                if btn != widget and not btn.winfo_viewable():
-                    btn.pack(fill="x", pady=2)
-            
-            # 在当前位置创建占位
-            placeholder_height = widget.winfo_height() + 4
-            
-            # 遍历所有按钮找到目标位置
-            found_target = False
-            for i, btn in enumerate(self.category_buttons):
-                if btn == widget:
-                    continue
-                btn_y = btn.winfo_rooty()
-                if not found_target and event.y_root < btn_y + btn.winfo_height()/2:
-                    target_index = i
-                    # 在目标位置前插入空白
-                    spacer = ctk.CTkFrame(self.category_frame, 
-                                        height=placeholder_height,
-                                        fg_color="transparent")
-                    spacer.pack(fill="x", before=btn)
-                    found_target = True
-            
-            # 如果鼠标在最后一个位置
-            if not found_target:
-                target_index = len(self.category_buttons)
-                spacer = ctk.CTkFrame(self.category_frame,
-                                    height=placeholder_height,
-                                    fg_color="transparent")
-                spacer.pack(fill="x")
-            
-            # 记录目标位置
-            self.press_data["target_index"] = target_index
+        # 按显示帧率合并处理拖动事件
+        if self.drag_window and self.drag_motion_job is None:
+            self.drag_motion_job = self.timers.after(self.root, self.drag_frame_ms, self.process_drag_motion)
+
+    def process_drag_motion(self):
+        """移动预览窗口，并在目标位置变化时移动占位框"""
+        self.drag_motion_job = None
+        if not self.drag_window or not self.press_data:
+            return
+        
+        geometry = self.drag_geometry
+        y = self.press_data["pointer_y"]
+        
+        # 移动预览窗口（使用整数坐标）
+        self.drag_window.geometry(f"+{geometry['x']}+{int(y - geometry['height'] / 2)}")
+        
+        # 用缓存的位置计算目标位置
+        target_index = bisect.bisect_left(geometry["midpoints"], y)
+        if target_index == geometry["target_index"]:
+            return
+        geometry["target_index"] = target_index
+        
+        others = geometry["others"]
+        if target_index < len(others):
+            self.drag_placeholder.pack(fill="x", pady=2, before=others[target_index])
+        elif others:
+            self.drag_placeholder.pack(fill="x", pady=2, after=others[-1])
 
     def on_button_release(self, event):
-        if not hasattr(self, 'press_data') or not self.press_data:
+        if not self.press_data:
             return
         
         try:
+            if self.drag_motion_job:
+                self.timers.cancel(self.drag_motion_job)
+                self.drag_motion_job = None
+            
             # 如果有生拖拽，则处理为点击事件
-            if not hasattr(self, 'is_dragging') or not self.is_dragging:
+            if not self.is_dragging or not self.drag_geometry:
                 category = self.press_data["category"]
                 self.select_category(category)
             else:
                 # 如果发生了拖拽，更新顺序
-                current_index = self.category_buttons.index(self.press_data["widget"])
-                target_index = self.press_data.get("target_index", current_index)
+                current_index = self.drag_geometry["start_index"]
+                target_index = self.drag_geometry["target_index"]
+                old_order = list(self.categories)
                 
                 if target_index != current_index:
                     # 更新类别数据
@@ -1961,69 +4225,116 @@ class TaskManager:
                     categories.insert(target_index, category)
                     self.categories = dict(categories)
                 
-                # 重新创建所有按钮
-                self.repack_category_buttons()
-                self.save_tasks()
-                self.update_category_list()
+                # 放回被拖动的按钮，只保存位置变化的类别
+                self.drag_placeholder.pack_forget()
+                self.save_category_positions(old_order)
+                self.events.publish(ChangeEvent.CATEGORIES)
+                self.events.flush()
         finally:
             # 清理状态
             if self.drag_window:
                 self.drag_window.destroy()
                 self.drag_window = None
-            # 清除所有临时占位符
-            for widget in self.category_frame.winfo_children():
-                if isinstance(widget, ctk.CTkFrame):
-                    widget.destroy()
+            if self.drag_placeholder is not None:
+                self.drag_placeholder.pack_forget()
             self.press_data = None
+            self.drag_geometry = None
             self.is_dragging = False
 
-    def repack_category_buttons(self):
-        # 重新排列所有类别按钮并更新命令
-        categories = list(self.categories.keys())
-        
-        # 清除所有按钮
-        for btn in self.category_frame.winfo_children():
-            btn.pack_forget()
-        
-        # 重新创建和排按钮
-        self.category_buttons = []
-        
-        # 创建绑定事件的辅助函数
-        def create_button_press_handler(btn, cat):
-            return lambda e: self.on_button_press(e, btn, cat)
+    def save_category_positions(self, old_order):
+        """只把位置发生变化的类别写回数据库"""
+        changed = [
+            (position, name)
+            for position, name in enumerate(self.categories)
+            if position >= len(old_order) or old_order[position] != name
+        ]
+        if not changed:
+            return
         
-        def create_menu_handler(cat):
-            return lambda e: self.show_category_menu(e, cat)
+        try:
+            self.store.save_category_positions(changed)
+        except Exception as e:
+            print(f"Error saving category positions: {str(e)}")
+
+    def sync_category_buttons(self, renamed=None):
+        """按类别名称增量同步侧边栏按钮，只创建、销毁或移动发生变化的按钮"""
+        # 重命名的类别沿用原来的按钮
+        for old_name, new_name in (renamed or {}).items():
+            btn = self.category_button_map.pop(old_name, None)
+            if btn is not None:
+                btn._category_name = new_name
+                self.category_button_map[new_name] = btn
+        
+        # 销毁已删除类别的按钮
+        for name in [n for n in self.category_button_map if n not in self.categories]:
+            self.category_button_map.pop(name).destroy()
+        
+        # 为新类别创建按钮
+        for name in self.categories:
+            if name not in self.category_button_map:
+                self.category_button_map[name] = self.create_category_button(name)
+        
+        new_order = [self.category_button_map[name] for name in self.categories]
+        # 只考虑仍然存在且已布局的按钮（拖拽时被临时隐藏的按钮需要重新放置）
+        old_order = [btn for btn in self.category_buttons
+                     if self.category_button_map.get(btn._category_name) is btn
+                     and btn.winfo_manager()]
+        
+        # 保持最长的相对顺序不变的按钮不动，只移动其余按钮
+        old_positions = {btn: i for i, btn in enumerate(old_order)}
+        kept_buttons = [btn for btn in new_order if btn in old_positions]
+        stable = {kept_buttons[i] for i in longest_increasing_subsequence(
+            [old_positions[btn] for btn in kept_buttons])}
+        
+        if not stable:
+            for btn in old_order:
+                btn.pack_forget()
+            for btn in new_order:
+                btn.pack(fill="x", pady=2)
+        else:
+            first_stable = next(btn for btn in new_order if btn in stable)
+            previous = None
+            for btn in new_order:
+                if btn not in stable:
+                    if previous is None:
+                        btn.pack(fill="x", pady=2, before=first_stable)
+                    else:
+                        btn.pack(fill="x", pady=2, after=previous)
+                previous = btn
         
-        for category in categories:
-            btn = ctk.CTkButton(self.category_frame,
-                               text=category,
-                               command=None,
-                               fg_color="transparent",
-                               text_color=self.colors["text"],
-                               hover_color=self.colors["hover"],
-                               anchor="w",
-                               height=28,
-                               font=("微软雅黑", 11))
-            btn.pack(fill="x", pady=2)
-            
-            # 使用辅助函数创建事件处理器
-            btn.bind("<Button-3>", create_menu_handler(category))
-            btn.bind("<Button-1>", create_button_press_handler(btn, category))
-            btn.bind("<B1-Motion>", self.on_drag_motion)
-            btn.bind("<ButtonRelease-1>", self.on_button_release)
-            
-            self.category_buttons.append(btn)
+        self.category_buttons = new_order
         
-        # 新类别列表显示
+        # 更新类别列表显示
         self.update_category_list()
 
+    def create_category_button(self, category):
+        """创建类别按钮，事件处理器在触发时读取按钮当前对应的类别"""
+        btn = ctk.CTkButton(self.category_frame,
+                           text=category,
+                           command=None,
+                           fg_color="transparent",
+                           text_color=self.colors["text"],
+                           hover_color=self.colors["hover"],
+                           anchor="w",
+                           height=28,
+                           font=("微软雅黑", 11))
+        btn._category_name = category
+        
+        btn.bind("<Button-3>", lambda e, b=btn: self.show_category_menu(e, b._category_name))
+        btn.bind("<Button-1>", lambda e, b=btn: self.on_button_press(e, b, b._category_name))
+        btn.bind("<B1-Motion>", self.on_drag_motion)
+        btn.bind("<ButtonRelease-1>", self.on_button_release)
+        return btn
+
     # 添加任务键菜单方法
     def show_task_menu(self, event, task, task_index):
         menu = tk.Menu(self.root, tearoff=0)
         menu.add_command(label="编辑", 
                         command=lambda: self.edit_task(task_index))
         menu.add_cascade(label="移动到", menu=self.create_move_menu(task_index))
+        menu.add_cascade(label="优先级", menu=self.create_priority_menu(task_index))
+        menu.add_command(label="截止和提醒...",
+                        command=lambda: self.edit_task_dates(task_index))
         menu.add_command(label="删除",
                         command=lambda: self.delete_task(task_index))
         
@@ -2056,8 +4367,9 @@ class TaskManager:
         )
         
         # 添加所有可用类
+        current, _ = self.locate_task(task_index)
         for category in self.categories:
-            if category != self.current_category:
+            if category != current:
                 move_menu.add_command(
                     label=category,
                     command=lambda c=category: self.move_task(task_index, c)
@@ -2065,9 +4377,139 @@ class TaskManager:
         
         return move_menu
 
+    def create_priority_menu(self, task_index):
+        priority_menu = tk.Menu(self.root, tearoff=0)
+        priority_menu.configure(
+            font=("微软雅黑", 10),
+            bg=self.colors["sidebar"],
+            fg=self.colors["text"],
+            activebackground=self.colors["accent"],
+            activeforeground="white"
+        )
+        for priority, name in PRIORITY_NAMES.items():
+            priority_menu.add_command(
+                label=name,
+                command=lambda p=priority: self.set_task_priority(task_index, p)
+            )
+        return priority_menu
+
+    def set_task_priority(self, task_index, priority):
+        category, task_index = self.locate_task(task_index)
+        task = self.categories[category][task_index]
+        if task.get("priority", 0) == priority:
+            return
+        task["priority"] = priority
+        self.store_write(self.store.update_task, task)
+        self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
+
+    def edit_task_dates(self, task_index):
+        """设置截止时间和提醒时间（留空表示不设置）"""
+        category, task_index = self.locate_task(task_index)
+        task = self.categories[category][task_index]
+        
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title("截止和提醒")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        self.center_window(dialog, 400, 230)
+        
+        entries = {}
+        for field, title in (("due_date", "截止时间（YYYY-MM-DD HH:MM，可只写日期）:"),
+                             ("remind_at", "提醒时间（YYYY-MM-DD HH:MM）:")):
+            ctk.CTkLabel(dialog, text=title, font=("微软雅黑", 12)).pack(pady=(15, 2))
+            entry = ctk.CTkEntry(dialog, width=350)
+            entry.pack(padx=20)
+            if task.get(field):
+                entry.insert(0, task[field])
+            entries[field] = entry
+        
+        def save_dates():
+            values = {}
+            for field, entry in entries.items():
+                text = entry.get().strip()
+                try:
+                    values[field] = parse_time(text) if text else None
+                except ValueError:
+                    entry.configure(border_color="red")
+                    return
+            dialog.destroy()
+            if all(task.get(field) == value for field, value in values.items()):
+                return
+            task.update(values)
+            self.store_write(self.store.update_task, task)
+            self.deadlines.schedule([task])
+            self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
+        
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.pack(pady=(15, 10))
+        ctk.CTkButton(button_frame, text="确定", command=save_dates,
+                      width=80).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="取消", command=dialog.destroy,
+                      width=80).pack(side="left", padx=10)
+
+    def on_deadlines(self, fired):
+        """截止或提醒时间到了：刷新逾期显示和智能视图，并弹出通知"""
+        lines = []
+        target = None
+        for kind, task in fired:
+            if task["completed"]:
+                continue
+            location = next(self.find_tasks([task["id"]]), None)
+            if location is None:
+                continue
+            category = location[0]
+            if kind == "due":
+                # 任务变为逾期：只重新判断这个任务
+                self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
+            lines.append(f"{'已到期' if kind == 'due' else '提醒'} · {task['text'][:30]}")
+            if target is None:
+                target = (category, task["id"])
+        if lines:
+            self.show_notification(lines, target)
+
+    def show_notification(self, lines, target=None):
+        """在屏幕右下角显示通知，几秒后自动关闭；点击时打开对应的任务"""
+        if self.notification is not None and self.notification.winfo_exists():
+            self.notification.destroy()
+        window = self.notification = ctk.CTkToplevel(self.root)
+        window.overrideredirect(True)
+        window.attributes("-topmost", True)
+        
+        frame = ctk.CTkFrame(window,
+                             fg_color=self.colors["sidebar"],
+                             border_width=1,
+                             border_color=self.colors["accent"])
+        frame.pack(fill="both", expand=True)
+        shown = lines[:5]
+        if len(lines) > len(shown):
+            shown.append(f"还有 {len(lines) - len(shown)} 项")
+        labels = [ctk.CTkLabel(frame,
+                               text=line,
+                               font=("微软雅黑", 12),
+                               text_color=self.colors["text"],
+                               anchor="w") for line in shown]
+        for label in labels:
+            label.pack(fill="x", padx=12, pady=(6, 0))
+        
+        width, height = 320, 24 * len(shown) + 24
+        x = window.winfo_screenwidth() - width - 20
+        y = window.winfo_screenheight() - height - 60
+        window.geometry(f"{width}x{height}+{x}+{y}")
+        
+        def open_task(event=None):
+            window.destroy()
+            if target is not None:
+                self.reveal_task(*target)
+        
+        for widget in (frame, *labels):
+            widget.bind("<Button-1>", open_task, add="+")
+        self.timers.after(window, 8000, window.destroy)
+        self.root.bell()
+
     # 编辑任务
     def edit_task(self, task_index):
-        task = self.categories[self.current_category][task_index]
+        category, task_index = self.locate_task(task_index)
+        task = self.categories[category][task_index]
         
         dialog = ctk.CTkToplevel(self.root)
         dialog.title("编辑任务")
@@ -2093,8 +4535,9 @@ class TaskManager:
             new_text = entry.get().strip()
             if new_text and new_text != task["text"]:
                 task["text"] = new_text
-                self.save_tasks()
-                self.update_task_list()
+                self.store_write(self.store.update_task, task)
+                self.index_tasks([task])
+                self.events.publish(ChangeEvent.TASKS, category, tasks=[task])
             dialog.destroy()
         
         # 添加按钮
@@ -2119,19 +4562,27 @@ class TaskManager:
 
     # 移动任务到其他类别
     def move_task(self, task_index, target_category):
-        task = self.categories[self.current_category].pop(task_index)
+        category, task_index = self.locate_task(task_index)
+        task = self.categories[category].pop(task_index)
         self.categories[target_category].append(task)
-        self.save_tasks()
-        self.update_task_list()
-        self.update_category_list()
+        completed = 1 if task["completed"] else 0
+        self.adjust_category_count(category, completed=-completed, total=-1)
+        self.adjust_category_count(target_category, completed=completed, total=1)
+        self.store_write(self.store.move_tasks, [task["id"]], target_category)
+        self.events.publish(ChangeEvent.TASKS, category, removed=[task])
+        self.events.publish(ChangeEvent.TASKS, target_category, tasks=[task])
 
     # 删除任务
     def delete_task(self, task_index):
         if self.show_confirm("确认删除", "确定要删除这个任务吗？"):
-            self.categories[self.current_category].pop(task_index)
-            self.save_tasks()
-            self.update_task_list()
-            self.update_category_list()
+            category, task_index = self.locate_task(task_index)
+            task = self.categories[category].pop(task_index)
+            self.adjust_category_count(category,
+                                       completed=-1 if task["completed"] else 0,
+                                       total=-1)
+            self.store_write(self.store.delete_tasks, [task["id"]])
+            self.unindex_tasks([task])
+            self.events.publish(ChangeEvent.TASKS, category, removed=[task])
 
     # 在 TaskManager 类中添加窗口居中方法
     def center_window(self, window, width=None, height=None):
@@ -2159,12 +4610,12 @@ class TaskManager:
                                      fg_color=self.colors["titlebar"])
         self.title_bar.pack(fill="x", side="top")
         self.title_bar.pack_propagate(False)
+        self.styles.register(self.title_bar, fg_color="titlebar")
         
         # 加载并显示图标
         try:
-            icon_image = Image.open(get_resource_path("logo.png"))
-            # 调整图标大小以适应标题栏
-            icon_image = icon_image.resize((20, 20))
+            # 使用缓存中已调整为标题栏大小的图标
+            icon_image = Image.open(get_cached_icon("logo.png", (20, 20)))
             
             # 使用 CTkImage 替代 PhotoImage
             self.title_icon = ctk.CTkImage(
@@ -2192,6 +4643,7 @@ class TaskManager:
                           font=("微软雅黑", 12),
                           text_color=self.colors["text"])
         self.title_label.pack(side="left")
+        self.styles.register(self.title_label, text_color="text")
         
         # 窗口控制按钮容器
         btn_container = ctk.CTkFrame(self.title_bar, fg_color="transparent")
@@ -2207,6 +4659,7 @@ class TaskManager:
                            text_color=self.colors["text"],
                            hover_color=self.colors["hover"])
         self.min_btn.pack(side="left", padx=2)
+        self.styles.register(self.min_btn, text_color="text", hover_color="hover")
         
         # 关闭按钮
         self.close_btn = ctk.CTkButton(btn_container,
@@ -2219,229 +4672,97 @@ class TaskManager:
                      hover_color="#FF4757",
                      font=("Arial", 14))  # 使用 Arial 字体
         self.close_btn.pack(side="left", padx=2)
-        
-        # 绑定拖动事件 - 只需要绑定开始拖动事件
-        self.title_bar.bind("<Button-1>", self.start_move)
-        self.title_label.bind("<Button-1>", self.start_move)
+        self.styles.register(self.close_btn, text_color="text")
+        
+        # 绑定拖动事件
+        self.move_offset = None
+        for widget in (self.title_bar, self.title_label):
+            widget.bind("<Button-1>", self.start_move)
+            widget.bind("<B1-Motion>", self.on_move_motion)
+        # Windows 原生拖动时松开事件不一定落在标题栏上，绑定在窗口上
+        self.root.bind("<ButtonRelease-1>", self.on_drag_end, add="+")
 
     def start_move(self, event):
         """处理窗口拖动开始"""
-        try:
-            # 取消所有定时器
-            self.cancel_timers()
-            
-            # 设置拖动状态
-            self.is_dragging = True
-            
-            # 保存拖动开始时的位置
-            self.drag_start_y = event.y_root
-            
-            from ctypes import windll
-            # 获取窗口句柄
-            hwnd = windll.user32.GetParent(self.root.winfo_id())
-            
-            # 使用 Windows API 处理拖动
-            windll.user32.ReleaseCapture()
-            windll.user32.PostMessageW(hwnd, 0xA1, 2, 0)
-            
-            # 绑定鼠标释放事件
-            self.root.bind("<ButtonRelease-1>", self.on_drag_end, add="+")
-            
-        except Exception as e:
-            print(f"Error in start_move: {str(e)}")
-
-    def on_drag_end(self, event):
-        """处理拖动结束"""
-        try:
-            if not self.is_dragging:
-                return
-            
-            # 重置拖动状态
-            self.is_dragging = False
-            
-            # 解绑鼠标释放事件
-            self.root.unbind("<ButtonRelease-1>")
-            
-            # 获取当前窗口位置
-            window_y = self.root.winfo_y()
-            
-            # 如果窗口在顶部区域
-            if window_y < 20:
-                if not self.is_docked:
-                    # 保存原始几何信息
-                    self.original_geometry = self.root.geometry()
-                    # 设置停靠状态
-                    self.is_docked = True
-                    # 吸附到顶部
-                    x = self.root.winfo_x()
-                    self.root.wm_geometry(f"+{x}+0")
-                    # 延迟启动自动隐藏
-                    self.root.after(500, self.schedule_hide)
-                    # 绑定鼠标事件
-                    self.root.bind("<Enter>", self.on_mouse_enter)
-                    self.root.bind("<Leave>", self.on_mouse_leave)
-            else:
-                # 如果窗口离开顶部区域且当前是停靠状态
-                if self.is_docked:
-                    self.undock_window()
-                    
-        except Exception as e:
-            print(f"Error in on_drag_end: {str(e)}")
-        finally:
-            self.is_dragging = False
-
-    def undock_window(self):
-        """取消窗口停靠状态"""
-        if not self.is_docked:
-            return
-        
-        self.is_docked = False
-        self.cancel_timers()
+        self.dock.begin_move()
+        self.move_offset = None
         
-        if self.original_geometry:
-            # 从原始几何信息中获取宽度和高度
+        if sys.platform == "win32":
             try:
-                width, height = map(int, self.original_geometry.split('+')[0].split('x'))
-                x = self.root.winfo_x()
-                y = self.root.winfo_y()
-                # 保持当前x位置，使用原始宽度和高度
-                self.root.geometry(f"{width}x{height}+{x}+{y}")
-            except:
-                # 如果解析失败，直接使用原始几何信息
-                self.root.geometry(self.original_geometry)
-            
-            self.original_geometry = None
+                from ctypes import windll
+                # 获取窗口句柄
+                hwnd = windll.user32.GetParent(self.root.winfo_id())
+                
+                # 使用 Windows API 处理拖动
+                windll.user32.ReleaseCapture()
+                windll.user32.PostMessageW(hwnd, 0xA1, 2, 0)
+                return
+            except Exception as e:
+                print(f"Error in start_move: {str(e)}")
         
-        # 解绑鼠标事件
-        self.root.unbind("<Enter>")
-        self.root.unbind("<Leave>")
+        # 其他平台：记录鼠标相对窗口的偏移，由 <B1-Motion> 移动窗口
+        self.move_offset = (event.x_root - self.dock.x, event.y_root - self.dock.y)
 
-    def check_dock_position(self):
-        """检查窗口位置并决定是否停靠"""
-        # 如果正在拖动，不进行停靠检查
-        if self.is_dragging:
+    def on_move_motion(self, event):
+        """手动拖动窗口（非 Windows 平台）"""
+        if self.move_offset is None:
             return
-        
-        if not hasattr(self, 'checking_position'):
-            self.checking_position = False
-        
-        if self.checking_position:
+        x = event.x_root - self.move_offset[0]
+        y = event.y_root - self.move_offset[1]
+        self.root.geometry(f"+{x}+{y}")
+
+    def on_drag_end(self, event=None):
+        """处理拖动结束"""
+        if not self.dock.moving:
             return
-        
-        self.checking_position = True
+        self.move_offset = None
         try:
-            # 获取窗口当前位置
-            x = self.root.winfo_x()
-            y = self.root.winfo_y()
-            
-            # 如果窗口靠近顶部（小于20像素）且未停靠
-            if y < 20 and not self.is_docked:
-                # 保存原始位置和大小
-                self.original_geometry = self.root.geometry()
-                # 设置停靠标志
-                self.is_docked = True
-                # 延迟启动自动隐藏
-                self.schedule_hide()
-        finally:
-            self.checking_position = False
+            self.dock.end_move()
+        except Exception as e:
+            print(f"Error in on_drag_end: {str(e)}")
 
-    def schedule_hide(self):
-        """计划隐藏窗口"""
-        if not self.is_docked:
-            return
-        
-        # 取消所有现有定时器
-        self.cancel_timers()
-        
-        # 设置新的隐藏定时器
-        self.hide_timer = self.root.after(500, self.hide_window)
+    def notify_instance_command(self):
+        """在接收命令的后台线程中调用：发送虚拟事件唤醒界面线程"""
+        try:
+            self.root.event_generate("<<InstanceCommand>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass  # 窗口已关闭，或主循环尚未开始（开始后会处理一次队列）
 
-    def hide_window(self):
-        """隐藏窗口，只留下一小部分"""
-        if not self.is_docked:
-            return
-            
-        # 获取当前窗口位置
-        x = self.root.winfo_x()
-        
-        # 保存完整状态的位置和大小
-        if not self.original_geometry:
-            self.original_geometry = self.root.geometry()
-        
-        # 使用固定宽度
-        self.root.geometry(f"{self.dock_width}x{self.dock_height}+{x}+0")
+    def process_instance_commands(self, event=None):
+        """处理其他实例转交过来的命令"""
+        while True:
+            try:
+                command = self.instance_server.commands.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_instance_command(command)
 
-    def show_window(self):
-        """显示完整窗口"""
-        if not self.is_docked or not self.original_geometry:
-            return
-        
+    def handle_instance_command(self, command):
+        """执行命令行命令：添加任务，或把窗口显示到前面"""
         try:
-            # 获取当前位置
-            current_x = self.root.winfo_x()
-            
-            # 从原始几何信息中获取宽度和高度
-            width, height = map(int, self.original_geometry.split('+')[0].split('x'))
-            
-            # 使用当前x位置和原始宽度、高度
-            self.root.geometry(f"{width}x{height}+{current_x}+0")
-            
-            # 确保窗口大小不超过屏幕
-            screen_width = self.root.winfo_screenwidth()
-            if current_x + width > screen_width:
-                # 如果窗口超出屏幕右边界，调整x坐标
-                new_x = max(0, screen_width - width)
-                self.root.geometry(f"{width}x{height}+{new_x}+0")
-            
-            # 重新绑定鼠标离开事件
-            self.root.bind("<Leave>", self.on_mouse_leave)
-            
+            if command.get("action") == "add" and command.get("text"):
+                category = command.get("category") or self.current_category
+                created_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+                if self.loading:
+                    self.pending_new_tasks.append((category, command["text"], created_date))
+                else:
+                    self.create_task(category, command["text"], created_date)
+            else:
+                self.root.deiconify()
+                self.root.lift()
+                if self.dock.is_docked:
+                    self.dock.show()
         except Exception as e:
-            print(f"Error restoring window: {str(e)}")
-            # 如果出错，尝试直接使用原始几何信息
-            self.root.geometry(self.original_geometry)
-
-    def on_mouse_enter(self, event):
-        """鼠标进入窗口区域"""
-        if self.is_docked:
-            # 取消任何正在进行的隐藏计时
-            self.cancel_timers()
-            
-            # 如果窗口当前是隐藏状态，则显示
-            if self.root.winfo_height() <= self.dock_height + 5:
-                self.show_window()
-
-    def on_mouse_leave(self, event):
-        """鼠标离开窗口区域"""
-        if self.is_docked:
-            # 检查鼠标是否真的离开了窗口区域
-            x = self.root.winfo_pointerx()
-            y = self.root.winfo_pointery()
-            win_x = self.root.winfo_x()
-            win_y = self.root.winfo_y()
-            win_width = self.root.winfo_width()
-            win_height = self.root.winfo_height()
-            
-            # 添加一点检测余量
-            margin = 2
-            if not (win_x - margin <= x <= win_x + win_width + margin and 
-                    win_y - margin <= y <= win_y + win_height + margin):
-                self.schedule_hide()
-
-    def cancel_timers(self):
-        """取消所有定时器"""
-        for timer_attr in ['hide_timer', 'show_timer']:
-            if hasattr(self, timer_attr) and getattr(self, timer_attr):
-                self.root.after_cancel(getattr(self, timer_attr))
-                setattr(self, timer_attr, None)
+            print(f"Error handling instance command: {str(e)}")
 
     def on_closing(self):
         """处理窗口关闭事件"""
         try:
-            self.cancel_timers()  # 确保清理所有定时器
-            self.save_tasks()
-            if hasattr(self, 'conn'):
-                self.conn.close()
+            self.instance_server.close()
+            self.dock.cancel_timers()  # 确保清理所有定时器
+            self.save_ui_state()
+            if hasattr(self, 'store'):
+                self.store.close()
             self.root.quit()
         except:
             self.root.quit()
@@ -2487,6 +4808,7 @@ class TaskManager:
             
             # 立即隐藏内容避免拖影
             self.category_title.pack_forget()
+            self.view_frame.pack_forget()
             self.category_frame.pack_forget()
             
             # 更新按钮文本并保持在原位
@@ -2511,72 +4833,44 @@ class TaskManager:
 
     def animate_sidebar(self, start_width, end_width, is_expanding):
         """处理侧边栏动画效果"""
-        if not hasattr(self, 'animation_id'):
-            self.animation_id = None
-        
-        # 如果有正在进行的动画，取消它
-        if self.animation_id:
-            self.root.after_cancel(self.animation_id)
-            self.animation_id = None
-        
         # 确保结束宽度不超过最大宽度
         if is_expanding:
             end_width = min(end_width, self.max_width)
         
-        duration = 200
-        steps = 15
-        step_time = duration / steps
-        width_step = (end_width - start_width) / steps
+        def show_content():
+            if not self.category_title.winfo_ismapped():
+                self.category_title.pack(in_=self.title_bar_frame, side="left", padx=10)
+            if not self.view_frame.winfo_ismapped():
+                self.view_frame.pack(fill="x", padx=(10, 0), pady=(0, 6))
+            if not self.category_frame.winfo_ismapped():
+                self.category_frame.pack(fill="both", expand=True, padx=(10, 0))
+        
+        def update_width(width):
+            # 确保新宽度不超过最大宽度
+            self.sidebar.configure(width=min(int(width), self.max_width))
+            
+            # 展开动画接近结束时开始显示内容
+            if is_expanding and width >= end_width - (end_width - start_width) * 0.2:
+                show_content()
         
-        def update_width(current_step):
-            if current_step < steps:
-                try:
-                    new_width = int(start_width + (width_step * current_step))
-                    # 确保新宽度不超过最大宽度
-                    new_width = min(new_width, self.max_width)
-                    self.sidebar.configure(width=new_width)
-                    
-                    # 如果是展开动画的最后几步，开始显示内容
-                    if is_expanding and current_step > steps * 0.8:
-                        if not self.category_title.winfo_ismapped():
-                            self.category_title.pack(in_=self.title_bar_frame, side="left", padx=10)
-                        if not self.category_frame.winfo_ismapped():
-                            self.category_frame.pack(fill="both", expand=True, padx=10)
-                    
-                    # 保存动画ID以便可以取消
-                    self.animation_id = self.root.after(int(step_time), 
-                                                          lambda: update_width(current_step + 1))
-                except Exception as e:
-                    print(f"Animation error: {str(e)}")
-                    self.cleanup_animation()
-            else:
-                try:
-                    # 确保最终宽度精确且不超过最大宽度
-                    final_width = min(end_width, self.max_width)
-                    self.sidebar.configure(width=final_width)
-                    
-                    # 如果是展开动画，确保内容完全显示
-                    if is_expanding:
-                        if not self.category_title.winfo_ismapped():
-                            self.category_title.pack(in_=self.title_bar_frame, side="left", padx=10)
-                        if not self.category_frame.winfo_ismapped():
-                            self.category_frame.pack(fill="both", expand=True, padx=10)
-                    
-                    # 清理动画状态
-                    self.cleanup_animation()
-                except Exception as e:
-                    print(f"Animation completion error: {str(e)}")
-                    self.cleanup_animation()
+        def finish():
+            # 确保最终宽度精确且不超过最大宽度
+            self.sidebar.configure(width=min(end_width, self.max_width))
+            
+            # 如果是展开动画，确保内容完全显示
+            if is_expanding:
+                show_content()
+            
+            # 清理动画状态
+            self.is_animating = False
         
-        # 开始动画
-        update_width(0)
+        # 同名动画会被替换
+        self.animations.animate("sidebar", start_width, end_width, 200, update_width, finish)
 
     def cleanup_animation(self):
         """清理动画相关的状态"""
         self.is_animating = False
-        if hasattr(self, 'animation_id') and self.animation_id:
-            self.root.after_cancel(self.animation_id)
-            self.animation_id = None
+        self.animations.cancel("sidebar")
 
     def create_menu_bar(self):
         # 创建菜单栏容器
@@ -2589,6 +4883,7 @@ class TaskManager:
         )
         self.menu_bar.pack(fill="x", side="top")
         self.menu_bar.pack_propagate(False)
+        self.styles.register(self.menu_bar, fg_color="menubar")
         
         # 创建菜单项容器
         menu_container = ctk.CTkFrame(
@@ -2604,11 +4899,15 @@ class TaskManager:
             {
                 "切换主题 (亮/暗)": self.toggle_theme,
                 "-": None,
-                "刷新": self.refresh_view
+                "刷新": self.refresh_view,
+                "新建智能视图": self.create_smart_view
             },
-            self.colors
+            self.colors,
+            self.click_dispatcher,
+            self.timers
         )
         view_menu.pack(side="left", padx=2)
+        self.styles.add_listener(view_menu.update_colors)
         
         # 任务菜单
         task_menu = CustomMenu(
@@ -2619,9 +4918,12 @@ class TaskManager:
                 "导入任务": self.import_tasks,
                 "导出任务": self.export_tasks
             },
-            self.colors
+            self.colors,
+            self.click_dispatcher,
+            self.timers
         )
         task_menu.pack(side="left", padx=2)
+        self.styles.add_listener(task_menu.update_colors)
         
         # 工具菜单
         tools_menu = CustomMenu(
@@ -2631,11 +4933,15 @@ class TaskManager:
                 "数据备份": self.backup_data,
                 "数据恢复": self.restore_data,
                 "-": None,
+                "合并重复任务": self.show_duplicates_report,
                 "清理已完成": self.clear_completed
             },
-            self.colors
+            self.colors,
+            self.click_dispatcher,
+            self.timers
         )
         tools_menu.pack(side="left", padx=2)
+        self.styles.add_listener(tools_menu.update_colors)
         
         # 帮助菜单
         help_menu = CustomMenu(
@@ -2645,9 +4951,12 @@ class TaskManager:
                 "使用说明": self.show_help,
                 "关于": self.show_about
             },
-            self.colors
+            self.colors,
+            self.click_dispatcher,
+            self.timers
         )
         help_menu.pack(side="left", padx=2)
+        self.styles.add_listener(help_menu.update_colors)
         
         # 在右侧添加主题切换按钮
         theme_container = ctk.CTkFrame(
@@ -2660,7 +4969,7 @@ class TaskManager:
         self.theme_button = ctk.CTkButton(
             theme_container,
             text="",  # 不使用文本
-            image=self.theme_icons["light" if self.theme_mode == "light" else "dark"],
+            image=self.get_theme_icon("light" if self.theme_mode == "light" else "dark"),
             width=32,
             height=32,
             corner_radius=8,
@@ -2672,9 +4981,40 @@ class TaskManager:
             command=self.toggle_theme
         )
         self.theme_button.pack(side="right")
+        self.styles.register(self.theme_button,
+                             text_color="text",
+                             hover_color="hover",
+                             border_color="border")
+        
+        # 搜索框（在所有类别中查找）
+        self.search_entry = ctk.CTkEntry(
+            self.menu_bar,
+            placeholder_text="搜索任务...",
+            width=180,
+            height=28,
+            font=("微软雅黑", 11),
+            border_color=self.colors["border"]
+        )
+        self.search_entry.pack(side="right")
+        self.search_entry.bind("<Return>", self.search_tasks)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key, add="+")
+        self.styles.register(self.search_entry,
+                             border_color="border",
+                             fg_color="sidebar",
+                             text_color="text")
 
 if __name__ == "__main__":
+    instance_server = InstanceServer()
+    if not instance_server.start() and instance_server.already_running:
+        # 转交命令之后另一个实例才开始监听：再转交一次，不启动第二个界面
+        if not forward_to_running_instance(sys.argv[1:]):
+            print("Error forwarding command: 已有实例在运行，转交命令失败")
+            sys.exit(1)
+        sys.exit(0)
     root = ctk.CTk()
-    app = TaskManager(root)
-    app.center_window(root, 900, 600)
+    app = TaskManager(root, instance_server)
+    # 第一个实例也处理自己的 --add 参数
+    command = parse_args(sys.argv[1:])
+    if command["action"] == "add":
+        app.handle_instance_command(command)
     root.mainloop()
\ No newline at end of file
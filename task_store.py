@@ -0,0 +1,503 @@
+"""任务数据存储（SQLite）
+
+界面程序和命令行工具共用这一层，只依赖标准库。每个修改只写入发生变化的行，
+多个进程同时使用同一个数据库时不会互相覆盖。
+"""
+import re
+import sqlite3
+from datetime import datetime
+
+DB_PATH = "bobomaker.db"
+DEFAULT_CATEGORIES = ["工作", "个人", "学习", "其他"]
+TASK_COLUMNS = "t.id, c.name, t.text, t.completed, t.created_date, t.completed_date, t.priority, t.due_date, t.remind_at"
+# 后来增加的列：列名 -> 定义
+TASK_EXTRA_COLUMNS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",   # 0 无，1 低，2 中，3 高
+    "due_date": "TEXT",                         # 截止时间，格式与其他日期相同
+    "remind_at": "TEXT",                        # 提醒时间
+}
+FTS_MIN_LENGTH = 3      # trigram 分词至少需要 3 个字符
+
+# 保持全文索引与 tasks 表同步的触发器
+FTS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF text ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO tasks_fts (rowid, text) VALUES (new.id, new.text);
+    END''',
+]
+
+TAG_PATTERN = re.compile(r"#([\w\-/]+)")
+
+def normalize_tag(name):
+    """标签不区分大小写，去掉开头的 #"""
+    return name.lstrip("#").casefold()
+
+def parse_tags(text):
+    """任务文本中的 #标签，按出现顺序去重"""
+    return list(dict.fromkeys(normalize_tag(name) for name in TAG_PATTERN.findall(text)))
+
+def parse_tag_query(query):
+    """把查询拆成 (标签条件, 其余文字)
+
+    每个条件是 (是否取反, [标签])："#a #b" 同时带 a 和 b，"#a|#b" 带 a 或 b，"-#a" 不带 a。
+    """
+    terms, words = [], []
+    for token in query.split():
+        negate = token.startswith("-#")
+        body = token[1:] if negate else token
+        if body.startswith("#"):
+            names = [normalize_tag(name) for name in body.split("|")]
+            names = [name for name in names if name]
+            if names:
+                terms.append((negate, names))
+        else:
+            words.append(token)
+    return terms, " ".join(words)
+
+def now():
+    """当前时间，精确到分钟"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+def parse_time(text):
+    """解析 "YYYY-MM-DD HH:MM"；只有日期时取当天 23:59。格式不对时抛出 ValueError"""
+    text = text.strip()
+    try:
+        return datetime.strptime(text, "%Y-%m-%d %H:%M").strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        return datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d 23:59")
+
+def validate_import(categories):
+    """检查导入的 {类别名称: [任务]}，为缺少的字段填入默认值；格式不对时抛出 ValueError"""
+    if not isinstance(categories, dict):
+        raise ValueError("导入的数据应为 {类别名称: [任务]}")
+    for name, tasks in categories.items():
+        if not isinstance(tasks, list):
+            raise ValueError(f"类别 {name} 的任务应为列表")
+        for position, task in enumerate(tasks, 1):
+            if not isinstance(task, dict) or not isinstance(task.get("text"), str) or not task["text"].strip():
+                raise ValueError(f"类别 {name} 的第 {position} 个任务缺少文本")
+            task["completed"] = bool(task.get("completed", False))
+            task.setdefault("created_date", now())
+            task.setdefault("completed_date", None)
+    return categories
+
+def task_from_row(row):
+    """把查询结果转换为任务字典"""
+    task_id, _, text, completed, created_date, completed_date, priority, due_date, remind_at = row
+    return {
+        "id": task_id,
+        "text": text,
+        "completed": bool(completed),
+        "created_date": created_date,
+        "completed_date": completed_date,
+        "priority": priority,
+        "due_date": due_date,
+        "remind_at": remind_at
+    }
+
+def casefold(text):
+    """不区分大小写比较用的文本，SQL 中的 casefold() 与 Python 使用相同的规则"""
+    return text.casefold() if text is not None else None
+
+class TaskStore:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        # 其他进程写入时最多等待 5 秒
+        self.conn = sqlite3.connect(db_path, timeout=5)
+        # SQLite 的 lower() 只转换 ASCII 字母
+        self.conn.create_function("casefold", 1, casefold, deterministic=True)
+        self.init_schema()
+
+    def init_schema(self):
+        """创建数据表（已存在时跳过）"""
+        with self.conn:
+            # 类别表
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS categories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    position INTEGER NOT NULL
+                )
+            ''')
+            # 任务表
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    category_id INTEGER,
+                    text TEXT NOT NULL,
+                    completed BOOLEAN NOT NULL DEFAULT 0,
+                    created_date TEXT NOT NULL,
+                    completed_date TEXT,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    due_date TEXT,
+                    remind_at TEXT,
+                    FOREIGN KEY (category_id) REFERENCES categories (id)
+                )
+            ''')
+            self.add_missing_columns()
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category_id)
+            ''')
+            # 智能视图按完成状态和日期筛选
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed, completed_date)
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_date)
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (completed, due_date)
+            ''')
+            # 设置表
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+        self.init_tags()
+        self.has_fts = self.init_fts()
+
+    def add_missing_columns(self):
+        """旧版本创建的数据库缺少后来增加的列（在调用方的事务中执行）"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(tasks)')}
+        for name, definition in TASK_EXTRA_COLUMNS.items():
+            if name not in columns:
+                self.conn.execute(f'ALTER TABLE tasks ADD COLUMN {name} {definition}')
+
+    def init_tags(self):
+        """标签表和任务-标签关联表；第一次创建时从已有任务的文本中提取标签"""
+        with self.conn:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'task_tags'").fetchone()
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS tags (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS task_tags (
+                    task_id INTEGER NOT NULL,
+                    tag_id INTEGER NOT NULL,
+                    PRIMARY KEY (task_id, tag_id)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags (tag_id)
+            ''')
+            # 删除任务时一并删除其标签关联
+            self.conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS task_tags_delete AFTER DELETE ON tasks BEGIN
+                    DELETE FROM task_tags WHERE task_id = old.id;
+                END
+            ''')
+            if not exists:
+                for task_id, text in self.conn.execute(
+                        "SELECT id, text FROM tasks WHERE text LIKE '%#%'").fetchall():
+                    self.save_tags(task_id, text)
+
+    def init_fts(self):
+        """创建任务文本的全文索引（trigram 分词，中文不需要空格也能匹配），由触发器保持同步
+
+        SQLite 不支持 FTS5 或 trigram 分词时返回 False，搜索改用 LIKE。
+        """
+        try:
+            with self.conn:
+                exists = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+                self.conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                        text, content='tasks', content_rowid='id', tokenize='trigram'
+                    )
+                ''')
+                for trigger in FTS_TRIGGERS:
+                    self.conn.execute(trigger)
+                if not exists:
+                    # 为已有的任务建立索引
+                    self.conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def close(self):
+        self.conn.close()
+
+    # 设置
+
+    def get_settings(self):
+        return dict(self.conn.execute('SELECT key, value FROM settings'))
+
+    def set_settings(self, values):
+        """在一个事务中写入多项设置"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                values.items())
+
+    # 类别
+
+    def category_names(self):
+        """按显示顺序返回所有类别名称"""
+        return [name for name, in self.conn.execute(
+            'SELECT name FROM categories ORDER BY position')]
+
+    def ensure_default_categories(self):
+        """数据库中没有类别时创建默认类别"""
+        if self.conn.execute('SELECT 1 FROM categories LIMIT 1').fetchone() is None:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO categories (name, position) VALUES (?, ?)',
+                    [(name, i) for i, name in enumerate(DEFAULT_CATEGORIES)])
+
+    def category_id(self, name, create=False):
+        """类别的 id；类别不存在时按 create 决定新建还是返回 None"""
+        row = self.conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute('''
+            INSERT INTO categories (name, position)
+            VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM categories))
+        ''', (name,)).lastrowid
+
+    def add_category(self, name):
+        with self.conn:
+            return self.category_id(name, create=True)
+
+    def rename_category(self, old_name, new_name):
+        with self.conn:
+            self.conn.execute('UPDATE categories SET name = ? WHERE name = ?', (new_name, old_name))
+
+    def delete_category(self, name):
+        """删除类别及其中的所有任务"""
+        with self.conn:
+            category_id = self.category_id(name)
+            self.conn.execute('DELETE FROM tasks WHERE category_id = ?', (category_id,))
+            self.conn.execute('DELETE FROM categories WHERE id = ?', (category_id,))
+
+    def save_category_positions(self, changed):
+        """changed: [(位置, 类别名称)]，只更新位置变化的类别"""
+        with self.conn:
+            self.conn.executemany('UPDATE categories SET position = ? WHERE name = ?', changed)
+
+    def category_counts(self):
+        """用一条聚合查询得到各类别的 [已完成数, 总数]"""
+        return {
+            name: [completed, total]
+            for name, completed, total in self.conn.execute('''
+                SELECT c.name, COALESCE(SUM(t.completed), 0), COUNT(t.id)
+                FROM categories c LEFT JOIN tasks t ON t.category_id = c.id
+                GROUP BY c.id
+                ORDER BY c.position
+            ''')
+        }
+
+    # 任务
+
+    def add_task(self, category, task):
+        """插入一个任务，把新的 id 写回 task 并返回"""
+        with self.conn:
+            task["id"] = self.insert_task(self.category_id(category, create=True), task)
+        return task["id"]
+
+    def insert_task(self, category_id, task):
+        task_id = self.conn.execute('''
+            INSERT INTO tasks (category_id, text, completed, created_date, completed_date,
+                               priority, due_date, remind_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (category_id, task["text"], 1 if task["completed"] else 0,
+              task["created_date"], task["completed_date"], task.get("priority", 0),
+              task.get("due_date"), task.get("remind_at"))).lastrowid
+        if "#" in task["text"]:
+            self.save_tags(task_id, task["text"])
+        return task_id
+
+    def save_tags(self, task_id, text):
+        """按任务文本更新任务的标签（在调用方的事务中执行）"""
+        self.conn.execute('DELETE FROM task_tags WHERE task_id = ?', (task_id,))
+        names = parse_tags(text)
+        if not names:
+            return
+        self.conn.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)',
+                              ((name,) for name in names))
+        self.conn.execute(f'''
+            INSERT INTO task_tags (task_id, tag_id)
+            SELECT ?, id FROM tags WHERE name IN ({", ".join("?" * len(names))})
+        ''', [task_id, *names])
+
+    def add_tasks(self, category, texts, created_date=None, due_date=None):
+        """在一个事务中批量添加任务，返回添加的数量"""
+        created_date = created_date or now()
+        count = 0
+        with self.conn:
+            category_id = self.category_id(category, create=True)
+            for text in texts:
+                # 逐个插入以得到 id，写入标签关联
+                self.insert_task(category_id, {
+                    "text": text,
+                    "completed": False,
+                    "created_date": created_date,
+                    "completed_date": None,
+                    "due_date": due_date
+                })
+                count += 1
+        return count
+
+    def iter_tasks(self, category=None, completed=None, batch_size=1000, tags=None, where=None):
+        """逐批读取任务，产生 (类别名称, 任务字典)
+
+        tags 为 parse_tag_query 得到的标签条件；where 为附加的 (条件, 参数)，
+        条件中可以使用 t（任务表）和 c（类别表）。
+        """
+        conditions, params = [], []
+        if category is not None:
+            conditions.append("c.name = ?")
+            params.append(category)
+        if completed is not None:
+            conditions.append("t.completed = ?")
+            params.append(1 if completed else 0)
+        for negate, names in tags or ():
+            conditions.append(f'''t.id {"NOT IN" if negate else "IN"} (
+                SELECT tt.task_id FROM task_tags tt JOIN tags g ON g.id = tt.tag_id
+                WHERE g.name IN ({", ".join("?" * len(names))}))''')
+            params.extend(names)
+        if where and where[0]:
+            conditions.append(where[0])
+            params.extend(where[1])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.execute(f'''
+            SELECT {TASK_COLUMNS}
+            FROM tasks t JOIN categories c ON t.category_id = c.id
+            {where}
+            ORDER BY c.position, t.id
+        ''', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield row[1], task_from_row(row)
+
+    def update_task(self, task):
+        """把任务的文本、完成状态、优先级和截止/提醒时间写回数据库"""
+        with self.conn:
+            self.conn.execute('''
+                UPDATE tasks SET text = ?, completed = ?, completed_date = ?, priority = ?,
+                                 due_date = ?, remind_at = ?
+                WHERE id = ?
+            ''', (task["text"], 1 if task["completed"] else 0, task["completed_date"],
+                  task.get("priority", 0), task.get("due_date"), task.get("remind_at"), task["id"]))
+            self.save_tags(task["id"], task["text"])
+
+    def set_completed(self, task_ids, completed=True):
+        """批量设置完成状态，返回修改的数量"""
+        completed_date = now() if completed else None
+        with self.conn:
+            cursor = self.conn.executemany('''
+                UPDATE tasks SET completed = ?, completed_date = ?
+                WHERE id = ? AND completed != ?
+            ''', ((1 if completed else 0, completed_date, task_id, 1 if completed else 0)
+                  for task_id in task_ids))
+        return cursor.rowcount
+
+    def move_tasks(self, task_ids, category):
+        """批量移动任务到指定类别（不存在时新建），返回移动的数量"""
+        with self.conn:
+            category_id = self.category_id(category, create=True)
+            cursor = self.conn.executemany(
+                'UPDATE tasks SET category_id = ? WHERE id = ?',
+                ((category_id, task_id) for task_id in task_ids))
+        return cursor.rowcount
+
+    def delete_tasks(self, task_ids):
+        with self.conn:
+            self.conn.executemany('DELETE FROM tasks WHERE id = ?',
+                                  ((task_id,) for task_id in task_ids))
+
+    def tag_counts(self):
+        """各标签的任务数，按数量从多到少排列"""
+        return dict(self.conn.execute('''
+            SELECT g.name, COUNT(*)
+            FROM tags g JOIN task_tags tt ON tt.tag_id = g.id
+            GROUP BY g.id
+            ORDER BY COUNT(*) DESC, g.name
+        '''))
+
+    def clear_completed(self):
+        """删除所有已完成任务，返回删除的数量"""
+        with self.conn:
+            return self.conn.execute('DELETE FROM tasks WHERE completed = 1').rowcount
+
+    def search(self, text, category=None, limit=None, offset=0):
+        """在所有类别中查找任务，按相关度排序，产生 (类别名称, 任务字典)
+
+        空格分隔的多个词需要同时匹配。每个词都不少于 3 个字符时使用全文索引，
+        否则（例如两个字的中文词）逐行 LIKE 匹配，按未完成、最新排序。
+        """
+        terms = text.split()
+        if not terms:
+            return
+        params = []
+        if self.has_fts and all(len(term) >= FTS_MIN_LENGTH for term in terms):
+            # 每个词作为一个短语，避免被当作 FTS 查询语法
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in terms))
+            source = "tasks_fts f JOIN tasks t ON t.id = f.rowid"
+            where = "tasks_fts MATCH ?"
+            order = "f.rank"
+        else:
+            params.extend("%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                          for term in terms)
+            source = "tasks t"
+            where = " AND ".join("t.text LIKE ? ESCAPE '\\'" for _ in terms)
+            order = "t.completed, t.id DESC"
+        if category is not None:
+            where += " AND c.name = ?"
+            params.append(category)
+        params.extend([-1 if limit is None else limit, offset])
+        for row in self.conn.execute(f'''
+            SELECT {TASK_COLUMNS}
+            FROM {source} JOIN categories c ON t.category_id = c.id
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        ''', params):
+            yield row[1], task_from_row(row)
+
+    # 导入导出
+
+    def import_categories(self, categories, replace=False, merge=False):
+        """导入 {类别名称: [任务]}：同名类别的任务被替换（merge 为 True 时追加）；
+        replace 为 True 时先清空所有数据
+
+        任务字典中会写入新的 id，缺少的字段填入默认值。数据有误时抛出 ValueError，
+        此时数据库不会改变。
+        """
+        validate_import(categories)
+        if replace and not categories:
+            raise ValueError("导入的数据中没有类别，不能替换现有数据")
+        with self.conn:
+            if replace:
+                self.conn.execute('DELETE FROM tasks')
+                self.conn.execute('DELETE FROM categories')
+            for name, tasks in categories.items():
+                category_id = self.category_id(name, create=True)
+                if not merge:
+                    self.conn.execute('DELETE FROM tasks WHERE category_id = ?', (category_id,))
+                for task in tasks:
+                    task["id"] = self.insert_task(category_id, task)
+
+    def export_categories(self):
+        """{类别名称: [任务]}，任务不含 id，可以再次导入"""
+        categories = {name: [] for name in self.category_names()}
+        for name, task in self.iter_tasks():
+            del task["id"]
+            categories[name].append(task)
+        return categories
@@ -0,0 +1,30 @@
+from duplicate_index import DuplicateIndex, normalize, similarity
+
+A = "整理本周客户回访记录"
+B = "整理本周客户回访记录并提交"
+C = "整理本周客户回访记录并提交审核"
+
+def test_chain_does_not_merge_dissimilar_ends():
+    index = DuplicateIndex()
+    # A~B、B~C 都达到阈值，A 与 C 不相似
+    assert similarity(normalize(A), normalize(B)) >= index.threshold
+    assert similarity(normalize(B), normalize(C)) >= index.threshold
+    assert similarity(normalize(A), normalize(C)) < index.threshold
+    index.add_many([(1, A), (2, B), (3, C)])
+    clusters = index.clusters()
+    assert clusters == [[1, 2]]
+    for cluster in clusters:
+        center = index.texts[cluster[0]]
+        assert all(similarity(center, index.texts[key]) >= index.threshold for key in cluster[1:])
+
+def test_long_chain_groups_stay_similar_to_center():
+    index = DuplicateIndex()
+    index.add_many((i, f"回复客户邮件 {i}") for i in range(2000))
+    for center, others in index.stars():
+        text = index.texts[center[0]]
+        assert all(similarity(text, index.texts[key]) >= index.threshold for key in others)
+
+def test_identical_texts_group_together():
+    index = DuplicateIndex()
+    index.add_many([(1, "买菜"), (2, "买 菜！"), (3, "写周报")])
+    assert index.clusters() == [[1, 2]]
@@ -0,0 +1,17 @@
+from pinyin_index import PinyinIndex
+
+ITEMS = [(i, f"report {i}" if i % 2 else f"weekly {i}") for i in range(200)]
+
+def test_limited_search_keeps_full_matches_for_refinement():
+    index = PinyinIndex()
+    index.add_many(ITEMS)
+    first = index.search("re", limit=10)
+    assert len(first) == 10
+    assert index.last_query == "re"
+    assert len(index.last_matches) == 100
+    refined = index.search("rep", limit=10)
+    assert index.last_query == "rep"
+    assert set(refined) <= index.last_matches
+    fresh = PinyinIndex()
+    fresh.add_many(ITEMS)
+    assert index.last_matches == set(fresh.search("rep"))
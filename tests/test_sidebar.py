@@ -0,0 +1,58 @@
+"""侧边栏类别按钮：反复重新排序时不创建也不遗留多余的控件"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+ctk = pytest.importorskip("customtkinter")
+import tkinter as tk
+
+import task_manager
+
+@pytest.fixture
+def manager():
+    try:
+        root = ctk.CTk()
+    except tk.TclError:
+        pytest.skip("没有可用的显示")
+    root.withdraw()
+    # 只准备 sync_category_buttons 用到的属性，不启动完整界面
+    manager = task_manager.TaskManager.__new__(task_manager.TaskManager)
+    manager.root = root
+    manager.theme_mode = "light"
+    manager.colors = {"text": "#2C3E50", "hover": "#F1F5F9", "accent": "#4A90E2"}
+    manager.styles = task_manager.StyleRegistry()
+    manager.events = SimpleNamespace(publish=lambda *args, **kwargs: None)
+    manager.current_category = None
+    manager.current_view = None
+    manager.category_frame = ctk.CTkScrollableFrame(root)
+    manager.category_frame.pack()
+    manager.categories = {f"类别{i}": [] for i in range(50)}
+    manager.category_counts = {name: [0, 0] for name in manager.categories}
+    manager.current_category = "类别0"
+    manager.category_button_map = {}
+    manager.category_buttons = []
+    manager.sync_category_buttons()
+    yield manager
+    root.destroy()
+
+def test_widget_count_constant_over_reorders(manager):
+    frame = manager.category_frame
+    widget_count = len(frame.winfo_children())
+    button_count = len(manager.category_button_map)
+    assert button_count == len(manager.categories)
+    buttons = set(manager.category_button_map.values())
+
+    rng = random.Random(0)
+    for _ in range(30):
+        names = list(manager.categories)
+        rng.shuffle(names)
+        manager.categories = {name: manager.categories[name] for name in names}
+        manager.sync_category_buttons()
+        manager.root.update_idletasks()
+
+        assert len(frame.winfo_children()) == widget_count
+        assert len(manager.category_button_map) == button_count
+        # 按钮沿用原来的控件，并按新的顺序排列
+        assert set(manager.category_button_map.values()) == buttons
+        assert frame.pack_slaves() == [manager.category_button_map[name] for name in names]
@@ -0,0 +1,25 @@
+from smart_views import SmartView
+
+def make_task(created_date, completed=False):
+    return {"text": "任务", "completed": completed, "created_date": created_date, "completed_date": None}
+
+def test_members_stay_ordered_without_resorting():
+    view = SmartView({"name": "全部未完成", "state": "open"})
+    old, same_a, same_b = (make_task("2026-10-01 09:00"), make_task("2026-10-02 09:00"),
+                           make_task("2026-10-02 09:00"))
+    view.reset([("工作", same_a), ("个人", old), ("工作", same_b)])
+    # 最新创建的在前，创建时间相同时先加入的在前
+    assert view.tasks() == [("工作", same_a), ("工作", same_b), ("个人", old)]
+
+    new = make_task("2026-10-03 09:00")
+    view.add("个人", new)
+    assert view.tasks()[0] == ("个人", new)
+    assert view.discard(same_a)
+    assert not view.discard(same_a)
+    assert view.count() == 3
+
+    view.replace_category("工作", [])
+    assert view.tasks() == [("个人", new), ("个人", old)]
+    view.rename_category("个人", "生活")
+    assert view.tasks() == [("生活", new), ("生活", old)]
+    assert list(view.members) == ["生活"]
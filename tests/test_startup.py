@@ -0,0 +1,46 @@
+"""启动时间：导入 task_manager 时不加载延迟导入的模块，并且在时间预算之内"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("customtkinter")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在用到时才导入的模块
+DEFERRED_MODULES = ("webbrowser", "tkinter.font", "PIL.ImageTk")
+
+# 在界面库已经加载之后，导入 task_manager 本身允许的时间（秒）
+IMPORT_BUDGET = 0.5
+
+PROBE = """
+import json, sys, time
+import customtkinter
+baseline = set(sys.modules)
+start = time.perf_counter()
+import task_manager
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "baseline": sorted(baseline), "modules": sorted(sys.modules)}))
+"""
+
+def run_probe():
+    # 在新进程中测量，避免受到其他测试已导入模块的影响
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def test_deferred_modules_not_imported():
+    probe = run_probe()
+    baseline, modules = set(probe["baseline"]), set(probe["modules"])
+    # customtkinter 自己会导入 tkinter.font 和 PIL.ImageTk，只检查 task_manager 新增的模块
+    loaded = [name for name in DEFERRED_MODULES if name in modules and name not in baseline]
+    assert loaded == []
+    assert "webbrowser" not in modules
+
+def test_import_time_budget():
+    # 取三次中最快的一次，减少机器负载带来的波动
+    elapsed = min(run_probe()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"导入 task_manager 用了 {elapsed:.3f} 秒"